@@ -0,0 +1,191 @@
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 10
+
+LowStockEvent = namedtuple('LowStockEvent', ['product_id', 'quantity', 'threshold', 'at'])
+
+
+def default_threshold():
+    return getattr(settings, 'ANALYTICS_LOW_STOCK_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def crossed(old_quantity, new_quantity, threshold):
+    # True when stock goes from at/above the threshold to below it; None as
+    # old_quantity means a new row. Staying below the threshold is not a new
+    # crossing, so repeated sales of a scarce product alert once.
+    if threshold is None:
+        threshold = default_threshold()
+    if new_quantity >= threshold:
+        return False
+    return old_quantity is None or old_quantity >= threshold
+
+
+class LogSink:
+    def send(self, events, names):
+        for event in events:
+            logger.warning(
+                "Low stock: %s has %s left (threshold %s)",
+                names.get(event.product_id, event.product_id), event.quantity, event.threshold,
+            )
+
+
+class DatabaseSink:
+    def send(self, events, names):
+        LowStockAlert = apps.get_model('analytics', 'LowStockAlert')
+        LowStockAlert.objects.bulk_create([
+            LowStockAlert(product_id=event.product_id, quantity=event.quantity, threshold=event.threshold, created_at=event.at)
+            for event in events
+        ])
+
+
+class WebhookSink:
+    # Posts each batch as one JSON document. Delivery is best effort: a
+    # failure is logged and the batch is not retried.
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events, names):
+        body = json.dumps({'alerts': [
+            {
+                'product_id': event.product_id,
+                'product_name': names.get(event.product_id),
+                'quantity': event.quantity,
+                'threshold': event.threshold,
+                'at': event.at.isoformat(),
+            }
+            for event in events
+        ]}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def default_sinks():
+    sinks = [LogSink(), DatabaseSink()]
+    url = getattr(settings, 'ANALYTICS_LOW_STOCK_WEBHOOK_URL', '')
+    if url:
+        sinks.append(WebhookSink(url))
+    return sinks
+
+
+class AlertDispatcher:
+    # Low-stock events go into a bounded in-process queue and are sent by one
+    # background thread, so an order never waits on a sink. The worker takes
+    # up to batch_size events at a time, keeps the latest event per product
+    # and resolves product names with one query per batch. When the queue is
+    # full new events are dropped and counted rather than blocking the
+    # request.
+
+    def __init__(self, sinks=None, maxsize=None, batch_size=None):
+        self._sinks = sinks
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._queue = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def sinks(self):
+        return self._sinks if self._sinks is not None else default_sinks()
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'ANALYTICS_LOW_STOCK_BATCH_SIZE', 100)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self._maxsize or getattr(settings, 'ANALYTICS_LOW_STOCK_QUEUE_SIZE', 10000))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='low-stock-alerts', daemon=True)
+                self._worker.start()
+        return self._queue
+
+    def enqueue(self, events):
+        # Events are handed over once the surrounding transaction commits, so
+        # a rolled back sale never alerts.
+        events = list(events)
+        if events:
+            transaction.on_commit(lambda: self._submit(events))
+
+    def _submit(self, events):
+        if getattr(settings, 'ANALYTICS_LOW_STOCK_ALERTS_ALWAYS_EAGER', False):
+            self.dispatch(events)
+            return
+        pending = self._ensure_worker()
+        for event in events:
+            try:
+                pending.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+        if self.dropped:
+            logger.warning("Low-stock alert queue full; %s alerts dropped so far", self.dropped)
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            close_old_connections()
+            try:
+                self.dispatch(batch)
+            except Exception:
+                logger.exception("Low-stock alert batch failed")
+            finally:
+                close_old_connections()
+                for _ in batch:
+                    pending.task_done()
+
+    def dispatch(self, events):
+        latest = {}
+        for event in events:
+            latest[event.product_id] = event
+        events = sorted(latest.values(), key=lambda event: event.product_id)
+        names = self.product_names(latest)
+        for sink in self.sinks:
+            try:
+                sink.send(events, names)
+            except Exception:
+                logger.exception("Low-stock alert sink %s failed", type(sink).__name__)
+
+    def product_names(self, product_ids):
+        Product = apps.get_model('analytics', 'Product')
+        return dict(Product.objects.filter(id__in=product_ids).values_list('id', 'name'))
+
+    def flush(self):
+        # Blocks until every queued event has been dispatched.
+        if self._queue is not None:
+            self._queue.join()
+
+
+def low_stock_events(rows):
+    # rows: (product_id, old quantity, new quantity, threshold or None).
+    now = timezone.now()
+    return [
+        LowStockEvent(product_id, new, threshold if threshold is not None else default_threshold(), now)
+        for product_id, old, new, threshold in rows
+        if crossed(old, new, threshold)
+    ]
+
+
+dispatcher = AlertDispatcher()
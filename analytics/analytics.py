@@ -1,43 +1,211 @@
-from django.db.models import Sum, Count, F, Q, Max  
-from datetime import timedelta
-from .models import OrderItem, Customer
+from django.db.models import Sum, Count, F, Q, Window
+from django.db.models.functions import RowNumber, TruncMonth
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from .caching import analytics_cache
+from .models import Customer, DailySalesRollup, Order
+from .partitions import month_runs
+from .tax import tax_rates
+
+
+def as_local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
 
 class SalesAnalytics:
     
-    def __init__(self, start_date, end_date):
+    def __init__(self, start_date, end_date, cache=analytics_cache):
         self.start_date = start_date
         self.end_date = end_date
+        # Per-bucket results are cached here when set; pass None to always
+        # read straight from the rollup.
+        self.cache = cache
 
-    
-    def calculate_revenue_by_category(self):
-        revenue_by_category = (
-            OrderItem.objects.filter(order__order_date__range=[self.start_date, self.end_date])
-            .values(category_name=F('product__category__name'))
-            .annotate(total_revenue=Sum(F('price_at_time_of_order') * F('quantity')))
+    # Sales figures are read from the daily rollup rather than the OrderItem
+    # fact table; the range covers whole days from start_date to end_date.
+    def get_rollup_queryset(self):
+        return DailySalesRollup.objects.filter(
+            date__range=[as_local_date(self.start_date), as_local_date(self.end_date)]
         )
+
+    def get_buckets(self):
+        # Calendar months wholly inside the range become month buckets and the
+        # partial months at either edge are split into day buckets, so sliding
+        # the window by a day only computes the days that entered it.
+        start = as_local_date(self.start_date)
+        end = as_local_date(self.end_date)
+        buckets = []
+        day = start
+        while day <= end:
+            following = next_month(day)
+            if day.day == 1 and following - timedelta(days=1) <= end:
+                buckets.append(('month', day))
+                day = following
+            else:
+                buckets.append(('day', day))
+                day += timedelta(days=1)
+        return buckets
+
+    def _query_buckets(self, buckets, group_by, total):
+        results = {bucket: {} for bucket in buckets}
+        months = [start for kind, start in buckets if kind == 'month']
+        days = [start for kind, start in buckets if kind == 'day']
+
+        queries = []
+        if months:
+            # One range predicate per run of consecutive months rather than
+            # one per month.
+            in_months = Q()
+            for first, following in month_runs(months):
+                in_months |= Q(date__gte=first, date__lt=following)
+            queries.append(('month', DailySalesRollup.objects.filter(in_months).values_list(TruncMonth('date'), *group_by)))
+        if days:
+            queries.append(('day', DailySalesRollup.objects.filter(date__in=days).values_list('date', *group_by)))
+
+        for kind, rows in queries:
+            for bucket_start, *group, amount in rows.annotate(total=Sum(total)).order_by():
+                results[(kind, bucket_start)][tuple(group)] = amount
+        return results
+
+    def _aggregate(self, section, group_by, total):
+        buckets = self.get_buckets()
+
+        def compute(missing):
+            return self._query_buckets(missing, group_by, total)
+
+        if self.cache is None:
+            per_bucket = compute(buckets)
+        else:
+            # Buckets are scoped by month so compaction only invalidates the
+            # months it actually changed.
+            per_bucket = self.cache.get_many_or_compute(
+                section,
+                {bucket: (bucket[1].strftime('%Y-%m'), (bucket[0], bucket[1].isoformat())) for bucket in buckets},
+                compute,
+            )
+
+        merged = {}
+        for totals in per_bucket.values():
+            for key, amount in totals.items():
+                merged[key] = merged.get(key, 0) + amount
+        return merged
+
+    def calculate_revenue_by_category(self):
+        totals = self._aggregate('revenue_by_category', ['category__name'], 'revenue')
+        revenue_by_category = [
+            {'category_name': category_name, 'total_revenue': total_revenue}
+            for (category_name,), total_revenue in totals.items()
+        ]
         return revenue_by_category
 
     
-    def top_selling_products_by_country(self):
-        top_products_by_country = (
-            OrderItem.objects.filter(order__order_date__range=[self.start_date, self.end_date])
-            .values(country=F('order__customer__country'), product_name=F('product__name'))
-            .annotate(total_sales=Sum('quantity'))
-            .order_by('-total_sales')
-        )
+    def top_selling_products_by_country(self, top_n=None):
+        if top_n is not None:
+            return self.top_n_products_by_country(top_n)
+        totals = self._aggregate('top_products_by_country', ['country', 'product__name'], 'quantity')
+        top_products_by_country = [
+            {'country': country, 'product_name': product_name, 'total_sales': total_sales}
+            for (country, product_name), total_sales in totals.items()
+        ]
+        top_products_by_country.sort(key=lambda row: row['total_sales'], reverse=True)
         return top_products_by_country
 
-    # Computing customer churn rate
+    def top_n_products_by_country(self, top_n):
+        # Products are ranked within each country by the database and only the
+        # first top_n per country are returned.
+        def compute():
+            ranked = (
+                self.get_rollup_queryset()
+                .values('country', 'product__name')
+                .annotate(total_sales=Sum('quantity'))
+                .annotate(rank=Window(
+                    RowNumber(),
+                    partition_by=F('country'),
+                    order_by=[Sum('quantity').desc(), F('product__name').asc()],
+                ))
+                .filter(rank__lte=top_n)
+                .order_by('-total_sales', 'country', 'product__name')
+            )
+            return [
+                {'country': row['country'], 'product_name': row['product__name'], 'total_sales': row['total_sales']}
+                for row in ranked
+            ]
+
+        if self.cache is None:
+            return compute()
+        parts = (as_local_date(self.start_date).isoformat(), as_local_date(self.end_date).isoformat(), top_n)
+        return self.cache.get_or_compute('top_products_ranked', parts, compute)
+
+    # Computing customer churn rate. Customers are churned when their last
+    # order is more than CHURN_WINDOW before end_date; both counts come from one
+    # aggregate over the indexed Customer.last_order_at column.
+    CHURN_WINDOW = timedelta(days=180)
+
+    def churn_cutoff(self):
+        return self.end_date - self.CHURN_WINDOW
+
     def compute_customer_churn_rate(self):
-        churned_customers = (
-            Customer.objects.annotate(
-                last_order_date=Max('orders__order_date')
-            ).filter(
-                last_order_date__lt=self.end_date - timedelta(days=180)  # Assuming churn if no order in last 6 months
-            ).count()
+        counts = Customer.objects.aggregate(
+            total_customers=Count('id'),
+            churned_customers=Count('id', filter=Q(last_order_at__lt=self.churn_cutoff())),
         )
-        total_customers = Customer.objects.count()
-        if total_customers == 0:
+        if counts['total_customers'] == 0:
             return 0
-        churn_rate = (churned_customers / total_customers) * 100
+        churn_rate = (counts['churned_customers'] / counts['total_customers']) * 100
         return churn_rate
+
+    def compute_churn_cohorts(self):
+        cohorts = (
+            Customer.objects.values('country', cohort=TruncMonth('registration_date'))
+            .annotate(
+                total_customers=Count('id'),
+                churned_customers=Count('id', filter=Q(last_order_at__lt=self.churn_cutoff())),
+            )
+            .order_by('cohort', 'country')
+        )
+        return [
+            {**cohort, 'churn_rate': cohort['churned_customers'] / cohort['total_customers'] * 100}
+            for cohort in cohorts
+        ]
+
+    def compute_tax_summary(self):
+        # Orders, revenue and tax per (month, country) over whole local days
+        # from start_date to end_date. Each country has a single rate, so tax
+        # is applied to the grouped revenue instead of to every order.
+        start = as_local_date(self.start_date)
+        end = as_local_date(self.end_date)
+
+        def compute():
+            rows = (
+                Order.objects.filter(
+                    order_date__gte=timezone.make_aware(datetime.combine(start, time.min)),
+                    order_date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+                )
+                .values('customer__country', month=TruncMonth('order_date'))
+                .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+                .order_by('month', 'customer__country')
+            )
+            rates = tax_rates.rates()
+            summary = []
+            for row in rows:
+                rate = rates.get(row['customer__country'], Decimal('0'))
+                summary.append({
+                    'month': as_local_date(row['month']).strftime('%Y-%m'),
+                    'country': row['customer__country'],
+                    'orders': row['orders'],
+                    'revenue': row['revenue'],
+                    'tax_rate': rate,
+                    'tax': (row['revenue'] * rate).quantize(Decimal('0.01')),
+                })
+            return summary
+
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute('tax_summary', (start.isoformat(), end.isoformat()), compute)
@@ -0,0 +1,347 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .analytics import SalesAnalytics
+from .ingestion import ingest_orders
+from .models import Category, Customer, InsufficientStock, Inventory, InventoryReservation, Order, OrderItem, Product
+from .reports import MonthlySalesReport
+from .serializers import CustomerSerializer, CustomerValuesSerializer, OrderSerializer, OrderValuesSerializer
+from .tax import annotate_tax
+
+
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+BATCH_SIZE = 5000
+BENCH_KEY_PREFIX = 'bench-'
+
+
+class BenchmarkResult:
+    def __init__(self, label, seconds, queries, rows=None):
+        self.label = label
+        self.seconds = seconds
+        self.queries = queries
+        self.rows = rows
+
+    def __str__(self):
+        line = f'{self.label:<40} {self.seconds:>10.3f}s {self.queries:>6} queries'
+        if self.rows:
+            line += f' {self.rows / self.seconds if self.seconds else 0:>12,.0f} rows/s'
+        return line
+
+
+def measure(label, func, rows=None):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    return BenchmarkResult(label, elapsed, len(queries), rows)
+
+
+def next_ids(model, count):
+    # bulk_create cannot return primary keys on MySQL, so seeded rows get
+    # explicit ids above the current maximum.
+    first = (model.objects.aggregate(highest=Max('pk'))['highest'] or 0) + 1
+    return range(first, first + count)
+
+
+def seed_customers(customers):
+    ids = next_ids(Customer, customers)
+    Customer.objects.bulk_create(
+        [
+            Customer(
+                pk=pk,
+                name=f'Bench Customer {i}',
+                email=f'c{i}@{BENCH_EMAIL_DOMAIN}',
+                country=('USA', 'UK', 'India')[i % 3],
+                registration_date=date(2020 + i % 4, 1 + i % 12, 1),
+            )
+            for i, pk in enumerate(ids)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return ids
+
+
+def seed_orders(customer_ids, order_count, order_date):
+    # order_date is auto_now_add, so each batch is moved to its date after the
+    # insert. order_date may be a callable taking the batch number.
+    ids = next_ids(Order, order_count)
+    for batch, start in enumerate(range(0, order_count, BATCH_SIZE)):
+        batch_ids = ids[start:start + BATCH_SIZE]
+        Order.objects.bulk_create([
+            Order(pk=pk, customer_id=customer_ids[(pk * 7919) % len(customer_ids)], status='delivered', total_amount=Decimal('49.95'))
+            for pk in batch_ids
+        ])
+        Order.objects.filter(pk__gte=batch_ids[0], pk__lte=batch_ids[-1]).update(
+            order_date=order_date(batch) if callable(order_date) else order_date
+        )
+    return ids
+
+
+def seed_products(products, stock=None):
+    category = Category.objects.create(name='Benchmark')
+    product_ids = next_ids(Product, products)
+    Product.objects.bulk_create(
+        [
+            Product(pk=pk, name=f'Bench Product {pk}', description='', SKU=f'BENCH-{pk}', price=Decimal('9.99'), category=category)
+            for pk in product_ids
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    if stock is not None:
+        Inventory.objects.bulk_create(
+            [Inventory(product_id=pk, quantity=stock, last_restocked_date=date.today()) for pk in product_ids],
+            batch_size=BATCH_SIZE,
+        )
+    return product_ids
+
+
+def seed_sales(order_items, products=100, customers=1000, items_per_order=5, order_date=None):
+    # Synthetic data goes through bulk_create so post_save receivers do not fire
+    # and seeding time stays out of the measured numbers.
+    product_ids = seed_products(products)
+    customer_ids = seed_customers(customers)
+    order_date = order_date or timezone.now()
+    order_ids = seed_orders(customer_ids, max(1, order_items // items_per_order), order_date)
+
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order_id=order_id,
+                    product_id=product_ids[(order_id + k) % products],
+                    quantity=1 + k,
+                    price_at_time_of_order=Decimal('9.99'),
+                    order_date=order_date,
+                )
+                for order_id in order_ids[start:start + BATCH_SIZE]
+                for k in range(items_per_order)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return len(order_ids) * items_per_order
+
+
+def bench_monthly_report(rows, **options):
+    year, month = 2000, 1
+    seeded = seed_sales(rows, order_date=timezone.make_aware(datetime(year, month, 15)))
+    results = []
+    for aggregate_in_db in (False, True):
+        report = MonthlySalesReport(year, month, aggregate_in_db=aggregate_in_db)
+        paths = []
+        label = 'monthly report (db subtotals)' if aggregate_in_db else 'monthly report (single pass)'
+        results.append(measure(label, lambda: paths.append(report.build_to_tempfile()), rows=seeded))
+        for path in paths:
+            os.unlink(path)
+    return results
+
+
+def seed_customers_and_orders(customers, orders_per_customer=10, days=730):
+    # Each batch of orders lands on its own day, spreading order dates over the
+    # last `days` days.
+    now = timezone.now()
+    customer_ids = seed_customers(customers)
+    order_ids = seed_orders(customer_ids, customers * orders_per_customer, lambda batch: now - timedelta(days=batch % days))
+    Customer.objects.refresh_last_order_at()
+    Customer.objects.refresh_order_stats(customer_ids)
+    return len(order_ids)
+
+
+def legacy_churn_rate(end_date):
+    churned = Customer.objects.annotate(last_order_date=Max('orders__order_date')).filter(
+        last_order_date__lt=end_date - timedelta(days=180)
+    ).count()
+    return churned / (Customer.objects.count() or 1) * 100
+
+
+def bench_churn(rows, **options):
+    # rows is the number of customers; each gets ten orders on average.
+    seed_customers_and_orders(rows)
+    analytics = SalesAnalytics(timezone.now() - timedelta(days=365), timezone.now(), cache=None)
+    return [
+        measure('churn (Max over orders join)', lambda: legacy_churn_rate(analytics.end_date), rows=rows),
+        measure('churn (indexed last_order_at)', analytics.compute_customer_churn_rate, rows=rows),
+        measure('churn cohorts (month x country)', analytics.compute_churn_cohorts, rows=rows),
+    ]
+
+
+def bench_lifetime_value(rows, page_size=100, **options):
+    # rows is the number of customers; a listing page of page_size customers
+    # shows each one's lifetime value.
+    seed_customers_and_orders(rows)
+    page = list(Customer.objects.filter(email__endswith=BENCH_EMAIL_DOMAIN).order_by('pk')[:page_size])
+    return [
+        measure('ltv per customer (aggregate each)', lambda: [customer.calculate_lifetime_value() for customer in page], rows=len(page)),
+        measure('ltv per page (grouped query)', lambda: Customer.calculate_lifetime_values(page), rows=len(page)),
+        measure('ltv per page (stored column)', lambda: list(
+            Customer.objects.filter(pk__in=[customer.pk for customer in page]).values_list('pk', 'lifetime_value')
+        ), rows=len(page)),
+        measure('top customers by ltv (indexed)', lambda: list(
+            Customer.objects.order_by('-lifetime_value', '-id').values_list('pk', 'lifetime_value')[:page_size]
+        ), rows=page_size),
+    ]
+
+
+def bench_tax(rows, per_order_sample=10000, **options):
+    # rows is the number of orders, spread over the last year; calculate_tax
+    # is only timed on a sample since it costs a query per order.
+    now = timezone.now()
+    customer_ids = seed_customers(1000)
+    order_ids = seed_orders(customer_ids, rows, lambda batch: now - timedelta(days=batch % 365))
+    orders = Order.objects.filter(pk__gte=order_ids[0])
+    sample = list(orders.order_by('pk')[:per_order_sample])
+    analytics = SalesAnalytics(now - timedelta(days=365), now, cache=None)
+    return [
+        measure('tax per order (calculate_tax)', lambda: [order.calculate_tax() for order in sample], rows=len(sample)),
+        measure('tax for all orders (CASE annotation)', lambda: list(
+            annotate_tax(orders).values_list('pk', 'tax').iterator(chunk_size=BATCH_SIZE)
+        ), rows=rows),
+        measure('tax summary (month x country)', analytics.compute_tax_summary, rows=rows),
+    ]
+
+
+def bench_serializers(rows, **options):
+    # rows customers and as many orders, each serialized with the
+    # ModelSerializer and with the values() fast path.
+    customer_ids = seed_customers(rows)
+    order_ids = seed_orders(customer_ids, rows, timezone.now())
+    customers = Customer.objects.filter(pk__gte=customer_ids[0]).order_by('pk')
+    orders = Order.objects.filter(pk__gte=order_ids[0]).order_by('pk')
+    return [
+        measure('customers (ModelSerializer)', lambda: CustomerSerializer(customers, many=True).data, rows=rows),
+        measure('customers (values fast path)', lambda: CustomerValuesSerializer().serialize(customers), rows=rows),
+        measure('orders (ModelSerializer)', lambda: OrderSerializer(orders, many=True).data, rows=rows),
+        measure('orders (values fast path)', lambda: OrderValuesSerializer().serialize(orders), rows=rows),
+    ]
+
+
+def create_orders_one_by_one(orders):
+    # The per-object path: every Order/OrderItem save fires its receivers.
+    for order in orders:
+        created = Order.objects.create(customer_id=order['customer_id'], status=order['status'], total_amount=Decimal('49.95'))
+        for item in order['items']:
+            OrderItem.objects.create(order=created, product_id=item['product_id'], quantity=item['quantity'], price_at_time_of_order=item['price'])
+
+
+def bench_ingest(rows, items_per_order=5, per_object_orders=1000, **options):
+    # rows is the number of order items to ingest.
+    product_ids = seed_products(100, stock=2 ** 31 - 1)
+    customer_ids = seed_customers(1000)
+    orders = [
+        {
+            'line': n,
+            'customer_id': customer_ids[(n * 7919) % len(customer_ids)],
+            'status': 'pending',
+            'items': [
+                {'product_id': product_ids[(n + k) % len(product_ids)], 'quantity': 1, 'price': Decimal('9.99')}
+                for k in range(items_per_order)
+            ],
+        }
+        for n in range(max(1, rows // items_per_order))
+    ]
+    sample = orders[:per_object_orders]
+    return [
+        measure('ingest (bulk, set-based inventory)', lambda: ingest_orders(orders), rows=len(orders) * items_per_order),
+        measure(f'ingest (per object, {len(sample)} orders)', lambda: create_orders_one_by_one(sample), rows=len(sample) * items_per_order),
+    ]
+
+
+def _in_thread(func):
+    # Worker threads get their own connection, closed when they finish.
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+    return run
+
+
+def _naive_decrement(product_id):
+    inventory = Inventory.objects.get(product_id=product_id)
+    if inventory.quantity < 1:
+        return False
+    inventory.quantity -= 1
+    inventory.save(update_fields=['quantity'])
+    return True
+
+
+def _reserve_one(product_id):
+    try:
+        InventoryReservation.objects.reserve(f'{BENCH_KEY_PREFIX}{uuid.uuid4().hex}', {product_id: 1})
+    except InsufficientStock:
+        return False
+    return True
+
+
+def bench_reservations(rows, threads=16, **options):
+    # rows is the number of single-unit requests, fired from `threads` threads
+    # against one product stocked with half that many units. Worker threads
+    # cannot see an uncommitted transaction, so the seed data is committed
+    # and removed afterwards.
+    stock = max(1, rows // 2)
+    [product_id] = seed_products(1, stock=stock)
+    category_id = Product.objects.get(pk=product_id).category_id
+    results = []
+    try:
+        for label, attempt, guarded in (
+            ('read-modify-write save()', _naive_decrement, False),
+            ('conditional reserve()', _reserve_one, True),
+        ):
+            Inventory.objects.filter(product_id=product_id).update(quantity=stock)
+            outcomes = []
+
+            def fire():
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    outcomes.extend(pool.map(_in_thread(attempt), [product_id] * rows))
+
+            result = measure(label, fire, rows=rows)
+            sold = sum(outcomes)
+            remaining = Inventory.objects.get(product_id=product_id).quantity
+            # Successful requests whose decrement was overwritten by another
+            # thread's save, and units confirmed beyond the stock there was.
+            lost_updates = sold - (stock - remaining)
+            oversold = max(0, sold - stock)
+            if guarded and (lost_updates or oversold):
+                raise AssertionError(f'{label}: lost_updates={lost_updates} oversold={oversold}')
+            result.label += f' sold={sold} lost_updates={lost_updates} oversold={oversold}'
+            results.append(result)
+    finally:
+        InventoryReservation.objects.filter(idempotency_key__startswith=BENCH_KEY_PREFIX).delete()
+        Product.objects.filter(pk=product_id).delete()
+        Category.objects.filter(pk=category_id).delete()
+    return results
+
+
+# Runs outside the rolled-back transaction (see bench_reservations).
+bench_reservations.commits = True
+
+
+SCENARIOS = {
+    'churn': bench_churn,
+    'ingest': bench_ingest,
+    'reservations': bench_reservations,
+    'lifetime-value': bench_lifetime_value,
+    'tax': bench_tax,
+    'monthly-report': bench_monthly_report,
+    'serializers': bench_serializers,
+}
+
+
+def run(name, rows, **options):
+    # Everything is seeded and measured inside a transaction that is always
+    # rolled back, so benchmarks can be pointed at a shared database.
+    scenario = SCENARIOS[name]
+    if getattr(scenario, 'commits', False):
+        return scenario(rows, **options)
+    with transaction.atomic():
+        results = scenario(rows, **options)
+        transaction.set_rollback(True)
+    return results
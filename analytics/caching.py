@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULT_SECTION_TTLS = {
+    'revenue_by_category': 300,
+    'top_products_by_country': 300,
+    'top_products_ranked': 300,
+    'churn_rate': 3600,
+    'sales_data': 300,
+    'tax_summary': 300,
+}
+
+_MISSING = object()
+
+
+class SectionCache:
+    # Caches each analytics section independently. Every section (and
+    # optionally every scope within it, e.g. a month) has a generation counter
+    # that is part of its keys, so invalidating is a single incr and stale
+    # entries simply age out of the backend.
+
+    def __init__(self, alias=None, prefix='analytics'):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+    def ttl(self, section):
+        ttls = getattr(settings, 'ANALYTICS_CACHE_TTLS', {})
+        return ttls.get(section, DEFAULT_SECTION_TTLS.get(section, 300))
+
+    def _incr(self, key, delta=1):
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            if self.cache.add(key, delta, None):
+                return delta
+            return self.cache.incr(key, delta)
+
+    def _generation_key(self, section, scope=None):
+        if scope is None:
+            return f'{self.prefix}:gen:{section}'
+        return f'{self.prefix}:gen:{section}:{scope}'
+
+    def _generations(self, section, scopes):
+        keys = {scope: self._generation_key(section, scope) for scope in scopes}
+        found = self.cache.get_many(keys.values())
+        generations = {}
+        for scope, key in keys.items():
+            if key not in found:
+                self.cache.add(key, 1, None)
+                found[key] = self.cache.get(key, 1)
+            generations[scope] = found[key]
+        return generations
+
+    def generation(self, section, scope=None):
+        return self._generations(section, [scope])[scope]
+
+    def make_key(self, section, parts):
+        return ':'.join([self.prefix, section, str(self.generation(section)), *map(str, parts)])
+
+    def get_or_compute(self, section, parts, compute):
+        key = self.make_key(section, parts)
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            self._incr(f'{self.prefix}:stats:{section}:miss')
+            value = compute()
+            self.cache.set(key, value, self.ttl(section))
+        else:
+            self._incr(f'{self.prefix}:stats:{section}:hit')
+        return value
+
+    def get_many_or_compute(self, section, buckets, compute_missing):
+        # buckets maps a bucket id to (scope, key parts). compute_missing is
+        # called once with the ids that were not cached and must return
+        # {bucket id: value} for them.
+        section_generation = str(self.generation(section))
+        scope_generations = self._generations(section, {scope for scope, _ in buckets.values()})
+        keys = {
+            bucket: ':'.join([self.prefix, section, section_generation, scope, str(scope_generations[scope]), *map(str, parts)])
+            for bucket, (scope, parts) in buckets.items()
+        }
+        found = self.cache.get_many(keys.values())
+        results = {bucket: found[key] for bucket, key in keys.items() if key in found}
+        missing = [bucket for bucket in buckets if bucket not in results]
+
+        if results:
+            self._incr(f'{self.prefix}:stats:{section}:hit', len(results))
+        if missing:
+            self._incr(f'{self.prefix}:stats:{section}:miss', len(missing))
+            computed = compute_missing(missing)
+            self.cache.set_many({keys[bucket]: computed[bucket] for bucket in missing}, self.ttl(section))
+            results.update(computed)
+        return results
+
+    def invalidate(self, *sections, scopes=None):
+        for section in sections:
+            if scopes is None:
+                self._incr(self._generation_key(section))
+            else:
+                for scope in scopes:
+                    self._incr(self._generation_key(section, scope))
+
+    def stats(self, sections=None):
+        result = {}
+        for section in sections or DEFAULT_SECTION_TTLS:
+            hits = self.cache.get(f'{self.prefix}:stats:{section}:hit', 0)
+            misses = self.cache.get(f'{self.prefix}:stats:{section}:miss', 0)
+            total = hits + misses
+            result[section] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / total if total else None,
+            }
+        return result
+
+
+analytics_cache = SectionCache()
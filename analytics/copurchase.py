@@ -0,0 +1,141 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import ProductCoPurchase, RollupWatermark
+from .partitions import merged_values, order_item_sources
+
+
+DEFAULT_TOP_K = 20
+# Very large baskets (bulk/B2B orders) add O(n^2) pairs while saying little
+# about which products go together, so they are skipped.
+MAX_BASKET_SIZE = 100
+
+
+def count_pairs(items, max_basket_size=MAX_BASKET_SIZE):
+    # items: (order_id, product_id) rows ordered by order_id, streamed once.
+    pair_counts = Counter()
+    for _, rows in groupby(items, key=itemgetter(0)):
+        products = sorted({product_id for _, product_id in rows})
+        if len(products) > max_basket_size:
+            continue
+        pair_counts.update(combinations(products, 2))
+    return pair_counts
+
+
+def order_counts(product_ids):
+    # An order's items share its date, so each order is counted in one table.
+    counts = Counter()
+    for items in order_item_sources():
+        counts.update(dict(
+            items.filter(product_id__in=product_ids)
+            .values_list('product_id')
+            .annotate(orders=Count('order_id', distinct=True))
+            .order_by()
+        ))
+    return counts
+
+
+def _score(count, orders_a, orders_b):
+    return count / math.sqrt(orders_a * orders_b) if orders_a and orders_b else 0.0
+
+
+def _top_k(rows, top_k):
+    # rows: ProductCoPurchase instances; keeps the best top_k per product.
+    by_product = defaultdict(list)
+    for row in rows:
+        by_product[row.product_id].append(row)
+    kept = []
+    for candidates in by_product.values():
+        kept.extend(heapq.nlargest(top_k, candidates, key=lambda row: (row.score, row.count)))
+    return kept
+
+
+def _offer(heap, entry, top_k):
+    if len(heap) < top_k:
+        heapq.heappush(heap, entry)
+    elif heap and entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+
+def _items_after(order_id):
+    # Live and archived line items, in order id order.
+    return merged_values([items.filter(order_id__gt=order_id) for items in order_item_sources()], 'order_id', 'product_id')
+
+
+def rebuild(top_k=DEFAULT_TOP_K):
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=RollupWatermark.COPURCHASE)
+        sources = order_item_sources()
+        high_water = max(items.aggregate(highest=Max('order_id'))['highest'] or 0 for items in sources)
+        pair_counts = count_pairs(
+            merged_values([items.filter(order_id__lte=high_water) for items in sources], 'order_id', 'product_id')
+        )
+        orders = order_counts({product_id for pair in pair_counts for product_id in pair})
+
+        # A min-heap of at most top_k (score, count, related) entries per
+        # product, so only the kept pairs ever become model instances.
+        best = defaultdict(list)
+        for (a, b), count in pair_counts.items():
+            score = _score(count, orders.get(a), orders.get(b))
+            _offer(best[a], (score, count, b), top_k)
+            _offer(best[b], (score, count, a), top_k)
+
+        ProductCoPurchase.objects.all().delete()
+        kept = [
+            ProductCoPurchase(product_id=product_id, related_product_id=related_id, count=count, score=score)
+            for product_id, heap in best.items()
+            for score, count, related_id in heap
+        ]
+        ProductCoPurchase.objects.bulk_create(kept, batch_size=5000)
+        watermark.last_change_id = high_water
+        watermark.save()
+    return len(kept)
+
+
+def update(top_k=DEFAULT_TOP_K):
+    # Folds orders placed since the last build/update into the index. Only
+    # pairs already in a product's top-K keep their exact counts, so the index
+    # is approximate between full rebuilds. Orders are tracked by id, so an
+    # order committed late with a lower id is picked up by the next rebuild.
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=RollupWatermark.COPURCHASE)
+        high_water = watermark.last_change_id
+        new_pairs = Counter()
+        for order_id, rows in groupby(_items_after(watermark.last_change_id), key=itemgetter(0)):
+            high_water = order_id
+            new_pairs.update(count_pairs((order_id, product_id) for _, product_id in rows))
+        if not new_pairs:
+            return 0
+
+        affected = {product_id for pair in new_pairs for product_id in pair}
+        existing = {
+            (row.product_id, row.related_product_id): row
+            for row in ProductCoPurchase.objects.filter(product_id__in=affected)
+        }
+        for (a, b), count in new_pairs.items():
+            for key in ((a, b), (b, a)):
+                row = existing.get(key)
+                if row is None:
+                    existing[key] = ProductCoPurchase(product_id=key[0], related_product_id=key[1], count=count)
+                else:
+                    row.count += count
+
+        orders = order_counts({product_id for key in existing for product_id in key})
+        for (a, b), row in existing.items():
+            row.score = _score(row.count, orders.get(a), orders.get(b))
+
+        kept = _top_k(existing.values(), top_k)
+        kept_ids = {row.pk for row in kept if row.pk}
+        ProductCoPurchase.objects.filter(product_id__in=affected).exclude(pk__in=kept_ids).delete()
+        ProductCoPurchase.objects.bulk_update([row for row in kept if row.pk], ['count', 'score'], batch_size=5000)
+        ProductCoPurchase.objects.bulk_create([row for row in kept if not row.pk], batch_size=5000)
+
+        watermark.last_change_id = high_water
+        watermark.save()
+    return len(new_pairs)
@@ -0,0 +1,67 @@
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .analytics import SalesAnalytics
+from .models import Customer, CustomerSimilarity, Order, OrderItem, Product, ProductCoPurchase
+from .reports import MonthlySalesReport
+
+
+def analytics_queries():
+    # The hot queries behind the analytics endpoints and batch jobs, built the
+    # way the code builds them. Ids and dates are placeholders; only the plan
+    # shape matters.
+    today = timezone.now()
+    analytics = SalesAnalytics(today - timedelta(days=365), today, cache=None)
+    report = MonthlySalesReport(today.year, today.month)
+    return {
+        'monthly report rows': report.get_queryset().values_list('product_id', 'quantity', 'price_at_time_of_order'),
+        'sales data by date': OrderItem.objects.filter(
+            order_date__gte=today - timedelta(days=30)
+        ).values('product_id').annotate(total=Sum(F('price_at_time_of_order') * F('quantity'))).order_by(),
+        'revenue by category (rollup)': analytics.get_rollup_queryset().values('category_id').annotate(total=Sum('revenue')).order_by(),
+        'churn rate': Customer.objects.filter(last_order_at__lt=analytics.churn_cutoff()).values('id'),
+        'churn cohorts': Customer.objects.values('country', cohort=TruncMonth('registration_date')).annotate(
+            churned=Count('id', filter=Q(last_order_at__lt=analytics.churn_cutoff()))
+        ).order_by('cohort', 'country'),
+        'latest order per customer': Order.objects.filter(customer_id=1).order_by('-order_date').values('order_date')[:1],
+        'order history': OrderItem.objects.filter(order__customer_id=1).values_list('product_id', flat=True).distinct(),
+        'in-stock products': Product.objects.filter(inventory__quantity__gt=0).values('id').order_by('id')[:20],
+        'basket scan': OrderItem.objects.filter(order_id__gt=0).values_list('order_id', 'product_id').order_by('order_id'),
+        'also bought': ProductCoPurchase.objects.filter(product_id=1).order_by('-score').values('related_product_id')[:20],
+        'similar customers': CustomerSimilarity.objects.filter(customer_id=1).order_by('-score').values('similar_customer_id')[:20],
+    }
+
+
+def full_scans(plan, vendor=None):
+    # Tables read with a full scan according to an EXPLAIN from queryset.explain().
+    vendor = vendor or connection.vendor
+    scans = []
+    for line in plan.splitlines():
+        if vendor == 'mysql':
+            columns = line.split('\t')
+            # id, select_type, table, partitions, type, possible_keys, key, ...
+            if len(columns) > 6 and columns[4] == 'ALL':
+                scans.append(columns[2])
+        elif vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\S+)', line)
+            if match:
+                scans.append(match.group(1))
+        else:
+            match = re.search(r'\bSCAN (\S+)(.*)', line)
+            if match and 'INDEX' not in match.group(2):
+                scans.append(match.group(1))
+    return scans
+
+
+def explain_all(queries=None):
+    # [(name, plan, tables scanned in full)]
+    results = []
+    for name, queryset in (queries or analytics_queries()).items():
+        plan = queryset.explain()
+        results.append((name, plan, full_scans(plan)))
+    return results
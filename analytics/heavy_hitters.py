@@ -0,0 +1,86 @@
+import heapq
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class SpaceSaving:
+    # Space-Saving (Metwally et al.): tracks at most `capacity` items. When a
+    # new item arrives and the table is full, it replaces the item with the
+    # smallest count and inherits that count as its possible overestimate, so
+    # any item whose true total exceeds total / capacity is guaranteed to be
+    # present and counts are never underestimated by more than `error`.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def offer(self, item, weight=1):
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            del self.errors[evicted]
+            self.counts[item] = floor + weight
+            self.errors[item] = floor
+
+    def top(self, n):
+        # [(item, estimated count, maximum overestimate)], largest first.
+        return [
+            (item, count, self.errors[item])
+            for item, count in heapq.nlargest(n, self.counts.items(), key=lambda pair: (pair[1], pair[0]))
+        ]
+
+
+class CountryLeaderboards:
+    # One Space-Saving summary per country, kept in process memory. Counts
+    # cover sales seen by this process since it started (or since the last
+    # reset), so they are an approximate real-time view, not a report.
+
+    def __init__(self, capacity=None):
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._summaries = defaultdict(self._new_summary)
+
+    @property
+    def capacity(self):
+        if self._capacity is not None:
+            return self._capacity
+        return getattr(settings, 'ANALYTICS_HEAVY_HITTERS_CAPACITY', 0)
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def _new_summary(self):
+        return SpaceSaving(self.capacity)
+
+    def record(self, country, product_name, quantity):
+        if not self.enabled or quantity <= 0:
+            return
+        with self._lock:
+            self._summaries[country].offer(product_name, quantity)
+
+    def top(self, top_n, country=None):
+        with self._lock:
+            countries = [country] if country is not None else list(self._summaries)
+            rows = [
+                {'country': name, 'product_name': product_name, 'total_sales': count, 'max_error': error}
+                for name in countries if name in self._summaries
+                for product_name, count, error in self._summaries[name].top(top_n)
+            ]
+        rows.sort(key=lambda row: row['total_sales'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+
+
+leaderboards = CountryLeaderboards()
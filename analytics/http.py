@@ -0,0 +1,70 @@
+import os
+import re
+
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+
+from .reports import stream_file
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header, size):
+    # Only single byte ranges are supported; anything else falls back to a full
+    # response. Returns (start, length), None for "whole file", or False when
+    # the range cannot be satisfied.
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if not suffix:
+            return False
+        start = max(0, size - suffix)
+        return start, size - start
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+def file_response(request, path, content_type, filename, etag=None, delete=False):
+    if etag:
+        etag = quote_etag(etag)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if '*' in if_none_match or etag in if_none_match:
+            if delete:
+                os.unlink(path)
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+    size = os.path.getsize(path)
+    byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range is False:
+        if delete:
+            os.unlink(path)
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = StreamingHttpResponse(stream_file(path, delete=delete), content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, length = byte_range
+        response = StreamingHttpResponse(stream_file(path, delete=delete, start=start, length=length), status=206, content_type=content_type)
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{start + length - 1}/{size}'
+
+    if etag:
+        response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,239 @@
+import csv
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import analytics_cache
+from .heavy_hitters import leaderboards
+from .models import Customer, InsufficientStock, Inventory, Order, OrderItem, Product, SalesChangeLog
+
+
+DEFAULT_BATCH_SIZE = 1000
+ORDER_STATUSES = {status for status, _ in Order.ORDER_STATUS_CHOICES}
+CSV_COLUMNS = ('order_ref', 'customer_id', 'status', 'product_id', 'quantity', 'price')
+# Largest value of price_at_time_of_order and total_amount
+# (max_digits=10, decimal_places=2).
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class IngestionError(ValueError):
+    def __init__(self, message, line=None):
+        self.line = line
+        super().__init__(f"line {line}: {message}" if line else message)
+
+
+class IngestResult:
+    def __init__(self):
+        self.orders = 0
+        self.items = 0
+        self.batches = 0
+        self.order_ids = []
+
+    def as_dict(self):
+        return {'orders': self.orders, 'items': self.items, 'batches': self.batches}
+
+
+def _parse_item(item, line):
+    try:
+        product_id = int(item['product_id'])
+        quantity = int(item['quantity'])
+        price = item.get('price')
+        price = Decimal(str(price)) if price not in (None, '') else None
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        raise IngestionError(f"invalid item {item!r}: {e}", line)
+    if quantity < 1:
+        raise IngestionError("quantity must be at least 1", line)
+    if price is not None:
+        if not price.is_finite() or price < 0:
+            raise IngestionError(f"price must be a non-negative number, got {price}", line)
+        if price > MAX_AMOUNT:
+            raise IngestionError(f"price {price} exceeds {MAX_AMOUNT}", line)
+    return {'product_id': product_id, 'quantity': quantity, 'price': price}
+
+
+def _parse_order(data, line):
+    try:
+        customer_id = int(data['customer_id'])
+    except (KeyError, TypeError, ValueError):
+        raise IngestionError("customer_id is required", line)
+    status = data.get('status') or 'pending'
+    if status not in ORDER_STATUSES:
+        raise IngestionError(f"unknown status '{status}'", line)
+    items = [_parse_item(item, line) for item in data.get('items') or []]
+    if not items:
+        raise IngestionError("an order needs at least one item", line)
+    return {'line': line, 'customer_id': customer_id, 'status': status, 'items': items}
+
+
+def parse_jsonl(lines):
+    # One order per line: {"customer_id": 1, "status": "pending",
+    # "items": [{"product_id": 2, "quantity": 1, "price": "9.99"}]}.
+    for number, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise IngestionError(f"invalid JSON: {e}", number)
+        if not isinstance(data, dict):
+            raise IngestionError("expected a JSON object", number)
+        yield _parse_order(data, number)
+
+
+def parse_csv(lines):
+    # One line item per row; consecutive rows sharing an order_ref form one
+    # order.
+    reader = csv.DictReader(lines)
+    missing = set(CSV_COLUMNS) - {'price'} - set(reader.fieldnames or ())
+    if missing:
+        raise IngestionError(f"missing columns: {', '.join(sorted(missing))}", 1)
+    current_ref, current, first_line = None, None, None
+    for row in reader:
+        line = reader.line_num
+        if row['order_ref'] != current_ref:
+            if current is not None:
+                yield _parse_order(current, first_line)
+            current_ref, first_line = row['order_ref'], line
+            current = {'customer_id': row['customer_id'], 'status': row.get('status'), 'items': []}
+        current['items'].append({'product_id': row['product_id'], 'quantity': row['quantity'], 'price': row.get('price')})
+    if current is not None:
+        yield _parse_order(current, first_line)
+
+
+PARSERS = {
+    'jsonl': parse_jsonl,
+    'csv': parse_csv,
+}
+
+
+def _allocate_order_ids(count):
+    # bulk_create cannot return primary keys on MySQL. Lock the highest order
+    # row (InnoDB also locks the gap above it, holding back concurrent
+    # inserts) and assign the next ids explicitly.
+    highest = Order.objects.select_for_update().order_by('-pk').values_list('pk', flat=True).first() or 0
+    return range(highest + 1, highest + 1 + count)
+
+
+def _ingest_batch(orders):
+    product_ids = {item['product_id'] for order in orders for item in order['items']}
+    products = {
+        product['id']: product
+        for product in Product.objects.filter(id__in=product_ids).values('id', 'price', 'category_id', 'name')
+    }
+    customers = dict(
+        Customer.objects.filter(id__in={order['customer_id'] for order in orders}).values_list('id', 'country')
+    )
+    for order in orders:
+        if order['customer_id'] not in customers:
+            raise IngestionError(f"unknown customer {order['customer_id']}", order['line'])
+        for item in order['items']:
+            if item['product_id'] not in products:
+                raise IngestionError(f"unknown product {item['product_id']}", order['line'])
+            if item['price'] is None:
+                item['price'] = products[item['product_id']]['price']
+        # Checked here, before the transaction, so an oversized order is
+        # reported by line instead of failing the batch's INSERT.
+        order['total_amount'] = sum(item['quantity'] * item['price'] for item in order['items'])
+        if order['total_amount'] > MAX_AMOUNT:
+            raise IngestionError(f"total_amount {order['total_amount']} exceeds {MAX_AMOUNT}", order['line'])
+
+    units = defaultdict(int)
+    for order in orders:
+        for item in order['items']:
+            units[item['product_id']] += item['quantity']
+
+    with transaction.atomic():
+        Inventory.objects.decrement_many(units)
+
+        new_orders = [
+            Order(
+                customer_id=order['customer_id'],
+                status=order['status'],
+                total_amount=order['total_amount'],
+            )
+            for order in orders
+        ]
+        if not connection.features.can_return_rows_from_bulk_insert:
+            for order, pk in zip(new_orders, _allocate_order_ids(len(new_orders))):
+                order.pk = pk
+        # order_date is stamped by auto_now_add as each row is inserted.
+        Order.objects.bulk_create(new_orders)
+
+        items = []
+        changes = defaultdict(lambda: [0, Decimal('0')])
+        for order, new_order in zip(orders, new_orders):
+            country = customers[order['customer_id']]
+            day = timezone.localdate(new_order.order_date)
+            for item in order['items']:
+                items.append(OrderItem(
+                    order_id=new_order.pk,
+                    product_id=item['product_id'],
+                    quantity=item['quantity'],
+                    price_at_time_of_order=item['price'],
+                    order_date=new_order.order_date,
+                ))
+                change = changes[(day, item['product_id'], country)]
+                change[0] += item['quantity']
+                change[1] += item['quantity'] * item['price']
+        OrderItem.objects.bulk_create(items, batch_size=DEFAULT_BATCH_SIZE)
+
+        # bulk_create skips the OrderItem/Order receivers, so their effects are
+        # applied here in bulk: one change log row per (day, product, country),
+        # one UPDATE each for last_order_at and the lifetime-value stats, and
+        # one cache invalidation per batch.
+        SalesChangeLog.objects.bulk_create([
+            SalesChangeLog(
+                date=day,
+                product_id=product_id,
+                category_id=products[product_id]['category_id'],
+                country=country,
+                quantity=quantity,
+                revenue=revenue,
+            )
+            for (day, product_id, country), (quantity, revenue) in changes.items()
+        ])
+        Customer.objects.refresh_last_order_at(set(customers))
+        totals = defaultdict(lambda: [0, Decimal('0')])
+        for new_order in new_orders:
+            totals[new_order.customer_id][0] += 1
+            totals[new_order.customer_id][1] += new_order.total_amount
+        Customer.objects.add_orders(totals)
+
+        def after_commit():
+            analytics_cache.invalidate('churn_rate', 'sales_data', 'tax_summary')
+            for (_, product_id, country), (quantity, _) in changes.items():
+                leaderboards.record(country, products[product_id]['name'], quantity)
+
+        transaction.on_commit(after_commit)
+    return new_orders, items
+
+
+def ingest_orders(orders, batch_size=DEFAULT_BATCH_SIZE):
+    # orders: parsed order dicts (see PARSERS). Each batch is committed on its
+    # own; an error stops ingestion with the earlier batches kept, and the
+    # result reports how far it got.
+    result = IngestResult()
+    batch = []
+
+    def flush():
+        new_orders, items = _ingest_batch(batch)
+        result.orders += len(new_orders)
+        result.items += len(items)
+        result.batches += 1
+        result.order_ids.extend(order.pk for order in new_orders)
+        batch.clear()
+
+    try:
+        for order in orders:
+            batch.append(order)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except (IngestionError, InsufficientStock) as e:
+        e.result = result
+        raise
+    return result
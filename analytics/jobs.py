@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ReportJob
+from .reports import EXPORT_FORMATS, MonthlySalesReport
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_JOB_WORKERS', 2),
+                thread_name_prefix='report-job',
+            )
+    return _executor
+
+
+def reports_root():
+    root = getattr(settings, 'REPORTS_ROOT', os.path.join(settings.BASE_DIR, 'reports'))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def enqueue_report_job(job):
+    # Wait for the creating transaction to commit so the worker can see the row.
+    if getattr(settings, 'REPORT_JOBS_ALWAYS_EAGER', False):
+        transaction.on_commit(lambda: run_report_job(job.pk))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, job.pk))
+
+
+def _run_in_worker(job_id):
+    # Worker threads hold their own connection; release it between jobs.
+    close_old_connections()
+    try:
+        run_report_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def fail_stale_jobs(queryset=None):
+    # Jobs run on threads of the process that accepted them, so a restart
+    # loses every job it had queued or running. Those stop sending
+    # heartbeats; once REPORT_JOB_STALE_AFTER seconds have passed they are
+    # marked failed instead of staying pending forever.
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'REPORT_JOB_STALE_AFTER', 900))
+    queryset = ReportJob.objects.all() if queryset is None else queryset
+    return queryset.filter(status__in=['pending', 'running']).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+    ).update(status='failed', error='The job was interrupted; please request the report again.', finished_at=now)
+
+
+def run_report_job(job_id):
+    job = ReportJob.objects.get(pk=job_id)
+    extension, _ = EXPORT_FORMATS[job.format]
+    path = os.path.join(reports_root(), f'{job.pk}.{extension}')
+    partial_path = path + '.part'
+
+    # Claim the job; one already given up as stale is not run.
+    if not ReportJob.objects.filter(pk=job.pk, status='pending').update(
+        status='running', started_at=timezone.now(), heartbeat_at=timezone.now(),
+    ):
+        return
+
+    def progress(rows_done):
+        ReportJob.objects.filter(pk=job.pk).update(rows_done=rows_done, heartbeat_at=timezone.now())
+
+    try:
+        report = MonthlySalesReport(job.year, job.month, progress_callback=progress)
+        ReportJob.objects.filter(pk=job.pk).update(rows_total=report.get_queryset().count(), heartbeat_at=timezone.now())
+        with open(partial_path, 'wb') as fh:
+            report.write(job.format, fh)
+        os.replace(partial_path, path)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        logger.exception("Report job %s failed", job.pk)
+        ReportJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        return
+
+    ReportJob.objects.filter(pk=job.pk).update(
+        status='done',
+        rows_done=report.row_count,
+        file_path=path,
+        finished_at=timezone.now(),
+    )
@@ -0,0 +1,54 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from analytics import partitions
+from analytics.models import OrderItem
+
+
+def parse_month(value):
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = 'Move the line items of old months out of OrderItem into the archive table, or restore a month.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=24, help='Calendar months (current one included) to keep live.')
+        parser.add_argument('--month', action='append', default=[], help='Archive this month (YYYY-MM) instead; repeatable.')
+        parser.add_argument('--restore', metavar='YYYY-MM', help='Move an archived month back into OrderItem.')
+        parser.add_argument('--batch-size', type=int, default=partitions.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--optimize', action='store_true', help='Rebuild the OrderItem table afterwards to reclaim space (MySQL).')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            month = parse_month(options['restore'])
+            moved = partitions.restore_month(month, batch_size=options['batch_size'])
+            self.stdout.write(f'Restored {moved} line items for {month:%Y-%m}.')
+            return
+
+        if options['month']:
+            months = [parse_month(value) for value in options['month']]
+        else:
+            if options['keep_months'] < 1:
+                raise CommandError('--keep-months must be at least 1.')
+            months = partitions.archivable_months(options['keep_months'])
+        total = 0
+        for month in months:
+            try:
+                moved = partitions.archive_month(month, batch_size=options['batch_size'])
+            except partitions.ArchivedMonthError as e:
+                raise CommandError(str(e))
+            total += moved
+            self.stdout.write(f'Archived {moved} line items for {month:%Y-%m}.')
+
+        if options['optimize'] and total and connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'OPTIMIZE TABLE {connection.ops.quote_name(OrderItem._meta.db_table)}')
+                cursor.fetchall()
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} line items from {len(months)} months.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from analytics import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic data inside a rolled-back transaction and time an analytics hot path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(benchmarks.SCENARIOS))
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Number of fact rows to seed.')
+
+    def handle(self, *args, **options):
+        scenario = options.pop('scenario')
+        rows = options.pop('rows')
+        self.stdout.write(f'Running {scenario} with {rows:,} rows...')
+        for result in benchmarks.run(scenario, rows, **options):
+            self.stdout.write(str(result))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from analytics import copurchase
+
+
+class Command(BaseCommand):
+    help = 'Build or incrementally update the product co-purchase index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='Only fold in orders placed since the last run.')
+        parser.add_argument('--top-k', type=int, default=copurchase.DEFAULT_TOP_K)
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            pairs = copurchase.update(top_k=options['top_k'])
+            self.stdout.write(f'Folded {pairs} new product pairs into the co-purchase index.')
+        else:
+            rows = copurchase.rebuild(top_k=options['top_k'])
+            self.stdout.write(f'Stored {rows} co-purchase rows.')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from analytics import similarity
+from analytics.models import CustomerSimilarity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the top-K similar customers for every customer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=similarity.DEFAULT_TOP_K)
+        parser.add_argument('--metric', choices=[CustomerSimilarity.COSINE, CustomerSimilarity.JACCARD], default=CustomerSimilarity.COSINE)
+        parser.add_argument('--chunk-size', type=int, default=similarity.CHUNK_SIZE)
+        parser.add_argument('--max-product-buyers', type=int, default=similarity.MAX_PRODUCT_BUYERS,
+                            help='Ignore products bought by more customers than this (0 keeps all).')
+
+    def handle(self, *args, **options):
+        stored = similarity.rebuild(
+            top_k=options['top_k'],
+            metric=options['metric'],
+            chunk_size=options['chunk_size'],
+            max_product_buyers=options['max_product_buyers'],
+        )
+        self.stdout.write(f'Stored {stored} customer similarities.')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from analytics.models import SalesChangeLog
+
+
+class Command(BaseCommand):
+    help = 'Fold pending sales change log entries into the daily sales rollup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--loop', action='store_true', help='Keep running, compacting every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            folded = SalesChangeLog.objects.compact(batch_size=options['batch_size'])
+            self.stdout.write(f'Folded {folded} changes.')
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import explain
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the analytics hot queries and report any that fall back to full table scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show-plans', action='store_true', help='Print every plan, not just the verdicts.')
+        parser.add_argument('--allow', action='append', default=[], metavar='TABLE',
+                            help='Table allowed to be scanned in full (small lookup tables); repeatable.')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any query scans a table in full.')
+
+    def handle(self, *args, **options):
+        # Planners prefer scans on tiny tables, so run this against a database
+        # with realistic row counts.
+        failures = []
+        for name, plan, scans in explain.explain_all():
+            scans = [table for table in scans if table.strip('"`') not in options['allow']]
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.WARNING(f'{name:<32} FULL SCAN on {", ".join(scans)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name:<32} indexed'))
+            if options['show_plans']:
+                self.stdout.write(plan + '\n')
+
+        if failures and options['fail_on_scan']:
+            raise CommandError(f'{len(failures)} analytics queries use full table scans: {", ".join(failures)}')
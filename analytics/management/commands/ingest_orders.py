@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import ingestion
+from analytics.models import InsufficientStock
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load orders from a JSON lines or CSV file ("-" reads stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(ingestion.PARSERS), help='Defaults to the file extension, else jsonl.')
+        parser.add_argument('--batch-size', type=int, default=ingestion.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = ingestion.ingest_orders(ingestion.PARSERS[fmt](source), batch_size=options['batch_size'])
+        except (ingestion.IngestionError, InsufficientStock) as e:
+            committed = e.result.as_dict()
+            raise CommandError(f'{e} (committed {committed["orders"]} orders in {committed["batches"]} batches)')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(f'Ingested {result.orders} orders with {result.items} items in {result.batches} batches.')
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from analytics.models import DailySalesRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup from OrderItem rows, optionally limited to a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = DailySalesRollup.objects.rebuild(options['start'], options['end'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {created} rollup rows.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized per-customer order statistics from the Order table.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Customer.objects.refresh_last_order_at()
+            Customer.objects.refresh_order_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed last_order_at, lifetime_value and order_count for {updated} customers.'
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('format', models.CharField(max_length=20)),
+                ('ready', models.BooleanField(default=False)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('etag', models.CharField(blank=True, max_length=64)),
+                ('row_count', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('year', 'month', 'format'), name='unique_report_artifact')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-17 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_reportartifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('country', models.CharField(max_length=100)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='analytics.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='analytics.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'product', 'country'), name='unique_daily_sales_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-17 16:03
+
+from django.db import migrations, models
+
+
+def backfill_last_order_at(apps, schema_editor):
+    Customer = apps.get_model('analytics', 'Customer')
+    Order = apps.get_model('analytics', 'Order')
+    latest = Order.objects.filter(customer=models.OuterRef('pk')).order_by('-order_date').values('order_date')[:1]
+    Customer.objects.update(last_order_at=models.Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_saleschangelog_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_order_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-17 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_customer_last_order_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchases', to='analytics.product')),
+                ('related_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchased_with', to='analytics.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='copurchase_product_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related_product'), name='unique_product_copurchase')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-17 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_productcopurchase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared_products', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('metric', models.CharField(choices=[('cosine', 'Cosine'), ('jaccard', 'Jaccard')], default='cosine', max_length=10)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='analytics.customer')),
+                ('similar_customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='analytics.customer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['customer', '-score'], name='similarity_customer_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'similar_customer'), name='unique_customer_similarity')],
+            },
+        ),
+    ]
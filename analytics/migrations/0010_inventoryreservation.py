@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('quantities', models.JSONField()),
+                ('status', models.CharField(choices=[('reserved', 'Reserved'), ('released', 'Released')], default='reserved', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
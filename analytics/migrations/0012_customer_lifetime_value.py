@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:45
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_order_stats(apps, schema_editor):
+    Customer = apps.get_model('analytics', 'Customer')
+    Order = apps.get_model('analytics', 'Order')
+    orders = Order.objects.filter(customer=models.OuterRef('pk')).order_by().values('customer')
+    Customer.objects.update(
+        lifetime_value=Coalesce(
+            models.Subquery(orders.annotate(total=models.Sum('total_amount')).values('total')), models.Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        order_count=Coalesce(models.Subquery(orders.annotate(count=models.Count('pk')).values('count')), models.Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_lowstockalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='lifetime_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['lifetime_value', 'id'], name='customer_ltv_idx'),
+        ),
+        migrations.RunPython(backfill_order_stats, migrations.RunPython.noop),
+    ]
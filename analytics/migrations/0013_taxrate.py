@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-17 22:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# The rates previously hard-coded in Order.calculate_tax.
+INITIAL_RATES = {
+    'USA': Decimal('0.1'),
+    'UK': Decimal('0.2'),
+    'India': Decimal('0.18'),
+}
+
+
+def seed_tax_rates(apps, schema_editor):
+    TaxRate = apps.get_model('analytics', 'TaxRate')
+    TaxRate.objects.bulk_create([TaxRate(country=country, rate=rate) for country, rate in INITIAL_RATES.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_customer_lifetime_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=100, unique=True)),
+                ('rate', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_tax_rates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_order_date(apps, schema_editor):
+    Order = apps.get_model('analytics', 'Order')
+    OrderItem = apps.get_model('analytics', 'OrderItem')
+    OrderItem.objects.update(
+        order_date=models.Subquery(Order.objects.filter(pk=models.OuterRef('order_id')).values('order_date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0013_taxrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='order_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_order_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order_date', 'product'], name='orderitem_date_product_idx'),
+        ),
+        migrations.CreateModel(
+            name='SalesArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('items', models.BigIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price_at_time_of_order', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order_date', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_items', to='analytics.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='analytics.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order_date', 'product'], name='archiveditem_date_product_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:40
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_sales_rollup(apps, schema_editor):
+    # 0004 created the rollup empty and SalesAnalytics reads only the rollup,
+    # so build it from the line items (live and archived) as
+    # rebuild_sales_rollup does. Pending change log rows are already in the
+    # line items and are dropped.
+    DailySalesRollup = apps.get_model('analytics', 'DailySalesRollup')
+    SalesChangeLog = apps.get_model('analytics', 'SalesChangeLog')
+    RollupWatermark = apps.get_model('analytics', 'RollupWatermark')
+    DailySalesRollup.objects.all().delete()
+    SalesChangeLog.objects.all().delete()
+
+    batch = []
+    for name in ('OrderItem', 'ArchivedOrderItem'):
+        grouped = apps.get_model('analytics', name).objects.values(
+            'product_id',
+            day=TruncDate('order_date'),
+            category_id=models.F('product__category_id'),
+            country=models.F('order__customer__country'),
+        ).annotate(
+            total_quantity=models.Sum('quantity'),
+            total_revenue=models.Sum(models.F('price_at_time_of_order') * models.F('quantity')),
+        ).order_by()
+        for row in grouped.iterator(chunk_size=5000):
+            batch.append(DailySalesRollup(
+                date=row['day'],
+                product_id=row['product_id'],
+                category_id=row['category_id'],
+                country=row['country'],
+                quantity=row['total_quantity'],
+                revenue=row['total_revenue'],
+            ))
+            if len(batch) == 5000:
+                DailySalesRollup.objects.bulk_create(batch)
+                batch = []
+    DailySalesRollup.objects.bulk_create(batch)
+    RollupWatermark.objects.update_or_create(name='daily_sales', defaults={'fresh_as_of': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0014_orderitem_order_date_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales_rollup, migrations.RunPython.noop),
+    ]
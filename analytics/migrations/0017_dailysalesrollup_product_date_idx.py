@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0016_reportjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['product', 'date'], name='rollup_product_date_idx'),
+        ),
+    ]
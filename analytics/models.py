@@ -1,7 +1,25 @@
-from django.db import models
-from django.db.models import Sum
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+import os
+import uuid
+from decimal import Decimal
+from itertools import chain
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .alerts import default_threshold, dispatcher, low_stock_events
+from .caching import analytics_cache
+from .heavy_hitters import leaderboards
+from .partitions import check_moves, check_writable, month_start, order_item_sources
+from .tax import tax_rates
+
+
+# Sent after DailySalesRollup rows have been changed by compaction or a rebuild.
+sales_rollup_changed = Signal()
 
 
 class Category(models.Model):
@@ -38,19 +56,122 @@ class Product(models.Model):
         return self.name
 
 
+class CustomerManager(models.Manager):
+    def refresh_last_order_at(self, customer_ids=None):
+        # Recomputes the denormalized last_order_at in one UPDATE; used by the
+        # backfill migration, repair_customer_stats and order deletes/moves.
+        customers = self.all() if customer_ids is None else self.filter(pk__in=customer_ids)
+        latest = Order.objects.filter(customer=models.OuterRef('pk')).order_by('-order_date').values('order_date')[:1]
+        return customers.update(last_order_at=models.Subquery(latest))
+
+    def refresh_order_stats(self, customer_ids=None):
+        # Recomputes the denormalized lifetime_value and order_count in one
+        # UPDATE; used by the backfill migration and repair_customer_stats.
+        customers = self.all() if customer_ids is None else self.filter(pk__in=customer_ids)
+        orders = Order.objects.filter(customer=models.OuterRef('pk')).order_by().values('customer')
+        return customers.update(
+            lifetime_value=Coalesce(
+                models.Subquery(orders.annotate(total=Sum('total_amount')).values('total')), Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            order_count=Coalesce(models.Subquery(orders.annotate(count=models.Count('pk')).values('count')), Value(0)),
+        )
+
+    def add_orders(self, totals):
+        # totals: {customer_id: (orders, amount)}. Applies newly inserted
+        # orders to the denormalized stats of every customer in one UPDATE.
+        if not totals:
+            return 0
+        value_cases = [models.When(pk=pk, then=F('lifetime_value') + amount) for pk, (_, amount) in totals.items()]
+        count_cases = [models.When(pk=pk, then=F('order_count') + count) for pk, (count, _) in totals.items()]
+        return self.filter(pk__in=totals).update(
+            lifetime_value=models.Case(*value_cases, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            order_count=models.Case(*count_cases, output_field=models.PositiveIntegerField()),
+        )
+
+
 class Customer(models.Model):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     country = models.CharField(max_length=100)
     registration_date = models.DateField()
+    # Denormalized MAX(orders.order_date), kept current as orders are written.
+    last_order_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Denormalized SUM(orders.total_amount) and COUNT(orders), kept current
+    # as orders are written.
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    objects = CustomerManager()
+
+    class Meta:
+        indexes = [
+            # Churn cohorts group by country and registration month.
+            models.Index(fields=['country', 'registration_date', 'last_order_at'], name='customer_cohort_idx'),
+            # CustomerListView ?ordering=ltv and LTV range filters.
+            models.Index(fields=['lifetime_value', 'id'], name='customer_ltv_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def calculate_lifetime_value(self):
-        
-        orders = self.orders.all()
-        return orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
+        # Computed from the orders; listings should read lifetime_value.
+        return self.calculate_lifetime_values([self.pk])[self.pk]
+
+    @classmethod
+    def calculate_lifetime_values(cls, customers):
+        # {customer id: sum of order totals} for customers or their ids, in one
+        # grouped query; customers without orders map to 0.
+        ids = [getattr(customer, 'pk', customer) for customer in customers]
+        totals = dict(
+            Order.objects.filter(customer_id__in=ids).order_by().values('customer_id')
+            .annotate(total=Sum('total_amount')).values_list('customer_id', 'total')
+        )
+        return {pk: totals.get(pk, 0) for pk in ids}
+
+
+class OrderQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Line items carry a copy of their order's date, so moving orders with
+        # a queryset update moves their (live and archived) items as well and
+        # does the bookkeeping of log_order_move: change log entries re-keying
+        # the items and the customers' last_order_at. Moves into or out of an
+        # archived month are rolled back; cached reports of both the old and
+        # the new months are dropped.
+        if 'order_date' not in kwargs:
+            return super().update(**kwargs)
+        placement = ('order_date', 'customer_id', 'customer__country')
+        with transaction.atomic(using=self.db):
+            previous = {pk: rest for pk, *rest in self.values_list('pk', *placement)}
+            order_ids = list(previous)
+            updated = super().update(**kwargs)
+            current = {pk: rest for pk, *rest in Order.objects.filter(pk__in=order_ids).values_list('pk', *placement)}
+            moves = [(previous[pk][0], current[pk][0]) for pk in current]
+            check_moves(moves)
+            order_date = models.Subquery(Order.objects.filter(pk=models.OuterRef('order_id')).values('order_date')[:1])
+            OrderItem.objects.filter(order_id__in=order_ids).update(order_date=order_date)
+            ArchivedOrderItem.objects.filter(order_id__in=order_ids).update(order_date=order_date)
+
+            rekeyed = [
+                pk for pk, (new_date, _, new_country) in current.items()
+                if (timezone.localdate(previous[pk][0]), previous[pk][2]) != (timezone.localdate(new_date), new_country)
+            ]
+            changes = []
+            for model in (OrderItem, ArchivedOrderItem):
+                for item in model.objects.filter(order_id__in=rekeyed).select_related('order__customer', 'product'):
+                    old_date, _, old_country = previous[item.order_id]
+                    changes.append(_change_for(item, -1, order_date=old_date, country=old_country))
+                    changes.append(_change_for(item, 1))
+            SalesChangeLog.objects.bulk_create(changes, batch_size=1000)
+
+            Customer.objects.refresh_last_order_at(
+                {customer_id for placements in (previous, current) for _, customer_id, _ in placements.values()}
+            )
+            # One invalidation per distinct month.
+            for day in {month_start(timezone.localdate(day)): day for move in moves for day in move}.values():
+                ReportArtifact.invalidate(day)
+        return updated
 
 
 class Order(models.Model):
@@ -66,18 +187,32 @@ class Order(models.Model):
     status = models.CharField(max_length=50, choices=ORDER_STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Report and sales-data date ranges.
+            models.Index(fields=['order_date'], name='order_date_idx'),
+            # Latest order per customer (last_order_at refreshes).
+            models.Index(fields=['customer', '-order_date'], name='order_customer_date_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.status}"
 
     def calculate_tax(self):
-        tax_rates = {
-            'USA': 0.1,    
-            'UK': 0.2,    
-            'India': 0.18   
-            
-        }
-        country_tax_rate = tax_rates.get(self.customer.country, 0)
-        return self.total_amount * country_tax_rate
+        # Rates come from the in-memory TaxRate table; for many orders use
+        # analytics.tax.annotate_tax instead.
+        return self.total_amount * tax_rates.rate_for(self.customer.country)
+
+
+class TaxRate(models.Model):
+    country = models.CharField(max_length=100, unique=True)
+    rate = models.DecimalField(max_digits=5, decimal_places=4)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.country}: {self.rate}"
 
 
 class OrderItem(models.Model):
@@ -85,31 +220,814 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     price_at_time_of_order = models.DecimalField(max_digits=10, decimal_places=2)
+    # Copy of order.order_date, so date-range scans of line items need no
+    # join to Order. Kept in step by save(), OrderQuerySet.update and
+    # log_order_move.
+    order_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Basket scans (co-purchase index) and per-customer order history.
+            models.Index(fields=['order', 'product'], name='orderitem_order_product_idx'),
+            # Distinct orders per product.
+            models.Index(fields=['product', 'order'], name='orderitem_product_order_idx'),
+            # Reports, sales data and rollup rebuilds by date range.
+            models.Index(fields=['order_date', 'product'], name='orderitem_date_product_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity}"
 
+    def save(self, *args, **kwargs):
+        if self.order_date is None:
+            self.order_date = self.order.order_date
+        check_writable(self.order_date)
+        super().save(*args, **kwargs)
+
+
+class ArchivedOrderItem(models.Model):
+    # Line items of archived months, moved out of OrderItem by
+    # analytics.partitions.archive_month with their ids unchanged. Only
+    # queries routed through analytics.partitions read this table.
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(Order, related_name='archived_items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='archived_order_items', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    price_at_time_of_order = models.DecimalField(max_digits=10, decimal_places=2)
+    order_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date', 'product'], name='archiveditem_date_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.quantity} (archived)"
+
+    def save(self, *args, **kwargs):
+        # Archived months are read only; archive_month and restore_month
+        # move rows without save().
+        check_writable(self.order_date)
+        super().save(*args, **kwargs)
+
+
+class SalesArchiveMonth(models.Model):
+    # One row per calendar month whose line items live in ArchivedOrderItem.
+    month = models.DateField(unique=True)
+    items = models.BigIntegerField(default=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.items} items archived)"
+
 
 @receiver(post_save, sender=OrderItem)
-def update_inventory(sender, instance, **kwargs):
-    inventory = instance.product.inventory
-    if inventory:
-        inventory.quantity -= instance.quantity
-        inventory.save()
+def update_inventory(sender, instance, created, **kwargs):
+    # Stock is taken once, when the item is created, with an atomic
+    # decrement in the database rather than a read-modify-write.
+    if not created:
+        return
+    Inventory.objects.decrement(instance.product_id, instance.quantity)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # shortages: {product_id: (requested, available)}; available is None
+        # for products without an Inventory row.
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for products {sorted(shortages)}")
+
+
+class InventoryManager(models.Manager):
+    def decrement_many(self, quantities):
+        # quantities: {product_id: units}. One UPDATE decrements every product,
+        # each guarded by quantity >= units; if any product is short, nothing
+        # is changed and InsufficientStock is raised.
+        condition = models.Q()
+        cases = []
+        for product_id, units in quantities.items():
+            condition |= models.Q(product_id=product_id, quantity__gte=units)
+            cases.append(models.When(product_id=product_id, then=F('quantity') - units))
+        if not cases:
+            return 0
+        try:
+            with transaction.atomic():
+                updated = self.filter(condition).update(
+                    quantity=models.Case(*cases, output_field=models.PositiveIntegerField())
+                )
+                if updated != len(quantities):
+                    raise InsufficientStock({})
+                self.report_low_stock(quantities)
+        except InsufficientStock:
+            available = dict(self.filter(product_id__in=quantities).values_list('product_id', 'quantity'))
+            raise InsufficientStock({
+                product_id: (units, available.get(product_id))
+                for product_id, units in quantities.items()
+                if available.get(product_id) is None or available[product_id] < units
+            })
+        return updated
+
+    def decrement(self, product_id, units):
+        # Unguarded single-product decrement for order items saved directly.
+        updated = self.filter(product_id=product_id).update(quantity=F('quantity') - units)
+        if updated:
+            self.report_low_stock({product_id: units})
+        return updated
+
+    def report_low_stock(self, decrements):
+        # decrements: {product_id: units just taken}. Only rows now under
+        # their threshold are read back; the old quantity follows from the
+        # decrement, so crossings are detected without reading the row
+        # before the update.
+        rows = self.filter(
+            product_id__in=decrements,
+            quantity__lt=Coalesce(F('low_stock_threshold'), Value(default_threshold())),
+        ).values_list('product_id', 'quantity', 'low_stock_threshold')
+        dispatcher.enqueue(low_stock_events(
+            (product_id, quantity + decrements[product_id], quantity, threshold)
+            for product_id, quantity, threshold in rows
+        ))
+
+    def increment_many(self, quantities):
+        cases = [models.When(product_id=product_id, then=F('quantity') + units) for product_id, units in quantities.items()]
+        if not cases:
+            return 0
+        return self.filter(product_id__in=quantities).update(
+            quantity=models.Case(*cases, output_field=models.PositiveIntegerField())
+        )
 
 
 class Inventory(models.Model):
     product = models.OneToOneField(Product, related_name='inventory', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     last_restocked_date = models.DateField()
+    # Alerts fire when quantity drops below this; null uses
+    # ANALYTICS_LOW_STOCK_THRESHOLD.
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = InventoryManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quantity'], name='inventory_quantity_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} in stock"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+
     def save(self, *args, **kwargs):
-        
-        if self.quantity < 10:
-            
-            print(f"Alert: {self.product.name} is low in stock!")
         super().save(*args, **kwargs)
+        # Compared against the quantity this instance was loaded with, so
+        # only a save that takes stock below the threshold alerts.
+        dispatcher.enqueue(low_stock_events([
+            (self.product_id, getattr(self, '_loaded_quantity', None), self.quantity, self.low_stock_threshold)
+        ]))
+        self._loaded_quantity = self.quantity
+
+
+class LowStockAlert(models.Model):
+    product = models.ForeignKey(Product, related_name='low_stock_alerts', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    threshold = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.product_id} below {self.threshold} ({self.quantity} left)"
+
+
+
+class ReservationConflict(Exception):
+    pass
+
+
+class InventoryReservationManager(models.Manager):
+    def reserve(self, key, quantities):
+        # Takes stock for a whole order at once. Replaying a key returns the
+        # original reservation instead of taking stock again; returns
+        # (reservation, created).
+        quantities = {int(product_id): units for product_id, units in quantities.items()}
+        try:
+            with transaction.atomic():
+                reservation = self.create(idempotency_key=key, quantities=_encode_quantities(quantities))
+                Inventory.objects.decrement_many(quantities)
+        except IntegrityError:
+            reservation = self.get(idempotency_key=key)
+            if reservation.get_quantities() != quantities:
+                raise ReservationConflict(f"Idempotency key '{key}' was used for a different reservation.")
+            return reservation, False
+        return reservation, True
+
+    def release(self, key):
+        # The status flip is a conditional UPDATE, so stock is returned exactly
+        # once however many times (or concurrently) release is called.
+        with transaction.atomic():
+            released = self.filter(idempotency_key=key, status=InventoryReservation.RESERVED).update(
+                status=InventoryReservation.RELEASED, released_at=timezone.now()
+            )
+            reservation = self.get(idempotency_key=key)
+            if released:
+                Inventory.objects.increment_many(reservation.get_quantities())
+        return reservation, bool(released)
+
+
+def _encode_quantities(quantities):
+    return sorted([product_id, units] for product_id, units in quantities.items())
+
+
+class InventoryReservation(models.Model):
+    RESERVED = 'reserved'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (RESERVED, 'Reserved'),
+        (RELEASED, 'Released'),
+    ]
+
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    # [[product_id, units], ...] sorted by product id.
+    quantities = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RESERVED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    objects = InventoryReservationManager()
+
+    def __str__(self):
+        return f"Reservation {self.idempotency_key} ({self.status})"
+
+    def get_quantities(self):
+        return {product_id: units for product_id, units in self.quantities}
+
+
+class ReportJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    format = models.CharField(max_length=20, default='xlsx')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_total = models.PositiveBigIntegerField(null=True, blank=True)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Touched as the worker starts and after every chunk; see
+    # analytics.jobs.fail_stale_jobs.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Report {self.year}-{self.month:02d} ({self.format}) - {self.status}"
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+
+class ReportArtifact(models.Model):
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    format = models.CharField(max_length=20)
+    ready = models.BooleanField(default=False)
+    file_path = models.CharField(max_length=500, blank=True)
+    etag = models.CharField(max_length=64, blank=True)
+    row_count = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'format'], name='unique_report_artifact'),
+        ]
+
+    def __str__(self):
+        return f"Cached report {self.year}-{self.month:02d} ({self.format})"
+
+    @classmethod
+    def invalidate(cls, when):
+        when = timezone.localtime(when)
+        # Only closed months are ever cached, and new orders almost always land
+        # in the current one, so skip the query on the common write path.
+        now = timezone.localtime()
+        if (when.year, when.month) >= (now.year, now.month):
+            return
+        artifacts = list(cls.objects.filter(year=when.year, month=when.month))
+        cls.objects.filter(pk__in=[artifact.pk for artifact in artifacts]).delete()
+        for artifact in artifacts:
+            if artifact.file_path and os.path.exists(artifact.file_path):
+                os.unlink(artifact.file_path)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_reports(sender, instance, **kwargs):
+    if instance.order_date:
+        ReportArtifact.invalidate(instance.order_date)
+    # An order moved to another month also leaves its old month's report.
+    previous = getattr(instance, '_previous_placement', None)
+    if previous is not None and previous[0] != instance.order_date:
+        ReportArtifact.invalidate(previous[0])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=ArchivedOrderItem)
+def invalidate_order_item_reports(sender, instance, **kwargs):
+    try:
+        order = instance.order
+    except Order.DoesNotExist:
+        # Deleted along with its order; the order's own receiver handles it.
+        return
+    ReportArtifact.invalidate(order.order_date)
 
+
+class DailySalesRollupManager(models.Manager):
+    def apply_changes(self, changes):
+        # changes: iterable of (date, product_id, category_id, country, quantity, revenue)
+        # deltas, already summed per key. Existing rows are read in one query
+        # and written back with bulk_update; missing keys are bulk-created.
+        changes = list(changes)
+        if not changes:
+            return
+        existing = {
+            (row.date, row.product_id, row.country): row
+            for row in self.filter(
+                date__in={change[0] for change in changes},
+                product_id__in={change[1] for change in changes},
+            )
+        }
+        to_update, to_create = [], []
+        for date, product_id, category_id, country, quantity, revenue in changes:
+            row = existing.get((date, product_id, country))
+            if row is None:
+                to_create.append(self.model(
+                    date=date, product_id=product_id, category_id=category_id,
+                    country=country, quantity=quantity, revenue=revenue,
+                ))
+            else:
+                row.quantity += quantity
+                row.revenue += revenue
+                to_update.append(row)
+        self.bulk_update(to_update, ['quantity', 'revenue'], batch_size=1000)
+        self.bulk_create(to_create, batch_size=1000)
+
+    def rebuild(self, start=None, end=None, batch_size=5000):
+        rollups = self.all()
+        # Pending change log entries for the rebuilt days are already reflected
+        # in the fact table and must not be folded in a second time.
+        pending = SalesChangeLog.objects.all()
+        if start:
+            rollups = rollups.filter(date__gte=start)
+            pending = pending.filter(date__gte=start)
+        if end:
+            rollups = rollups.filter(date__lte=end)
+            pending = pending.filter(date__lte=end)
+
+        # Live and archived items never share a month, so their groups are
+        # disjoint and can be inserted one after the other.
+        grouped = [
+            items.values(
+                'product_id',
+                day=TruncDate('order_date'),
+                category_id=F('product__category_id'),
+                country=F('order__customer__country'),
+            )
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('price_at_time_of_order') * F('quantity')))
+            .order_by()
+            for items in order_item_sources(start, end)
+        ]
+
+        created = 0
+        with transaction.atomic():
+            rollups.delete()
+            pending.delete()
+            batch = []
+            for row in chain.from_iterable(rows.iterator(chunk_size=batch_size) for rows in grouped):
+                batch.append(self.model(
+                    date=row['day'],
+                    product_id=row['product_id'],
+                    category_id=row['category_id'],
+                    country=row['country'],
+                    quantity=row['total_quantity'],
+                    revenue=row['total_revenue'],
+                ))
+                if len(batch) == batch_size:
+                    created += len(self.bulk_create(batch))
+                    batch = []
+            created += len(self.bulk_create(batch))
+            transaction.on_commit(lambda: sales_rollup_changed.send(sender=self.model))
+        return created
+
+
+class DailySalesRollup(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    country = models.CharField(max_length=100)
+    quantity = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    objects = DailySalesRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product', 'country'], name='unique_daily_sales_rollup'),
+        ]
+        indexes = [
+            # Per-product totals over a date range (SalesDataView).
+            models.Index(fields=['product', 'date'], name='rollup_product_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.country}: {self.quantity}"
+
+
+class SalesChangeLogManager(models.Manager):
+    def compact(self, batch_size=10000):
+        # Folds pending changes into DailySalesRollup in batches. Each batch
+        # locks the watermark row so concurrent compactors serialize, and only
+        # the exact log rows that were folded are deleted, so changes committed
+        # out of id order are never skipped.
+        drain_started = timezone.now()
+        folded = 0
+        changed_dates = set()
+        while True:
+            with transaction.atomic():
+                watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=RollupWatermark.DAILY_SALES)
+                ids = list(self.order_by('id').values_list('id', flat=True)[:batch_size])
+                if ids:
+                    deltas = (
+                        self.filter(id__in=ids)
+                        .values_list('date', 'product_id', 'category_id', 'country')
+                        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+                        .order_by()
+                    )
+                    deltas = list(deltas)
+                    DailySalesRollup.objects.apply_changes(deltas)
+                    changed_dates.update(delta[0] for delta in deltas)
+                    self.filter(id__in=ids).delete()
+                    watermark.last_change_id = max(watermark.last_change_id, ids[-1])
+                    folded += len(ids)
+                if len(ids) < batch_size:
+                    # Everything committed before this drain started is folded in.
+                    watermark.fresh_as_of = drain_started
+                watermark.save()
+            if len(ids) < batch_size:
+                if folded:
+                    sales_rollup_changed.send(sender=DailySalesRollup, dates=changed_dates)
+                return folded
+
+
+class SalesChangeLog(models.Model):
+    # Append-only deltas against DailySalesRollup, written on OrderItem/Order
+    # mutations and folded in bulk by SalesChangeLog.objects.compact().
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    country = models.CharField(max_length=100)
+    quantity = models.BigIntegerField()
+    revenue = models.DecimalField(max_digits=16, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SalesChangeLogManager()
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.country}: {self.quantity:+d}"
+
+
+class RollupWatermark(models.Model):
+    DAILY_SALES = 'daily_sales'
+    COPURCHASE = 'copurchase'
+    CUSTOMER_SIMILARITY = 'customer_similarity'
+
+    name = models.CharField(max_length=50, unique=True)
+    last_change_id = models.BigIntegerField(default=0)
+    fresh_as_of = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} as of {self.fresh_as_of}"
+
+    @classmethod
+    def fresh_as_of_for(cls, name):
+        return cls.objects.filter(name=name).values_list('fresh_as_of', flat=True).first()
+
+
+class ProductCoPurchase(models.Model):
+    # Top-K "bought together" neighbours per product, built offline by
+    # analytics.copurchase. count is the number of orders containing both
+    # products and score is count / sqrt(orders(product) * orders(related)).
+    product = models.ForeignKey(Product, related_name='copurchases', on_delete=models.CASCADE)
+    related_product = models.ForeignKey(Product, related_name='copurchased_with', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related_product'], name='unique_product_copurchase'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-score'], name='copurchase_product_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_product_id} ({self.score:.3f})"
+
+
+class CustomerSimilarity(models.Model):
+    # Top-K most similar customers per customer by purchased products, built
+    # in batch by analytics.similarity.
+    COSINE = 'cosine'
+    JACCARD = 'jaccard'
+    METRIC_CHOICES = [(COSINE, 'Cosine'), (JACCARD, 'Jaccard')]
+
+    customer = models.ForeignKey(Customer, related_name='similarities', on_delete=models.CASCADE)
+    similar_customer = models.ForeignKey(Customer, related_name='similar_to', on_delete=models.CASCADE)
+    shared_products = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES, default=COSINE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'similar_customer'], name='unique_customer_similarity'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', '-score'], name='similarity_customer_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} ~ {self.similar_customer_id} ({self.score:.3f})"
+
+
+def _change_for(item, sign, order_date=None, country=None):
+    # Uses the relations already cached on the instance where possible.
+    order = item.order
+    quantity = sign * item.quantity
+    return SalesChangeLog(
+        date=timezone.localdate(order_date or order.order_date),
+        product_id=item.product_id,
+        category_id=item.product.category_id,
+        country=country or order.customer.country,
+        quantity=quantity,
+        revenue=quantity * Decimal(str(item.price_at_time_of_order)),
+    )
+
+
+def _same_change(a, b):
+    return (a.date, a.product_id, a.country, a.quantity, a.revenue) == (b.date, b.product_id, b.country, -b.quantity, -b.revenue)
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_previous_order_item(sender, instance, **kwargs):
+    instance._previous_change = None
+    if not instance._state.adding and instance.pk:
+        previous = OrderItem.objects.select_related('order__customer', 'product').filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._previous_change = _change_for(previous, -1)
+
+
+@receiver(post_save, sender=OrderItem)
+def log_order_item_change(sender, instance, created, **kwargs):
+    changes = [_change_for(instance, 1)]
+    previous = getattr(instance, '_previous_change', None)
+    if previous is not None:
+        if _same_change(changes[0], previous):
+            return
+        changes.append(previous)
+    SalesChangeLog.objects.bulk_create(changes)
+
+
+@receiver(pre_delete, sender=OrderItem)
+@receiver(pre_delete, sender=ArchivedOrderItem)
+def log_order_item_delete(sender, instance, **kwargs):
+    # pre_delete so the parent order is still readable during cascades.
+    # Archived items count in the rollup too; archiving itself deletes
+    # without signals.
+    _change_for(instance, -1).save()
+
+
+@receiver(post_delete, sender=ArchivedOrderItem)
+def uncount_archived_item(sender, instance, **kwargs):
+    SalesArchiveMonth.objects.filter(
+        month=month_start(timezone.localdate(instance.order_date))
+    ).update(items=F('items') - 1)
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_order(sender, instance, update_fields=None, **kwargs):
+    instance._previous_placement = None
+    if instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not {'order_date', 'customer', 'total_amount'} & set(update_fields):
+        return
+    instance._previous_placement = (
+        Order.objects.filter(pk=instance.pk)
+        .values_list('order_date', 'customer_id', 'customer__country', 'total_amount').first()
+    )
+    if instance._previous_placement is not None:
+        check_moves([(instance._previous_placement[0], instance.order_date)])
+
+
+@receiver(post_save, sender=Order)
+def log_order_move(sender, instance, created, **kwargs):
+    # Moving an order to another day or customer re-keys all of its items.
+    previous = getattr(instance, '_previous_placement', None)
+    if created or previous is None:
+        return
+    old_date, old_customer_id, old_country, _ = previous
+    if old_date == instance.order_date and old_customer_id == instance.customer_id:
+        return
+
+    Customer.objects.refresh_last_order_at({old_customer_id, instance.customer_id})
+    if old_date != instance.order_date:
+        instance.items.update(order_date=instance.order_date)
+        instance.archived_items.update(order_date=instance.order_date)
+
+    new_country = instance.customer.country
+    if timezone.localdate(old_date) == timezone.localdate(instance.order_date) and old_country == new_country:
+        return
+    changes = []
+    for item in chain(instance.items.select_related('product'), instance.archived_items.select_related('product')):
+        changes.append(_change_for(item, -1, order_date=old_date, country=old_country))
+        changes.append(_change_for(item, 1))
+    SalesChangeLog.objects.bulk_create(changes)
+
+
+def _rekey_sales(old, **filters):
+    # Logs the sales of the line items matching filters as moved from the
+    # old rollup key (old: {'country': ...} or {'category_id': ...}) to the
+    # one they resolve to now: one -/+ pair per (day, product, category,
+    # country) group, summed in the database. Grouping the line items rather
+    # than the rollup also moves changes still waiting in the log.
+    changes = []
+    for items in order_item_sources():
+        grouped = items.filter(**filters).values(
+            'product_id',
+            day=TruncDate('order_date'),
+            category_id=F('product__category_id'),
+            country=F('order__customer__country'),
+        ).annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('price_at_time_of_order') * F('quantity'))).order_by()
+        for row in grouped:
+            current = {'date': row['day'], 'product_id': row['product_id'], 'category_id': row['category_id'], 'country': row['country']}
+            changes.append(SalesChangeLog(**{**current, **old}, quantity=-row['total_quantity'], revenue=-row['total_revenue']))
+            changes.append(SalesChangeLog(**current, quantity=row['total_quantity'], revenue=row['total_revenue']))
+    SalesChangeLog.objects.bulk_create(changes, batch_size=1000)
+
+
+@receiver(pre_save, sender=Customer)
+def remember_previous_country(sender, instance, update_fields=None, **kwargs):
+    instance._previous_country = None
+    if instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and 'country' not in update_fields:
+        return
+    instance._previous_country = Customer.objects.filter(pk=instance.pk).values_list('country', flat=True).first()
+
+
+@receiver(post_save, sender=Customer)
+def rekey_customer_sales(sender, instance, created, **kwargs):
+    # The rollup is keyed by country, so a customer changing country moves
+    # all of their sales.
+    previous = getattr(instance, '_previous_country', None)
+    if not created and previous is not None and previous != instance.country:
+        _rekey_sales({'country': previous}, order__customer_id=instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, update_fields=None, **kwargs):
+    instance._previous_category_id = None
+    if instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not {'category', 'category_id'} & set(update_fields):
+        return
+    instance._previous_category_id = Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def rekey_product_sales(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_category_id', None)
+    if not created and previous is not None and previous != instance.category_id:
+        _rekey_sales({'category_id': previous}, product_id=instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def update_customer_last_order(sender, instance, created, **kwargs):
+    # One single-row UPDATE adds the order to the customer's stats;
+    # last_order_at only moves forward.
+    if created:
+        Customer.objects.filter(pk=instance.customer_id).update(
+            last_order_at=models.Case(
+                models.When(
+                    models.Q(last_order_at__isnull=True) | models.Q(last_order_at__lt=instance.order_date),
+                    then=Value(instance.order_date),
+                ),
+                default=F('last_order_at'),
+            ),
+            lifetime_value=F('lifetime_value') + instance.total_amount,
+            order_count=F('order_count') + 1,
+        )
+
+
+@receiver(post_save, sender=Order)
+def update_customer_order_stats(sender, instance, created, **kwargs):
+    # Edits move the order's total between (or within) customers with F()
+    # deltas, so concurrent writes to the same customer do not clobber each
+    # other.
+    previous = getattr(instance, '_previous_placement', None)
+    if created or previous is None:
+        return
+    _, old_customer_id, _, old_total = previous
+    if old_customer_id == instance.customer_id:
+        if old_total != instance.total_amount:
+            Customer.objects.filter(pk=instance.customer_id).update(
+                lifetime_value=F('lifetime_value') + (Decimal(str(instance.total_amount)) - old_total)
+            )
+        return
+    Customer.objects.filter(pk=old_customer_id).update(
+        lifetime_value=F('lifetime_value') - old_total, order_count=F('order_count') - 1
+    )
+    Customer.objects.filter(pk=instance.customer_id).update(
+        lifetime_value=F('lifetime_value') + instance.total_amount, order_count=F('order_count') + 1
+    )
+
+
+@receiver(post_delete, sender=Order)
+def refresh_customer_last_order(sender, instance, **kwargs):
+    Customer.objects.refresh_last_order_at([instance.customer_id])
+    Customer.objects.filter(pk=instance.customer_id).update(
+        lifetime_value=F('lifetime_value') - instance.total_amount, order_count=F('order_count') - 1
+    )
+
+
+# Analytics cache invalidation. Sales sections read the rollup, so they only
+# go stale once compaction or a rebuild has changed it; churn reads orders and
+# customers directly. Invalidation waits for commit so a concurrent reader
+# cannot re-cache pre-commit data under the new generation.
+@receiver(sales_rollup_changed)
+def invalidate_sales_sections(sender, dates=None, **kwargs):
+    sections = ('revenue_by_category', 'top_products_by_country')
+    if dates is None:
+        analytics_cache.invalidate(*sections)
+    else:
+        analytics_cache.invalidate(*sections, scopes={date.strftime('%Y-%m') for date in dates})
+    # Ranked leaderboards and sales data pages are cached per range rather
+    # than per bucket.
+    analytics_cache.invalidate('top_products_ranked', 'sales_data')
+
+
+@receiver(post_save, sender=OrderItem)
+def record_heavy_hitter(sender, instance, created, **kwargs):
+    if not created or not leaderboards.enabled:
+        return
+    country = instance.order.customer.country
+    product_name = instance.product.name
+    transaction.on_commit(lambda: leaderboards.record(country, product_name, instance.quantity))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_churn_section(sender, **kwargs):
+    transaction.on_commit(lambda: analytics_cache.invalidate('churn_rate'))
+
+
+@receiver(post_save, sender=TaxRate)
+@receiver(post_delete, sender=TaxRate)
+def clear_tax_rates(sender, **kwargs):
+    transaction.on_commit(tax_rates.clear)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=TaxRate)
+@receiver(post_delete, sender=TaxRate)
+def invalidate_tax_summary_section(sender, **kwargs):
+    transaction.on_commit(lambda: analytics_cache.invalidate('tax_summary'))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=ArchivedOrderItem)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_sales_data_section(sender, **kwargs):
+    transaction.on_commit(lambda: analytics_cache.invalidate('sales_data'))
@@ -0,0 +1,97 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _after(ordering, position):
+    # (a, b) > (x, y) spelled out for the ORM as a > x OR (a = x AND b > y),
+    # with < for descending fields.
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = f"{name}__{'lt' if field.startswith('-') else 'gt'}"
+        condition |= Q(**equal, **{lookup: value})
+        equal[name] = value
+    return condition
+
+
+class KeysetCursorPagination(CursorPagination):
+    # Keyset pagination on every ordering field: the cursor holds the
+    # boundary row's values for all of them and the next page is an indexed
+    # range scan (WHERE (a, id) > (x, y) ORDER BY a, id LIMIT n) whatever its
+    # depth. DRF's CursorPagination keys on the first field only and skips
+    # ties with an offset capped at offset_cutoff, so long runs of equal
+    # values (every customer without orders has lifetime_value 0) never page
+    # through. The ordering must end in a unique field.
+    ordering = ('id',)
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = [_flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(_after(ordering, self.cursor.position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            position = json.loads(cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def position_of(self, item):
+        values = (
+            item[field.lstrip('-')] if isinstance(item, dict) else getattr(item, field.lstrip('-'))
+            for field in self.ordering
+        )
+        return json.dumps([str(value) for value in values])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.position_of(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.position_of(self.page[0])))
+
+
+class SalesDataPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,195 @@
+import heapq
+from datetime import date, datetime, time, timedelta
+from operator import itemgetter
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+
+# OrderItem holds the live months and ArchivedOrderItem the archived ones; a
+# month is in exactly one of them, as recorded by SalesArchiveMonth. Fact
+# queries over a date range go through order_item_sources so each only reads
+# the table(s) covering that range. Both models have the same columns, so
+# the returned querysets take the same lookups. Archived months are read
+# only: line items cannot be written to them or moved into or out of them
+# until the month is restored.
+
+ARCHIVE_BATCH_SIZE = 5000
+
+
+class ArchivedMonthError(Exception):
+    pass
+
+
+def _model(name):
+    return apps.get_model('analytics', name)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def months_between(start, end):
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archived_months():
+    return set(_model('SalesArchiveMonth').objects.values_list('month', flat=True))
+
+
+def _month(day):
+    return month_start(timezone.localdate(day))
+
+
+def check_writable(*days):
+    # Raises ArchivedMonthError if any of the datetimes falls in an archived
+    # month. Only past months can be archived, so items of the current month
+    # (every new order) need no lookup.
+    current = month_start(timezone.localdate())
+    months = {_month(day) for day in days if day is not None and _month(day) < current}
+    if not months:
+        return
+    archived = sorted(_model('SalesArchiveMonth').objects.filter(month__in=months).values_list('month', flat=True))
+    if archived:
+        months = ', '.join(f'{month:%Y-%m}' for month in archived)
+        raise ArchivedMonthError(f"Line items of archived months ({months}) cannot change; restore the month first.")
+
+
+def check_moves(moves):
+    # moves: (old, new) datetimes of orders changing date. Moves within one
+    # month keep their items in the same table and are always allowed.
+    check_writable(*(
+        day for old, new in moves if _month(old) != _month(new) for day in (old, new)
+    ))
+
+
+def _filter_range(queryset, start, end):
+    # start and end are inclusive local dates; either may be None.
+    if start:
+        queryset = queryset.filter(order_date__gte=day_start(start))
+    if end:
+        queryset = queryset.filter(order_date__lt=day_start(end + timedelta(days=1)))
+    return queryset
+
+
+def month_runs(months):
+    # Consecutive months collapsed into [first day, first day after) ranges.
+    runs = []
+    for month in sorted(months):
+        if runs and runs[-1][1] == month:
+            runs[-1][1] = next_month(month)
+        else:
+            runs.append([month, next_month(month)])
+    return runs
+
+
+def order_item_sources(start=None, end=None):
+    # Querysets of line items dated start..end (inclusive local dates, None
+    # for open ends): the live table unless every month in range is archived,
+    # and the archive only when some month in range is.
+    archived = archived_months()
+    if start and end:
+        months = set(months_between(start, end))
+        archived &= months
+        live = bool(months - archived)
+    else:
+        archived = {month for month in archived if (not start or month >= month_start(start)) and (not end or month <= end)}
+        live = True
+    sources = []
+    if live:
+        items = _filter_range(_model('OrderItem').objects.all(), start, end)
+        for first, following in month_runs(archived):
+            items = items.exclude(order_date__gte=day_start(first), order_date__lt=day_start(following))
+        sources.append(items)
+    if archived:
+        sources.append(_filter_range(_model('ArchivedOrderItem').objects.all(), start, end))
+    return sources
+
+
+def merged_values(sources, *fields, chunk_size=10000):
+    # values_list rows of every source streamed as one sequence ordered by
+    # the first field, for scans that group on it (orders, customers).
+    return heapq.merge(*(
+        source.values_list(*fields).order_by(fields[0]).iterator(chunk_size=chunk_size) for source in sources
+    ), key=itemgetter(0))
+
+
+def order_items_for_month(year, month):
+    # Every line item of one calendar month, from whichever table holds it.
+    first = date(year, month, 1)
+    [items] = order_item_sources(first, next_month(first) - timedelta(days=1))
+    return items
+
+
+def _month_items(model, month):
+    return _filter_range(model.objects.all(), month, next_month(month) - timedelta(days=1))
+
+
+def _move(source, target, batch_size):
+    # Copies rows (ids included) in primary key order, then deletes them from
+    # the source without loading them or sending delete signals: the items
+    # still exist, so nothing derived from them (rollup, stock, change log)
+    # may change.
+    columns = ['id', 'order_id', 'product_id', 'quantity', 'price_at_time_of_order', 'order_date']
+    moved = 0
+    batch = []
+    for row in source.order_by('pk').values_list(*columns).iterator(chunk_size=batch_size):
+        batch.append(target(**dict(zip(columns, row))))
+        if len(batch) == batch_size:
+            target.objects.bulk_create(batch)
+            moved += len(batch)
+            batch = []
+    target.objects.bulk_create(batch)
+    moved += len(batch)
+    source._raw_delete(source.db)
+    return moved
+
+
+def archive_month(month, batch_size=ARCHIVE_BATCH_SIZE):
+    # Moves a past month's line items into the archive. Running it again for
+    # an archived month moves nothing.
+    month = month_start(month)
+    if month >= month_start(timezone.localdate()):
+        raise ArchivedMonthError(f"{month:%Y-%m} is not over yet and cannot be archived.")
+    OrderItem = _model('OrderItem')
+    with transaction.atomic():
+        record, _ = _model('SalesArchiveMonth').objects.select_for_update().get_or_create(month=month)
+        moved = _move(_month_items(OrderItem, month), _model('ArchivedOrderItem'), batch_size)
+        record.items += moved
+        record.archived_at = timezone.now()
+        record.save()
+    return moved
+
+
+def restore_month(month, batch_size=ARCHIVE_BATCH_SIZE):
+    # Moves an archived month back into OrderItem.
+    month = month_start(month)
+    with transaction.atomic():
+        deleted, _ = _model('SalesArchiveMonth').objects.filter(month=month).delete()
+        if not deleted:
+            return 0
+        return _move(_month_items(_model('ArchivedOrderItem'), month), _model('OrderItem'), batch_size)
+
+
+def archivable_months(keep_months):
+    # Live months with line items that lie wholly before the most recent
+    # keep_months calendar months (the current month included).
+    cutoff = month_start(timezone.localdate())
+    for _ in range(keep_months - 1):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    oldest = _model('OrderItem').objects.filter(order_date__lt=day_start(cutoff)).order_by('order_date').values_list('order_date', flat=True).first()
+    if oldest is None:
+        return []
+    return [month for month in months_between(timezone.localdate(oldest), cutoff - timedelta(days=1))]
@@ -1,29 +1,149 @@
-from django.db.models import Q
-from .models import Product, Customer, OrderItem
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q, Sum
+from .models import Product, Customer, CustomerSimilarity, ProductCoPurchase
+from .partitions import order_item_sources
+from .serializers import CustomerValuesSerializer, ProductValuesSerializer
+
+# Columns the recommendation payloads render; category is loaded as its raw
+# category_id so no Category query is needed per product.
+PRODUCT_FIELDS = ('id', 'name', 'description', 'SKU', 'price', 'category')
+CUSTOMER_FIELDS = ('id', 'name', 'email')
+PRODUCT_VALUES = ('id', 'name', 'description', 'SKU', 'price', 'category_id')
+
+product_serializer = ProductValuesSerializer(PRODUCT_VALUES)
+customer_serializer = CustomerValuesSerializer(CUSTOMER_FIELDS)
+
+
+def purchased_by(lookup, customer):
+    # Q matching `lookup` against the products the customer bought, live or
+    # archived: one product_id subquery per table holding line items.
+    return reduce(or_, (
+        Q(**{lookup: items.filter(order__customer=customer).values('product_id')})
+        for items in order_item_sources()
+    ))
+
 
 class RecommendationEngine:
+    default_limit = 20
+    max_limit = 100
+
     def __init__(self, customer):
         self.customer = customer
 
+    @classmethod
+    def _limit(cls, limit):
+        if not limit or limit < 1:
+            return cls.default_limit
+        return min(limit, cls.max_limit)
+
+    @classmethod
+    def bulk(cls, customer_ids, limit=None, chunk_size=1000):
+        # Yields one recommendations dict per customer id, in the order given.
+        # Each chunk of customers costs a fixed number of set-based queries
+        # however many customers, orders or candidates it covers.
+        limit = cls._limit(limit)
+        in_stock = [
+            product_serializer.to_representation(row) for row in
+            Product.objects.filter(inventory__quantity__gt=0).values(*PRODUCT_VALUES).order_by('id')[:limit]
+        ]
+        for start in range(0, len(customer_ids), chunk_size):
+            yield from cls._bulk_chunk(customer_ids[start:start + chunk_size], limit, in_stock)
+
+    @classmethod
+    def _bulk_chunk(cls, customer_ids, limit, in_stock):
+        known = set(Customer.objects.filter(id__in=customer_ids).values_list('id', flat=True))
+
+        owned = defaultdict(set)
+        for items in order_item_sources():
+            for customer_id, product_id in items.filter(
+                order__customer_id__in=known
+            ).values_list('order__customer_id', 'product_id').distinct():
+                owned[customer_id].add(product_id)
+        owned_ids = set().union(*owned.values())
+
+        co_purchases = defaultdict(list)
+        for product_id, related_id, score in ProductCoPurchase.objects.filter(
+            product_id__in=owned_ids
+        ).values_list('product_id', 'related_product_id', 'score'):
+            co_purchases[product_id].append((related_id, score))
+
+        candidates = {}
+        for customer_id, product_ids in owned.items():
+            scores = defaultdict(float)
+            for product_id in product_ids:
+                for related_id, score in co_purchases[product_id]:
+                    if related_id not in product_ids:
+                        scores[related_id] += score
+            candidates[customer_id] = sorted(scores, key=lambda pk: (-scores[pk], pk))[:limit]
+
+        products = {
+            row['id']: product_serializer.to_representation(row) for row in Product.objects.filter(
+                id__in=owned_ids.union(*candidates.values())
+            ).values(*PRODUCT_VALUES)
+        }
+
+        similar = defaultdict(list)
+        for row in CustomerSimilarity.objects.filter(customer_id__in=known).values(
+            'customer_id', 'similar_customer_id', 'similar_customer__name', 'similar_customer__email'
+        ).order_by('customer_id', '-score', 'similar_customer_id'):
+            if len(similar[row['customer_id']]) < limit:
+                similar[row['customer_id']].append({
+                    "id": row['similar_customer_id'],
+                    "name": row['similar_customer__name'],
+                    "email": row['similar_customer__email'],
+                })
+
+        for customer_id in customer_ids:
+            if customer_id not in known:
+                yield {"customer_id": customer_id, "error": "Customer not found."}
+                continue
+            yield {
+                "customer_id": customer_id,
+                "recommendations": {
+                    "order_history": [products[pk] for pk in sorted(owned[customer_id])[:limit]],
+                    "similar_customers": similar[customer_id],
+                    "in_stock": in_stock,
+                    "co_purchased": [products[pk] for pk in candidates.get(customer_id, [])],
+                },
+            }
+
     
-    def recommend_based_on_order_history(self):
+    def recommend_based_on_order_history(self, limit=None):
     
-        ordered_product_ids = OrderItem.objects.filter(order__customer=self.customer).values_list('product_id', flat=True).distinct()
-
-        
-        ordered_products = Product.objects.filter(id__in=ordered_product_ids)
+        ordered_products = Product.objects.filter(purchased_by('id__in', self.customer)).only(*PRODUCT_FIELDS).order_by('id')[:self._limit(limit)]
         return ordered_products
 
     
-    def recommend_based_on_similar_customers(self):
-    
+    def recommend_based_on_similar_customers(self, limit=None):
+        # Ranked neighbours precomputed by analytics.similarity; a single
+        # lookup on the (customer, -score) index.
         similar_customers = Customer.objects.filter(
-        orders__items__product__in=self.customer.orders.values_list('items__product', flat=True)
-    ).exclude(id=self.customer.id).distinct()
+            similar_to__customer=self.customer
+        ).only(*CUSTOMER_FIELDS).order_by('-similar_to__score', 'id')[:self._limit(limit)]
 
-        return similar_customers  
-    
-    def recommend_based_on_inventory(self):
+        return similar_customers
+
+    def recommend_based_on_inventory(self, limit=None):
        
-        in_stock_products = Product.objects.filter(inventory__quantity__gt=0).distinct()
+        in_stock_products = Product.objects.filter(inventory__quantity__gt=0).only(*PRODUCT_FIELDS).order_by('id')[:self._limit(limit)]
         return in_stock_products
+
+    def recommend_also_bought(self, product, limit=None):
+        # "Customers who bought X also bought": one lookup on the precomputed
+        # co-purchase index (see analytics.copurchase), served by its
+        # (product, -score) index.
+        return Product.objects.filter(
+            copurchased_with__product=product
+        ).only(*PRODUCT_FIELDS).order_by('-copurchased_with__score', 'id')[:self._limit(limit)]
+
+    def recommend_based_on_co_purchases(self, limit=None):
+        # Products frequently bought together with anything in the customer's
+        # history, excluding what they already own.
+        return Product.objects.filter(
+            purchased_by('copurchased_with__product__in', self.customer)
+        ).exclude(purchased_by('id__in', self.customer)).annotate(
+            co_purchase_score=Sum('copurchased_with__score')
+        ).only(*PRODUCT_FIELDS).order_by('-co_purchase_score', 'id')[:self._limit(limit)]
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .jobs import reports_root
+from .models import ReportArtifact
+from .reports import EXPORT_FORMATS
+
+
+# A placeholder older than this is assumed to belong to a builder that died.
+BUILD_TIMEOUT = timedelta(hours=1)
+
+
+def is_closed_month(report):
+    return report.end_date <= timezone.now()
+
+
+def _cache_dir():
+    path = os.path.join(reports_root(), 'cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _file_etag(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _claim(lookup):
+    artifact = ReportArtifact.objects.filter(**lookup).first()
+    if artifact is not None:
+        if artifact.ready and (not artifact.row_count or os.path.exists(artifact.file_path)):
+            return artifact, True
+        if not artifact.ready and artifact.created_at > timezone.now() - BUILD_TIMEOUT:
+            # Someone else is building it right now.
+            return None, False
+        artifact.delete()
+    try:
+        with transaction.atomic():
+            return ReportArtifact.objects.create(**lookup), False
+    except IntegrityError:
+        return None, False
+
+
+def get_or_build(report, export_format):
+    # The placeholder row is created before building and only marked ready if it
+    # still exists afterwards, so an invalidation that lands mid-build wins.
+    # When the result cannot be cached the returned artifact is unsaved (no pk)
+    # and its file should be deleted once it has been served.
+    lookup = {'year': report.year, 'month': report.month, 'format': export_format}
+    placeholder, hit = _claim(lookup)
+    if hit:
+        return placeholder
+
+    extension, _ = EXPORT_FORMATS[export_format]
+    path = os.path.join(_cache_dir(), f'{report.year}-{report.month:02d}-{uuid.uuid4().hex}.{extension}')
+    try:
+        with open(path, 'wb') as fh:
+            report.write(export_format, fh)
+    except Exception:
+        os.unlink(path)
+        if placeholder is not None:
+            placeholder.delete()
+        raise
+
+    fields = {'ready': True, 'row_count': report.row_count, 'file_path': '', 'etag': ''}
+    if report.row_count:
+        fields.update(file_path=path, etag=_file_etag(path))
+    else:
+        os.unlink(path)
+
+    if placeholder is not None and ReportArtifact.objects.filter(pk=placeholder.pk).update(**fields):
+        placeholder.refresh_from_db()
+        return placeholder
+
+    return ReportArtifact(**lookup, **fields)
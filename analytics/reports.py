@@ -0,0 +1,315 @@
+import csv
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import MAXYEAR, MINYEAR, datetime
+from itertools import chain
+
+from django.db.models import F, Sum
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .partitions import order_items_for_month
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+REPORT_HEADERS = ['Product Name', 'Quantity Sold', 'Price at Time of Order', 'Total Revenue']
+RECORD_FIELDS = ['product_id', 'product_name', 'quantity', 'price', 'revenue']
+
+# format name -> (file extension, content type)
+EXPORT_FORMATS = {
+    'xlsx': ('xlsx', XLSX_CONTENT_TYPE),
+    'csv': ('csv', 'text/csv'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+    'columnar': ('ecol', 'application/octet-stream'),
+}
+
+# Columnar layout: COLUMNAR_MAGIC, then row groups of
+#   uint32 row count, int64[n] product_id, int64[n] quantity, int64[n] price in cents,
+#   uint32 length + JSON object {product_id: name} for products first seen in the group,
+# terminated by a row count of 0. All integers are little-endian.
+COLUMNAR_MAGIC = b'ECOL1\n'
+ROW_GROUP_SIZE = 65536
+# Years a monthly report can cover: month_range and the conversion to local
+# time stay inside datetime's range.
+MIN_REPORT_YEAR = MINYEAR + 1
+MAX_REPORT_YEAR = MAXYEAR - 1
+
+
+def month_range(year, month):
+    # Half-open [start, end) range so orders placed exactly at midnight on the
+    # first of the next month are not counted twice.
+    start_date = timezone.make_aware(datetime(year, month, 1))
+    if month < 12:
+        end_date = timezone.make_aware(datetime(year, month + 1, 1))
+    else:
+        end_date = timezone.make_aware(datetime(year + 1, 1, 1))
+    return start_date, end_date
+
+
+def stream_file(path, chunk_size=64 * 1024, delete=False, start=0, length=None):
+    try:
+        with open(path, 'rb') as fh:
+            fh.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = fh.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    finally:
+        if delete:
+            os.unlink(path)
+
+
+def _int64_column(values):
+    column = array('q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_csv(records, batch_size=ROW_GROUP_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RECORD_FIELDS)
+    pending = 0
+    for product_id, product_name, quantity, price in records:
+        writer.writerow([product_id, product_name, quantity, price, quantity * price])
+        pending += 1
+        if pending == batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode()
+
+
+def encode_jsonl(records, batch_size=ROW_GROUP_SIZE):
+    lines = []
+    for product_id, product_name, quantity, price in records:
+        # Decimals are emitted as strings so no precision is lost in transit.
+        lines.append(json.dumps({
+            'product_id': product_id,
+            'product_name': product_name,
+            'quantity': quantity,
+            'price': str(price),
+            'revenue': str(quantity * price),
+        }))
+        if len(lines) == batch_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def encode_columnar(records, row_group_size=ROW_GROUP_SIZE):
+    yield COLUMNAR_MAGIC
+    known_products = set()
+    while True:
+        product_ids, quantities, prices, new_names = [], [], [], {}
+        for product_id, product_name, quantity, price in records:
+            product_ids.append(product_id)
+            quantities.append(quantity)
+            prices.append(int(price.scaleb(2)))
+            if product_id not in known_products:
+                known_products.add(product_id)
+                new_names[str(product_id)] = product_name
+            if len(product_ids) == row_group_size:
+                break
+        if not product_ids:
+            break
+        names = json.dumps(new_names).encode()
+        yield b''.join([
+            struct.pack('<I', len(product_ids)),
+            _int64_column(product_ids),
+            _int64_column(quantities),
+            _int64_column(prices),
+            struct.pack('<I', len(names)),
+            names,
+        ])
+    yield struct.pack('<I', 0)
+
+
+def read_columnar(fileobj):
+    if fileobj.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar sales report.")
+    columns = {'product_id': array('q'), 'quantity': array('q'), 'price_cents': array('q')}
+    product_names = {}
+    while True:
+        (count,) = struct.unpack('<I', fileobj.read(4))
+        if not count:
+            break
+        for name in ('product_id', 'quantity', 'price_cents'):
+            column = array('q')
+            column.frombytes(fileobj.read(count * column.itemsize))
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns[name].extend(column)
+        (names_length,) = struct.unpack('<I', fileobj.read(4))
+        for product_id, product_name in json.loads(fileobj.read(names_length)).items():
+            product_names[int(product_id)] = product_name
+    return columns, product_names
+
+
+def iter_in_chunks(queryset, *fields, chunk_size=2000):
+    # Keyset batches on the primary key (WHERE pk > last ORDER BY pk LIMIT n).
+    # The MySQL driver buffers a whole result set on the client, which
+    # .iterator(chunk_size=...) does not change, so a single query would hold
+    # the entire month in memory; separate bounded queries keep at most one
+    # chunk in memory whatever the row count.
+    rows = queryset.order_by('pk').values_list('pk', *fields)
+    last = None
+    while True:
+        chunk = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'jsonl': encode_jsonl,
+    'columnar': encode_columnar,
+}
+
+
+class MonthlySalesReport:
+    chunk_size = 2000
+
+    def __init__(self, year, month, chunk_size=None, aggregate_in_db=False, progress_callback=None):
+        self.year = year
+        self.month = month
+        self.start_date, self.end_date = month_range(year, month)
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        # When set, per-product subtotals come from one grouped query instead
+        # of being accumulated in Python while the rows stream past.
+        self.aggregate_in_db = aggregate_in_db
+        # Called with the number of rows written so far, once per chunk.
+        self.progress_callback = progress_callback
+        self._queryset = None
+        self.row_count = 0
+        self.total_quantity = 0
+        self.total_revenue = 0
+        self.product_totals = {}
+
+    @property
+    def title(self):
+        return f'Sales Report {self.year}-{self.month:02d}'
+
+    def filename(self, extension='xlsx'):
+        return f'monthly_sales_report_{self.year}_{self.month:02d}.{extension}'
+
+    def get_queryset(self):
+        # Filtered on the items' own order_date, from the live or the archive
+        # table depending on whether the month has been archived. The routing
+        # lookup is done once per report.
+        if self._queryset is None:
+            self._queryset = order_items_for_month(self.year, self.month)
+        return self._queryset
+
+    def iter_records(self):
+        return iter_in_chunks(
+            self.get_queryset(), 'product_id', 'product__name', 'quantity', 'price_at_time_of_order',
+            chunk_size=self.chunk_size,
+        )
+
+    def _counted(self, records):
+        self.row_count = 0
+        for record in records:
+            self.row_count += 1
+            if self.progress_callback and self.row_count % self.chunk_size == 0:
+                self.progress_callback(self.row_count)
+            yield record
+
+    def open_stream(self, export_format):
+        # Pull the first record up front so an empty month can still be answered
+        # with a 404 before any bytes have been sent.
+        records = self.iter_records()
+        first = next(records, None)
+        if first is None:
+            return None
+        return ENCODERS[export_format](chain([first], records))
+
+    def iter_rows(self):
+        # One pass over the chunked rows produces the rows and every running
+        # total, so the queryset is never read a second time.
+        self.row_count = 0
+        self.total_quantity = 0
+        self.total_revenue = 0
+        self.product_totals = {}
+        track_products = not self.aggregate_in_db
+
+        rows = iter_in_chunks(
+            self.get_queryset(), 'product__name', 'quantity', 'price_at_time_of_order', chunk_size=self.chunk_size,
+        )
+        for product_name, quantity, price in rows:
+            total_revenue = quantity * price
+            self.row_count += 1
+            self.total_quantity += quantity
+            self.total_revenue += total_revenue
+            if track_products:
+                subtotal = self.product_totals.get(product_name)
+                if subtotal is None:
+                    self.product_totals[product_name] = [quantity, total_revenue]
+                else:
+                    subtotal[0] += quantity
+                    subtotal[1] += total_revenue
+            if self.progress_callback and self.row_count % self.chunk_size == 0:
+                self.progress_callback(self.row_count)
+            yield [product_name, quantity, price, total_revenue]
+
+    def get_product_totals(self):
+        if not self.aggregate_in_db:
+            return sorted(self.product_totals.items())
+        subtotals = (
+            self.get_queryset()
+            .values_list('product__name')
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('price_at_time_of_order') * F('quantity')))
+            .order_by('product__name')
+        )
+        return [(name, [quantity, revenue]) for name, quantity, revenue in subtotals]
+
+    def write_xlsx(self, fileobj):
+        # Write-only workbooks spool each row to disk instead of keeping a cell
+        # object per value and the rows are read a chunk at a time, so memory
+        # is bounded by the chunk size and the per-product totals, not the row
+        # count.
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=self.title)
+        sheet.append(REPORT_HEADERS)
+        for row in self.iter_rows():
+            sheet.append(row)
+        if self.row_count:
+            sheet.append([])
+            sheet.append(['Product Totals', 'Quantity Sold', '', 'Total Revenue'])
+            for product_name, (quantity, revenue) in self.get_product_totals():
+                sheet.append([product_name, quantity, '', revenue])
+        sheet.append(['Total Revenue', self.total_quantity, '', self.total_revenue])
+        workbook.save(fileobj)
+
+    def write(self, export_format, fileobj):
+        if export_format == 'xlsx':
+            self.write_xlsx(fileobj)
+            return
+        for chunk in ENCODERS[export_format](self._counted(self.iter_records())):
+            fileobj.write(chunk)
+
+    def build_to_tempfile(self, suffix='.xlsx'):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                self.write_xlsx(fh)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
@@ -1,7 +1,14 @@
 # serializers.py
 
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Product, Customer, Inventory, OrderItem, Order
+from rest_framework.settings import api_settings
+from .models import Product, Customer, Inventory, InventoryReservation, OrderItem, Order, ReportJob
+from .reports import EXPORT_FORMATS, MAX_REPORT_YEAR, MIN_REPORT_YEAR, iter_in_chunks
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,6 +19,7 @@ class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = '__all__'
+        read_only_fields = ['last_order_at', 'lifetime_value', 'order_count']
 
 class InventorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,3 +39,146 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'year', 'month', 'format', 'status', 'progress', 'rows_done', 'rows_total', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['status', 'rows_done', 'rows_total', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def validate_year(self, value):
+        if not (MIN_REPORT_YEAR <= value <= MAX_REPORT_YEAR):
+            raise serializers.ValidationError("Invalid year provided.")
+        return value
+
+    def validate_month(self, value):
+        if not (1 <= value <= 12):
+            raise serializers.ValidationError("Invalid month provided.")
+        return value
+
+    def validate_format(self, value):
+        if value not in EXPORT_FORMATS:
+            raise serializers.ValidationError(f"Unsupported format '{value}'.")
+        return value
+
+class ReservationItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+class InventoryReservationSerializer(serializers.ModelSerializer):
+    items = ReservationItemSerializer(many=True, write_only=True, allow_empty=False)
+    quantities = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InventoryReservation
+        fields = ['idempotency_key', 'items', 'quantities', 'status', 'created_at', 'released_at']
+        read_only_fields = ['status', 'created_at', 'released_at']
+        # Uniqueness is the idempotency check itself, handled by reserve().
+        extra_kwargs = {'idempotency_key': {'validators': []}}
+
+    def get_quantities(self, obj):
+        return [{'product_id': product_id, 'quantity': units} for product_id, units in obj.quantities]
+
+    def validate_items(self, items):
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+        return quantities
+
+class BatchRecommendationSerializer(serializers.Serializer):
+    customer_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500000)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+
+def _decimal_converter(field):
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+    coerce_to_string = api_settings.COERCE_DECIMAL_TO_STRING
+
+    def convert(value):
+        # Instances not reloaded from the database still hold whatever was
+        # assigned (an int or float); DRF converts those the same way.
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        value = value.quantize(quantum)
+        return format(value, 'f') if coerce_to_string else value
+    return convert
+
+
+def _datetime_converter(field):
+    def convert(value):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def _converter_for(field):
+    # Same output as the matching DRF field's to_representation.
+    if isinstance(field, models.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, models.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, models.DateField):
+        return lambda value: value.isoformat()
+    if isinstance(field, models.UUIDField):
+        return str
+    return None
+
+class ValuesSerializer:
+    # Read-only fast path for large listings. Rows come from .values() /
+    # .values_list() (or instances) and each column goes through a converter
+    # compiled once per serializer, matching what the ModelSerializer for the
+    # same model renders. Many-to-many fields are not supported.
+    model = None
+    fields = None
+
+    def __init__(self, fields=None):
+        names = fields or self.fields or [field.name for field in self.model._meta.concrete_fields]
+        unknown = []
+        self.columns = []
+        converters = []
+        for name in names:
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                unknown.append(name)
+                continue
+            if not field.concrete:
+                unknown.append(name)
+                continue
+            self.columns.append(field.attname)
+            converters.append(_converter_for(field))
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}."})
+        self.names = list(names)
+        self.converters = converters
+
+    def from_tuple(self, row):
+        return {
+            name: value if convert is None or value is None else convert(value)
+            for name, convert, value in zip(self.names, self.converters, row)
+        }
+
+    def to_representation(self, obj):
+        if isinstance(obj, dict):
+            return self.from_tuple([obj[column] for column in self.columns])
+        return self.from_tuple([getattr(obj, column) for column in self.columns])
+
+    def iter_queryset(self, queryset, chunk_size=2000):
+        for row in iter_in_chunks(queryset, *self.columns, chunk_size=chunk_size):
+            yield self.from_tuple(row)
+
+    def serialize(self, queryset):
+        return [self.from_tuple(row) for row in queryset.values_list(*self.columns)]
+
+class CustomerValuesSerializer(ValuesSerializer):
+    model = Customer
+
+class ProductValuesSerializer(ValuesSerializer):
+    model = Product
+
+class OrderValuesSerializer(ValuesSerializer):
+    model = Order
@@ -0,0 +1,104 @@
+import heapq
+import math
+from array import array
+from collections import Counter, defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CustomerSimilarity, RollupWatermark
+from .partitions import merged_values, order_item_sources
+
+
+DEFAULT_TOP_K = 20
+CHUNK_SIZE = 2000
+# Products bought by a large share of customers (bags, gift wrap) make every
+# pair of customers look alike and dominate the work, so they are left out of
+# the overlap counts, like stop words in text search.
+MAX_PRODUCT_BUYERS = 5000
+
+
+class PurchaseMatrix:
+    # Sparse binary customer x product matrix kept in both orientations:
+    # rows[c] is the sorted product ids customer c bought (CSR) and
+    # columns[p] the customer ids that bought product p (CSC).
+
+    def __init__(self, rows):
+        self.rows = rows
+        columns = defaultdict(lambda: array('q'))
+        for customer_id, products in rows.items():
+            for product_id in products:
+                columns[product_id].append(customer_id)
+        self.columns = dict(columns)
+
+    @classmethod
+    def from_order_items(cls, queryset=None):
+        # Live and archived line items unless a queryset is given.
+        sources = order_item_sources() if queryset is None else [queryset]
+        items = merged_values(sources, 'order__customer_id', 'product_id')
+        rows = {}
+        for customer_id, group in groupby(items, key=itemgetter(0)):
+            rows[customer_id] = array('q', sorted({product_id for _, product_id in group}))
+        return cls(rows)
+
+    def overlaps(self, customer_id, max_product_buyers=MAX_PRODUCT_BUYERS):
+        # One row of X . X^T: shared product counts against every customer
+        # that has at least one product in common.
+        counts = Counter()
+        for product_id in self.rows[customer_id]:
+            buyers = self.columns[product_id]
+            if max_product_buyers and len(buyers) > max_product_buyers:
+                continue
+            counts.update(buyers)
+        counts.pop(customer_id, None)
+        return counts
+
+
+def score(metric, shared, size_a, size_b):
+    if metric == CustomerSimilarity.JACCARD:
+        return shared / (size_a + size_b - shared)
+    return shared / math.sqrt(size_a * size_b)
+
+
+def top_similar(matrix, customer_ids, top_k=DEFAULT_TOP_K, metric=CustomerSimilarity.COSINE,
+                max_product_buyers=MAX_PRODUCT_BUYERS):
+    # Yields (customer_id, [(similar_id, shared, score), ...]) best first.
+    for customer_id in customer_ids:
+        size = len(matrix.rows[customer_id])
+        scored = (
+            (other_id, shared, score(metric, shared, size, len(matrix.rows[other_id])))
+            for other_id, shared in matrix.overlaps(customer_id, max_product_buyers).items()
+        )
+        yield customer_id, heapq.nlargest(top_k, scored, key=lambda row: (row[2], -row[0]))
+
+
+def rebuild(top_k=DEFAULT_TOP_K, metric=CustomerSimilarity.COSINE, chunk_size=CHUNK_SIZE,
+            max_product_buyers=MAX_PRODUCT_BUYERS):
+    matrix = PurchaseMatrix.from_order_items()
+    customer_ids = sorted(matrix.rows)
+    stored = 0
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=RollupWatermark.CUSTOMER_SIMILARITY
+        )
+        CustomerSimilarity.objects.all().delete()
+        for start in range(0, len(customer_ids), chunk_size):
+            chunk = customer_ids[start:start + chunk_size]
+            similarities = [
+                CustomerSimilarity(
+                    customer_id=customer_id,
+                    similar_customer_id=other_id,
+                    shared_products=shared,
+                    score=value,
+                    metric=metric,
+                )
+                for customer_id, neighbours in top_similar(matrix, chunk, top_k, metric, max_product_buyers)
+                for other_id, shared, value in neighbours
+            ]
+            CustomerSimilarity.objects.bulk_create(similarities, batch_size=5000)
+            stored += len(similarities)
+        watermark.fresh_as_of = timezone.now()
+        watermark.save()
+    return stored
@@ -0,0 +1,63 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+
+RATE_FIELD = models.DecimalField(max_digits=5, decimal_places=4)
+TAX_FIELD = models.DecimalField(max_digits=16, decimal_places=6)
+
+
+class TaxRateTable:
+    # The TaxRate table is small and read on every tax computation, so it is
+    # held in process memory. A write in this process clears it at once;
+    # other processes pick the change up within ANALYTICS_TAX_RATES_TTL.
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._rates = None
+        self._loaded_at = 0
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'ANALYTICS_TAX_RATES_TTL', 300)
+
+    def rates(self):
+        # {country: Decimal rate}
+        with self._lock:
+            if self._rates is None or time.monotonic() - self._loaded_at > self.ttl:
+                TaxRate = apps.get_model('analytics', 'TaxRate')
+                self._rates = dict(TaxRate.objects.values_list('country', 'rate'))
+                self._loaded_at = time.monotonic()
+            return self._rates
+
+    def rate_for(self, country):
+        return self.rates().get(country, Decimal('0'))
+
+    def clear(self):
+        with self._lock:
+            self._rates = None
+
+
+tax_rates = TaxRateTable()
+
+
+def rate_expression(country_field='customer__country'):
+    # One CASE over the rate table; countries without a rate are taxed at 0.
+    cases = [models.When(**{country_field: country}, then=models.Value(rate)) for country, rate in tax_rates.rates().items()]
+    return models.Case(*cases, default=models.Value(Decimal('0')), output_field=RATE_FIELD)
+
+
+def tax_expression(amount_field='total_amount', country_field='customer__country'):
+    return models.ExpressionWrapper(models.F(amount_field) * rate_expression(country_field), output_field=TAX_FIELD)
+
+
+def annotate_tax(orders):
+    # Adds `tax` to every order of the queryset in the same query.
+    return orders.annotate(tax=tax_expression())
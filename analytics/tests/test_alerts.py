@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from analytics.alerts import AlertDispatcher, LowStockEvent, crossed
+from analytics.models import Category, Customer, Inventory, LowStockAlert, Order, OrderItem, Product
+
+
+class RecordingSink:
+
+    def __init__(self):
+        self.batches = []
+
+    def send(self, events, names):
+        self.batches.append([(event.product_id, event.quantity, names.get(event.product_id)) for event in events])
+
+
+class NamedDispatcher(AlertDispatcher):
+
+    def product_names(self, product_ids):
+        return {product_id: f'product-{product_id}' for product_id in product_ids}
+
+
+def event(product_id, quantity):
+    return LowStockEvent(product_id, quantity, 10, datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+class AlertDispatcherTests(SimpleTestCase):
+
+    def test_only_downward_crossings_alert(self):
+        self.assertTrue(crossed(10, 9, 10))
+        self.assertTrue(crossed(None, 3, 10))
+        self.assertFalse(crossed(9, 8, 10))
+        self.assertFalse(crossed(12, 10, 10))
+
+    def test_batch_keeps_latest_event_per_product(self):
+        sink = RecordingSink()
+        NamedDispatcher(sinks=[sink]).dispatch([event(1, 9), event(2, 4), event(1, 7)])
+
+        self.assertEqual(sink.batches, [[(1, 7, 'product-1'), (2, 4, 'product-2')]])
+
+    def test_failing_sink_does_not_stop_others(self):
+        class BrokenSink:
+            def send(self, events, names):
+                raise ConnectionError
+
+        sink = RecordingSink()
+        with self.assertLogs('analytics.alerts', 'ERROR'):
+            NamedDispatcher(sinks=[BrokenSink(), sink]).dispatch([event(1, 9)])
+
+        self.assertEqual(len(sink.batches), 1)
+
+    def test_background_worker_delivers_queued_events(self):
+        sink = RecordingSink()
+        dispatcher = NamedDispatcher(sinks=[sink], maxsize=10, batch_size=10)
+
+        dispatcher._submit([event(1, 9), event(2, 3)])
+        dispatcher.flush()
+
+        self.assertEqual(sorted(item for batch in sink.batches for item in batch), [(1, 9, 'product-1'), (2, 3, 'product-2')])
+
+
+@override_settings(ANALYTICS_LOW_STOCK_ALERTS_ALWAYS_EAGER=True, ANALYTICS_LOW_STOCK_WEBHOOK_URL='')
+class LowStockAlertTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=category)
+        self.inventory = Inventory.objects.create(product=self.phone, quantity=12, last_restocked_date='2023-01-01')
+        customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        self.order = Order.objects.create(customer=customer, total_amount=200)
+
+    def sell(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=self.order, product=self.phone, quantity=quantity, price_at_time_of_order=100)
+
+    def test_sale_crossing_threshold_alerts_once(self):
+        with self.assertLogs('analytics.alerts', 'WARNING'):
+            self.sell(3)
+        self.sell(1)
+
+        self.assertEqual(list(LowStockAlert.objects.values_list('quantity', 'threshold')), [(9, 10)])
+
+    def test_per_product_threshold(self):
+        Inventory.objects.filter(pk=self.inventory.pk).update(low_stock_threshold=5)
+
+        self.sell(3)
+        self.assertFalse(LowStockAlert.objects.exists())
+        self.sell(5)
+        self.assertEqual(list(LowStockAlert.objects.values_list('quantity', 'threshold')), [(4, 5)])
+
+    def test_inventory_save_compares_with_loaded_quantity(self):
+        inventory = Inventory.objects.get(pk=self.inventory.pk)
+
+        inventory.quantity = 5
+
+        # The save itself is a single UPDATE; the product is not loaded.
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            inventory.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.save()
+
+        self.assertEqual(LowStockAlert.objects.count(), 1)
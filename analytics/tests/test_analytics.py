@@ -0,0 +1,331 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from analytics.analytics import SalesAnalytics
+from analytics.models import Category, Customer, DailySalesRollup, Inventory, Order, OrderItem, Product, RollupWatermark, SalesChangeLog
+
+
+class SalesRollupTestCase(TestCase):
+
+    def setUp(self):
+        self.electronics = Category.objects.create(name='Electronics')
+        self.furniture = Category.objects.create(name='Furniture')
+        self.phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=self.electronics)
+        self.chair = Product.objects.create(name='Chair', SKU='SKU-C', price=50, category=self.furniture)
+        Inventory.objects.create(product=self.phone, quantity=100, last_restocked_date='2023-01-01')
+        Inventory.objects.create(product=self.chair, quantity=100, last_restocked_date='2023-01-01')
+        self.uk_customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        self.us_customer = Customer.objects.create(name='US', email='us@example.com', country='USA', registration_date='2023-01-01')
+
+        self.uk_order = Order.objects.create(customer=self.uk_customer, total_amount=250)
+        self.phone_item = OrderItem.objects.create(order=self.uk_order, product=self.phone, quantity=2, price_at_time_of_order=100)
+        OrderItem.objects.create(order=self.uk_order, product=self.chair, quantity=1, price_at_time_of_order=50)
+        us_order = Order.objects.create(customer=self.us_customer, total_amount=150)
+        OrderItem.objects.create(order=us_order, product=self.chair, quantity=3, price_at_time_of_order=50)
+        SalesChangeLog.objects.compact()
+
+        today = timezone.now()
+        self.analytics = SalesAnalytics(today - timedelta(days=1), today)
+
+
+class DailySalesRollupTests(SalesRollupTestCase):
+
+    def snapshot(self):
+        return sorted(DailySalesRollup.objects.values_list('date', 'product_id', 'category_id', 'country', 'quantity', 'revenue'))
+
+    def test_order_items_are_rolled_up_on_compaction(self):
+        self.assertEqual(DailySalesRollup.objects.count(), 3)
+        self.assertFalse(SalesChangeLog.objects.exists())
+        chair_uk = DailySalesRollup.objects.get(product=self.chair, country='UK')
+        self.assertEqual((chair_uk.quantity, chair_uk.revenue), (1, 50))
+
+    def test_writes_only_append_to_change_log(self):
+        OrderItem.objects.create(order=self.uk_order, product=self.chair, quantity=2, price_at_time_of_order=50)
+
+        self.assertEqual(SalesChangeLog.objects.count(), 1)
+        self.assertEqual(DailySalesRollup.objects.get(product=self.chair, country='UK').quantity, 1)
+
+        self.assertEqual(SalesChangeLog.objects.compact(), 1)
+        self.assertEqual(DailySalesRollup.objects.get(product=self.chair, country='UK').quantity, 3)
+
+    def test_resave_logs_difference(self):
+        self.phone_item.quantity = 5
+        self.phone_item.save()
+        SalesChangeLog.objects.compact()
+
+        phone_uk = DailySalesRollup.objects.get(product=self.phone, country='UK')
+        self.assertEqual((phone_uk.quantity, phone_uk.revenue), (5, 500))
+
+    def test_unchanged_resave_logs_nothing(self):
+        self.phone_item.save()
+
+        self.assertFalse(SalesChangeLog.objects.exists())
+
+    def test_order_moving_customer_rekeys_items(self):
+        self.uk_order.customer = self.us_customer
+        self.uk_order.save()
+        SalesChangeLog.objects.compact()
+
+        self.assertEqual(DailySalesRollup.objects.get(product=self.chair, country='USA').quantity, 4)
+        self.assertEqual(DailySalesRollup.objects.get(product=self.chair, country='UK').quantity, 0)
+
+    def test_customer_changing_country_rekeys_sales(self):
+        OrderItem.objects.create(order=self.uk_order, product=self.chair, quantity=2, price_at_time_of_order=50)
+
+        self.uk_customer.country = 'France'
+        self.uk_customer.save()
+        SalesChangeLog.objects.compact()
+
+        chair = dict(DailySalesRollup.objects.filter(product=self.chair).values_list('country', 'quantity'))
+        self.assertEqual(chair, {'UK': 0, 'France': 3, 'USA': 3})
+
+    def test_product_changing_category_rekeys_sales(self):
+        self.chair.category = self.electronics
+        self.chair.save()
+        SalesChangeLog.objects.compact()
+
+        chair = dict(DailySalesRollup.objects.filter(product=self.chair, quantity__gt=0).values_list('country', 'category_id'))
+        self.assertEqual(chair, {'UK': self.electronics.id, 'USA': self.electronics.id})
+        self.assertFalse(DailySalesRollup.objects.filter(category=self.furniture, quantity__gt=0).exists())
+
+    def test_queryset_move_rekeys_items_and_last_order(self):
+        moved_to = timezone.now() - timedelta(days=400)
+
+        Order.objects.filter(pk=self.uk_order.pk).update(order_date=moved_to)
+        SalesChangeLog.objects.compact()
+
+        moved_day = timezone.localdate(moved_to)
+        self.assertEqual(DailySalesRollup.objects.get(product=self.phone, date=moved_day).quantity, 2)
+        self.assertEqual(DailySalesRollup.objects.get(product=self.phone, date=timezone.localdate()).quantity, 0)
+        self.uk_customer.refresh_from_db()
+        self.assertEqual(self.uk_customer.last_order_at, moved_to)
+
+    def test_compaction_advances_watermark(self):
+        watermark = RollupWatermark.objects.get(name=RollupWatermark.DAILY_SALES)
+
+        self.assertIsNotNone(watermark.fresh_as_of)
+        self.assertGreater(watermark.last_change_id, 0)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        incremental = self.snapshot()
+
+        DailySalesRollup.objects.all().delete()
+        created = DailySalesRollup.objects.rebuild()
+
+        self.assertEqual(created, 3)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_deleting_order_item_is_subtracted(self):
+        self.phone_item.delete()
+        SalesChangeLog.objects.compact()
+
+        phone_uk = DailySalesRollup.objects.get(product=self.phone, country='UK')
+        self.assertEqual((phone_uk.quantity, phone_uk.revenue), (0, 0))
+
+
+class SalesAnalyticsTests(SalesRollupTestCase):
+
+    def setUp(self):
+        caches['analytics'].clear()
+        super().setUp()
+
+    def test_revenue_by_category(self):
+        revenue = {row['category_name']: row['total_revenue'] for row in self.analytics.calculate_revenue_by_category()}
+
+        self.assertEqual(revenue, {'Electronics': 200, 'Furniture': 200})
+
+    def test_top_selling_products_by_country(self):
+        rows = list(self.analytics.top_selling_products_by_country())
+
+        self.assertEqual(rows[0], {'country': 'USA', 'product_name': 'Chair', 'total_sales': 3})
+        self.assertEqual(len(rows), 3)
+
+    def test_out_of_range_is_empty(self):
+        old = SalesAnalytics(timezone.now() - timedelta(days=30), timezone.now() - timedelta(days=20))
+
+        self.assertEqual(list(old.calculate_revenue_by_category()), [])
+
+    def test_matches_uncached_results(self):
+        uncached = SalesAnalytics(self.analytics.start_date, self.analytics.end_date, cache=None)
+
+        self.assertCountEqual(self.analytics.calculate_revenue_by_category(), uncached.calculate_revenue_by_category())
+        self.assertEqual(self.analytics.top_selling_products_by_country(), uncached.top_selling_products_by_country())
+
+    def test_buckets_are_reused_across_overlapping_ranges(self):
+        self.analytics.calculate_revenue_by_category()
+
+        # Every bucket is cached: only the cache is consulted.
+        with self.assertNumQueries(0):
+            self.analytics.calculate_revenue_by_category()
+
+    def test_compaction_invalidates_changed_month(self):
+        self.analytics.calculate_revenue_by_category()
+
+        OrderItem.objects.create(order=self.uk_order, product=self.phone, quantity=1, price_at_time_of_order=100)
+        SalesChangeLog.objects.compact()
+
+        revenue = {row['category_name']: row['total_revenue'] for row in self.analytics.calculate_revenue_by_category()}
+        self.assertEqual(revenue['Electronics'], 300)
+
+
+class TopProductsPerCountryTests(SalesRollupTestCase):
+
+    def setUp(self):
+        caches['analytics'].clear()
+        super().setUp()
+
+    def test_top_n_is_enforced_per_country(self):
+        rows = self.analytics.top_selling_products_by_country(top_n=1)
+
+        self.assertEqual(rows, [
+            {'country': 'USA', 'product_name': 'Chair', 'total_sales': 3},
+            {'country': 'UK', 'product_name': 'Phone', 'total_sales': 2},
+        ])
+
+    def test_top_n_matches_full_ranking(self):
+        uncached = SalesAnalytics(self.analytics.start_date, self.analytics.end_date, cache=None)
+
+        self.assertCountEqual(uncached.top_selling_products_by_country(top_n=10), uncached.top_selling_products_by_country())
+
+    def test_ranked_results_are_invalidated_by_compaction(self):
+        self.analytics.top_selling_products_by_country(top_n=1)
+
+        OrderItem.objects.create(order=self.uk_order, product=self.chair, quantity=5, price_at_time_of_order=50)
+        SalesChangeLog.objects.compact()
+
+        self.assertIn(
+            {'country': 'UK', 'product_name': 'Chair', 'total_sales': 6},
+            self.analytics.top_selling_products_by_country(top_n=1),
+        )
+
+
+class RangeDecompositionTests(TestCase):
+
+    def buckets(self, start, end):
+        return SalesAnalytics(start, end, cache=None).get_buckets()
+
+    def test_full_months_and_edge_days(self):
+        buckets = self.buckets(date(2023, 1, 30), date(2023, 4, 2))
+
+        self.assertEqual(buckets, [
+            ('day', date(2023, 1, 30)),
+            ('day', date(2023, 1, 31)),
+            ('month', date(2023, 2, 1)),
+            ('month', date(2023, 3, 1)),
+            ('day', date(2023, 4, 1)),
+            ('day', date(2023, 4, 2)),
+        ])
+
+    def test_year_is_twelve_month_buckets(self):
+        buckets = self.buckets(date(2023, 1, 1), date(2023, 12, 31))
+
+        self.assertEqual([kind for kind, _ in buckets], ['month'] * 12)
+        self.assertEqual(buckets[-1], ('month', date(2023, 12, 1)))
+
+    def test_consecutive_months_are_one_range(self):
+        analytics = SalesAnalytics(date(2023, 1, 1), date(2023, 12, 31), cache=None)
+        with CaptureQueriesContext(connection) as queries:
+            analytics.calculate_revenue_by_category()
+
+        [query] = queries.captured_queries
+        self.assertEqual(query['sql'].count(' >= '), 1)
+
+    def test_sliding_window_shares_month_buckets(self):
+        before = set(self.buckets(date(2023, 1, 15), date(2023, 6, 14)))
+        after = set(self.buckets(date(2023, 1, 16), date(2023, 6, 15)))
+
+        self.assertEqual(before - after, {('day', date(2023, 1, 15))})
+        self.assertEqual(after - before, {('day', date(2023, 6, 15))})
+
+
+class ChurnTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.lapsed = Customer.objects.create(name='Lapsed', email='lapsed@example.com', country='UK', registration_date='2022-01-05')
+        self.active = Customer.objects.create(name='Active', email='active@example.com', country='UK', registration_date='2022-01-20')
+        Customer.objects.create(name='Never', email='never@example.com', country='USA', registration_date='2022-02-01')
+
+        old_order = Order.objects.create(customer=self.lapsed, total_amount=10)
+        Order.objects.filter(pk=old_order.pk).update(order_date=self.now - timedelta(days=300))
+        self.recent_order = Order.objects.create(customer=self.active, total_amount=10)
+        Customer.objects.refresh_last_order_at()
+        self.analytics = SalesAnalytics(self.now - timedelta(days=365), self.now, cache=None)
+
+    def test_last_order_at_follows_inserts(self):
+        self.lapsed.refresh_from_db()
+        self.assertEqual(self.lapsed.last_order_at, self.now - timedelta(days=300))
+
+        order = Order.objects.create(customer=self.lapsed, total_amount=10)
+
+        self.lapsed.refresh_from_db()
+        self.assertEqual(self.lapsed.last_order_at, order.order_date)
+
+    def test_deleting_latest_order_falls_back(self):
+        self.recent_order.delete()
+
+        self.active.refresh_from_db()
+        self.assertIsNone(self.active.last_order_at)
+
+    def test_churn_rate_is_one_query(self):
+        with self.assertNumQueries(1):
+            churn_rate = self.analytics.compute_customer_churn_rate()
+
+        self.assertAlmostEqual(churn_rate, 100 / 3)
+
+    def test_churn_cohorts(self):
+        cohorts = self.analytics.compute_churn_cohorts()
+
+        self.assertEqual(
+            [(c['cohort'], c['country'], c['total_customers'], c['churned_customers']) for c in cohorts],
+            [(date(2022, 1, 1), 'UK', 2, 1), (date(2022, 2, 1), 'USA', 1, 0)],
+        )
+        self.assertEqual(cohorts[0]['churn_rate'], 50)
+
+
+class CustomerLifetimeValueTests(TestCase):
+
+    def setUp(self):
+        self.alice = Customer.objects.create(name='Alice', email='alice@example.com', country='UK', registration_date='2022-01-05')
+        self.bob = Customer.objects.create(name='Bob', email='bob@example.com', country='UK', registration_date='2022-01-20')
+        self.first = Order.objects.create(customer=self.alice, total_amount=Decimal('10.50'))
+        self.second = Order.objects.create(customer=self.alice, total_amount=Decimal('20.00'))
+
+    def stats(self, customer):
+        customer.refresh_from_db()
+        return customer.lifetime_value, customer.order_count
+
+    def test_stats_follow_order_writes(self):
+        self.assertEqual(self.stats(self.alice), (Decimal('30.50'), 2))
+
+        self.second.total_amount = Decimal('25.00')
+        self.second.save()
+        self.assertEqual(self.stats(self.alice), (Decimal('35.50'), 2))
+
+        self.first.customer = self.bob
+        self.first.save()
+        self.assertEqual(self.stats(self.alice), (Decimal('25.00'), 1))
+        self.assertEqual(self.stats(self.bob), (Decimal('10.50'), 1))
+
+        self.second.delete()
+        self.assertEqual(self.stats(self.alice), (Decimal('0.00'), 0))
+
+    def test_repair_recomputes_stats(self):
+        Customer.objects.update(lifetime_value=0, order_count=0)
+
+        Customer.objects.refresh_order_stats()
+
+        self.assertEqual(self.stats(self.alice), (Decimal('30.50'), 2))
+        self.assertEqual(self.stats(self.bob), (Decimal('0.00'), 0))
+
+    def test_bulk_lifetime_values_is_one_query(self):
+        with self.assertNumQueries(1):
+            values = Customer.calculate_lifetime_values([self.alice, self.bob.pk])
+
+        self.assertEqual(values, {self.alice.pk: Decimal('30.50'), self.bob.pk: 0})
@@ -0,0 +1,68 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from analytics.caching import SectionCache
+from analytics.models import Customer, SalesChangeLog
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'analytics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'analytics-tests'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, ANALYTICS_CACHE_ALIAS='analytics')
+class SectionCacheTests(TestCase):
+
+    def setUp(self):
+        caches['analytics'].clear()
+        self.section_cache = SectionCache()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return [{'value': self.calls}]
+
+    def test_hits_after_first_miss(self):
+        first = self.section_cache.get_or_compute('churn_rate', ('2023-01-01', '2023-12-31'), self.compute)
+        second = self.section_cache.get_or_compute('churn_rate', ('2023-01-01', '2023-12-31'), self.compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.section_cache.stats(['churn_rate'])['churn_rate'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_stats_cover_every_section(self):
+        self.section_cache.get_or_compute('tax_summary', ('2023-01-01', '2023-12-31'), self.compute)
+
+        self.assertEqual(self.section_cache.stats()['tax_summary']['misses'], 1)
+
+    def test_ranges_are_cached_separately(self):
+        self.section_cache.get_or_compute('churn_rate', ('2023-01-01', '2023-12-31'), self.compute)
+        self.section_cache.get_or_compute('churn_rate', ('2024-01-01', '2024-12-31'), self.compute)
+
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidate_only_affects_named_section(self):
+        self.section_cache.get_or_compute('churn_rate', ('a',), self.compute)
+        self.section_cache.get_or_compute('revenue_by_category', ('a',), self.compute)
+
+        self.section_cache.invalidate('churn_rate')
+        self.section_cache.get_or_compute('churn_rate', ('a',), self.compute)
+        self.section_cache.get_or_compute('revenue_by_category', ('a',), self.compute)
+
+        self.assertEqual(self.calls, 3)
+
+    def test_customer_write_invalidates_churn_on_commit(self):
+        generation = self.section_cache.generation('churn_rate')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='New', email='new@example.com', country='UK', registration_date='2023-01-01')
+
+        self.assertEqual(self.section_cache.generation('churn_rate'), generation + 1)
+
+    def test_compaction_invalidates_sales_sections_only_when_rollup_changes(self):
+        generation = self.section_cache.generation('revenue_by_category')
+
+        SalesChangeLog.objects.compact()
+
+        self.assertEqual(self.section_cache.generation('revenue_by_category'), generation)
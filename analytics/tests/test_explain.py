@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from analytics.explain import explain_all, full_scans
+
+
+class FullScanDetectionTests(SimpleTestCase):
+
+    def test_mysql_access_type_all(self):
+        plan = '\n'.join([
+            '1\tSIMPLE\tanalytics_order\tNone\trange\torder_date_idx\torder_date_idx\t5\tNone\t10\t100.0\tUsing index condition',
+            '1\tSIMPLE\tanalytics_category\tNone\tALL\tNone\tNone\tNone\tNone\t3\t100.0\tNone',
+        ])
+
+        self.assertEqual(full_scans(plan, 'mysql'), ['analytics_category'])
+
+    def test_postgresql_seq_scan(self):
+        plan = 'Hash Join\n  ->  Seq Scan on analytics_orderitem\n  ->  Index Scan using order_date_idx on analytics_order'
+
+        self.assertEqual(full_scans(plan, 'postgresql'), ['analytics_orderitem'])
+
+    def test_sqlite_scan_without_index(self):
+        plan = '3 0 0 SCAN analytics_customer\n5 0 0 SCAN analytics_orderitem USING COVERING INDEX orderitem_order_product_idx'
+
+        self.assertEqual(full_scans(plan, 'sqlite'), ['analytics_customer'])
+
+
+class ExplainCommandTests(TestCase):
+
+    def test_every_query_is_explained(self):
+        names = [name for name, plan, scans in explain_all()]
+        out = StringIO()
+
+        call_command('explain_analytics', stdout=out)
+
+        for name in names:
+            self.assertIn(name, out.getvalue())
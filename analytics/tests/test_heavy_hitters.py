@@ -0,0 +1,54 @@
+from django.test import TestCase, override_settings
+
+from analytics.heavy_hitters import CountryLeaderboards, SpaceSaving, leaderboards
+from analytics.models import Category, Customer, Inventory, Order, OrderItem, Product
+
+
+class SpaceSavingTests(TestCase):
+
+    def test_exact_while_under_capacity(self):
+        summary = SpaceSaving(3)
+        for item, weight in [('a', 5), ('b', 2), ('a', 1), ('c', 4)]:
+            summary.offer(item, weight)
+
+        self.assertEqual(summary.top(2), [('a', 6, 0), ('c', 4, 0)])
+
+    def test_heavy_hitter_survives_eviction(self):
+        summary = SpaceSaving(2)
+        summary.offer('heavy', 100)
+        for i in range(50):
+            summary.offer(f'noise-{i}')
+
+        item, count, error = summary.top(1)[0]
+        self.assertEqual(item, 'heavy')
+        self.assertEqual(count, 100)
+        # The surviving noise item overestimates by at most its error bound.
+        _, noise_count, noise_error = summary.top(2)[1]
+        self.assertLessEqual(noise_count - noise_error, 1)
+
+
+class CountryLeaderboardTests(TestCase):
+
+    def test_disabled_by_default(self):
+        boards = CountryLeaderboards(capacity=0)
+        boards.record('UK', 'Phone', 3)
+
+        self.assertEqual(boards.top(5), [])
+
+    @override_settings(ANALYTICS_HEAVY_HITTERS_CAPACITY=10)
+    def test_order_items_are_recorded_on_commit(self):
+        leaderboards.reset()
+        self.addCleanup(leaderboards.reset)
+        category = Category.objects.create(name='Electronics')
+        phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=category)
+        Inventory.objects.create(product=phone, quantity=100, last_restocked_date='2023-01-01')
+        customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        order = Order.objects.create(customer=customer, total_amount=200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product=phone, quantity=2, price_at_time_of_order=100)
+
+        self.assertEqual(
+            leaderboards.top(5, country='UK'),
+            [{'country': 'UK', 'product_name': 'Phone', 'total_sales': 2, 'max_error': 0}],
+        )
@@ -0,0 +1,145 @@
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics.ingestion import IngestionError, ingest_orders, parse_csv, parse_jsonl
+from analytics.models import Category, Customer, InsufficientStock, Inventory, Order, OrderItem, Product, SalesChangeLog
+
+
+class IngestionFixtureMixin:
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=category)
+        self.case = Product.objects.create(name='Case', SKU='SKU-C', price=10, category=category)
+        Inventory.objects.create(product=self.phone, quantity=10, last_restocked_date='2023-01-01')
+        Inventory.objects.create(product=self.case, quantity=10, last_restocked_date='2023-01-01')
+        self.customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+
+    def order_line(self, **items):
+        return json.dumps({
+            'customer_id': self.customer.id,
+            'items': [{'product_id': getattr(self, name).id, 'quantity': quantity} for name, quantity in items.items()],
+        })
+
+    def stock(self, product):
+        return Inventory.objects.get(product=product).quantity
+
+
+class IngestOrdersTests(IngestionFixtureMixin, TestCase):
+
+    def test_jsonl_orders_are_created_with_side_effects(self):
+        lines = [self.order_line(phone=2, case=1), self.order_line(case=3)]
+
+        result = ingest_orders(parse_jsonl(lines))
+
+        self.assertEqual((result.orders, result.items, result.batches), (2, 3, 1))
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (8, 6))
+        self.assertEqual(Order.objects.get(pk=result.order_ids[0]).total_amount, 210)
+        self.assertEqual(
+            sorted(SalesChangeLog.objects.values_list('product_id', 'quantity')),
+            sorted([(self.phone.id, 2), (self.case.id, 4)]),
+        )
+        self.customer.refresh_from_db()
+        self.assertIsNotNone(self.customer.last_order_at)
+        self.assertEqual((self.customer.lifetime_value, self.customer.order_count), (240, 2))
+
+    def test_csv_rows_are_grouped_by_order_ref(self):
+        source = io.StringIO(
+            'order_ref,customer_id,status,product_id,quantity,price\n'
+            f'A,{self.customer.id},shipped,{self.phone.id},1,90\n'
+            f'A,{self.customer.id},shipped,{self.case.id},2,\n'
+            f'B,{self.customer.id},,{self.case.id},1,\n'
+        )
+
+        result = ingest_orders(parse_csv(source))
+
+        self.assertEqual(result.orders, 2)
+        first = Order.objects.get(pk=result.order_ids[0])
+        self.assertEqual((first.status, first.total_amount), ('shipped', 110))
+
+    def test_short_batch_is_rolled_back_and_earlier_batches_kept(self):
+        lines = [self.order_line(phone=6), self.order_line(phone=6)]
+
+        with self.assertRaises(InsufficientStock) as raised:
+            ingest_orders(parse_jsonl(lines), batch_size=1)
+
+        self.assertEqual(raised.exception.shortages, {self.phone.id: (6, 4)})
+        self.assertEqual(raised.exception.result.orders, 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(self.phone), 4)
+
+    def test_unknown_product_reports_line(self):
+        lines = [self.order_line(case=1), json.dumps({'customer_id': self.customer.id, 'items': [{'product_id': 999999, 'quantity': 1}]})]
+
+        with self.assertRaises(IngestionError) as raised:
+            ingest_orders(parse_jsonl(lines))
+
+        self.assertEqual(raised.exception.line, 2)
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_bad_price_reports_line(self):
+        for price in ('NaN', 'Infinity', '-1', '100000000'):
+            lines = [self.order_line(case=1), json.dumps({'customer_id': self.customer.id, 'items': [{'product_id': self.case.id, 'quantity': 1, 'price': price}]})]
+
+            with self.assertRaises(IngestionError) as raised:
+                ingest_orders(parse_jsonl(lines))
+
+            self.assertEqual(raised.exception.line, 2)
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_oversized_total_reports_line_before_writing(self):
+        line = json.dumps({'customer_id': self.customer.id, 'items': [{'product_id': self.case.id, 'quantity': 2, 'price': '99999999.99'}]})
+
+        with self.assertRaises(IngestionError) as raised:
+            ingest_orders(parse_jsonl([line]))
+
+        self.assertEqual(raised.exception.line, 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.case), 10)
+
+    def test_decrement_many_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            Inventory.objects.decrement_many({self.phone.id: 1, self.case.id: 11})
+
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (10, 10))
+
+
+class OrderIngestViewTests(IngestionFixtureMixin, APITestCase):
+
+    def authenticate(self):
+        user = User.objects.create_user(username='ingest', password='password')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_jsonl_body_is_ingested(self):
+        self.authenticate()
+        body = '\n'.join([self.order_line(phone=1), self.order_line(case=2)])
+
+        response = self.client.generic('POST', reverse('order_ingest'), body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'orders': 2, 'items': 2, 'batches': 1})
+
+    def test_invalid_record_is_a_bad_request(self):
+        self.authenticate()
+        body = '\n'.join([self.order_line(case=1), json.dumps({'customer_id': self.customer.id, 'items': [{'product_id': self.case.id, 'quantity': 1, 'price': -5}]})])
+
+        response = self.client.generic('POST', reverse('order_ingest'), body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['error'].startswith('line 2:'))
+        self.assertEqual(response.data['committed'], {'orders': 0, 'items': 0, 'batches': 0})
+
+    def test_insufficient_stock_is_a_conflict(self):
+        self.authenticate()
+
+        response = self.client.generic('POST', reverse('order_ingest'), self.order_line(phone=50), content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['shortages'][self.phone.id], {'requested': 50, 'available': 10})
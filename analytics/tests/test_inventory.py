@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics.models import (
+    Category,
+    Customer,
+    InsufficientStock,
+    Inventory,
+    InventoryReservation,
+    Order,
+    OrderItem,
+    Product,
+    ReservationConflict,
+)
+
+
+class StockMixin:
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=category)
+        self.case = Product.objects.create(name='Case', SKU='SKU-C', price=10, category=category)
+        Inventory.objects.create(product=self.phone, quantity=20, last_restocked_date='2023-01-01')
+        Inventory.objects.create(product=self.case, quantity=20, last_restocked_date='2023-01-01')
+
+    def stock(self, product):
+        return Inventory.objects.get(product=product).quantity
+
+
+class InventoryReservationTests(StockMixin, TestCase):
+
+    def test_reserve_takes_stock_for_whole_order(self):
+        reservation, created = InventoryReservation.objects.reserve('order-1', {self.phone.id: 2, self.case.id: 5})
+
+        self.assertTrue(created)
+        self.assertEqual(reservation.get_quantities(), {self.phone.id: 2, self.case.id: 5})
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (18, 15))
+
+    def test_replayed_key_does_not_take_stock_twice(self):
+        first, _ = InventoryReservation.objects.reserve('order-1', {self.phone.id: 2})
+        again, created = InventoryReservation.objects.reserve('order-1', {self.phone.id: 2})
+
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(self.stock(self.phone), 18)
+
+    def test_key_reused_for_different_items_is_rejected(self):
+        InventoryReservation.objects.reserve('order-1', {self.phone.id: 2})
+
+        with self.assertRaises(ReservationConflict):
+            InventoryReservation.objects.reserve('order-1', {self.phone.id: 3})
+
+    def test_shortage_reserves_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            InventoryReservation.objects.reserve('order-1', {self.phone.id: 2, self.case.id: 21})
+
+        self.assertFalse(InventoryReservation.objects.exists())
+        self.assertEqual((self.stock(self.phone), self.stock(self.case)), (20, 20))
+
+    def test_release_returns_stock_once(self):
+        InventoryReservation.objects.reserve('order-1', {self.phone.id: 4})
+
+        _, released = InventoryReservation.objects.release('order-1')
+        _, released_again = InventoryReservation.objects.release('order-1')
+
+        self.assertEqual((released, released_again), (True, False))
+        self.assertEqual(self.stock(self.phone), 20)
+
+    def test_order_item_resave_does_not_decrement_again(self):
+        customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        order = Order.objects.create(customer=customer, total_amount=200)
+        item = OrderItem.objects.create(order=order, product=self.phone, quantity=2, price_at_time_of_order=100)
+
+        item.save()
+
+        self.assertEqual(self.stock(self.phone), 18)
+
+
+class InventoryReservationViewTests(StockMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.url = reverse('inventory_reservation')
+
+    def reserve(self, key, quantity):
+        return self.client.post(
+            self.url, {'items': [{'product_id': self.phone.id, 'quantity': quantity}]}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_with_same_key_is_idempotent(self):
+        first = self.reserve('abc', 3)
+        retry = self.reserve('abc', 3)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data['quantities'], [{'product_id': self.phone.id, 'quantity': 3}])
+        self.assertEqual(self.stock(self.phone), 17)
+
+    def test_shortage_and_release(self):
+        self.assertEqual(self.reserve('too-many', 21).status_code, status.HTTP_409_CONFLICT)
+        self.reserve('abc', 5)
+
+        response = self.client.post(reverse('inventory_reservation_release', kwargs={'key': 'abc'}))
+
+        self.assertEqual(response.data['status'], InventoryReservation.RELEASED)
+        self.assertEqual(self.stock(self.phone), 20)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentReservationTests(StockMixin, TransactionTestCase):
+
+    def test_no_lost_updates_under_concurrency(self):
+        def attempt(n):
+            try:
+                InventoryReservation.objects.reserve(f'concurrent-{n}', {self.phone.id: 1})
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sold = sum(pool.map(attempt, range(40)))
+
+        self.assertEqual(sold, 20)
+        self.assertEqual(self.stock(self.phone), 0)
@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics.http import parse_range_header
+from analytics.jobs import run_report_job
+from analytics.models import Category, Customer, Inventory, Order, OrderItem, Product, ReportJob
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+
+    def test_ranges(self):
+        self.assertIsNone(parse_range_header(None, 100))
+        self.assertIsNone(parse_range_header('bytes=0-1,5-6', 100))
+        self.assertEqual(parse_range_header('bytes=10-19', 100), (10, 10))
+        self.assertEqual(parse_range_header('bytes=90-', 100), (90, 10))
+        self.assertEqual(parse_range_header('bytes=-5', 100), (95, 5))
+        self.assertEqual(parse_range_header('bytes=50-500', 100), (50, 50))
+        self.assertIs(parse_range_header('bytes=100-', 100), False)
+
+
+class ReportJobViewTests(APITestCase):
+
+    def setUp(self):
+        self.reports_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.reports_root)
+        settings_override = override_settings(REPORTS_ROOT=self.reports_root, REPORT_JOBS_ALWAYS_EAGER=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+        category = Category.objects.create(name='Test Category')
+        product = Product.objects.create(name='Product X', price=50, SKU='SKU1001', category=category)
+        Inventory.objects.create(product=product, quantity=20, last_restocked_date='2023-01-01')
+        customer = Customer.objects.create(name='Client A', email='clientA@example.com', country='UK', registration_date='2023-01-01')
+        order = Order.objects.create(customer=customer, status='delivered', total_amount=500)
+        OrderItem.objects.create(order=order, product=product, quantity=5, price_at_time_of_order=100)
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+
+    def create_job(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('report_job_create'), {'year': 2023, 'month': 9, **data}, format='json')
+
+    def test_job_runs_and_can_be_downloaded(self):
+        response = self.create_job(format='csv')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+
+        detail = self.client.get(response['Location'])
+        self.assertEqual(detail.data['status'], 'done')
+        self.assertEqual(detail.data['progress'], 100)
+        self.assertEqual(detail.data['rows_done'], 1)
+
+        download = self.client.get(reverse('report_job_download', kwargs={'pk': job_id}))
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        body = b''.join(download.streaming_content)
+        self.assertTrue(body.startswith(b'product_id,product_name'))
+
+        partial = self.client.get(reverse('report_job_download', kwargs={'pk': job_id}), HTTP_RANGE='bytes=0-9')
+        self.assertEqual(partial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(partial.streaming_content), body[:10])
+        self.assertEqual(partial['Content-Range'], f'bytes 0-9/{len(body)}')
+
+    def test_download_before_done_conflicts(self):
+        job = ReportJob.objects.create(requested_by=self.user, year=2023, month=9)
+
+        response = self.client.get(reverse('report_job_download', kwargs={'pk': job.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_invalid_format_rejected(self):
+        response = self.create_job(format='pdf')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_invalid_year_rejected(self):
+        response = self.create_job(year=0, format='csv')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_report_that_cannot_be_built_fails_the_job(self):
+        job = ReportJob.objects.create(requested_by=self.user, year=0, month=5, format='csv')
+
+        run_report_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('year 0', job.error)
+
+    def test_stale_job_is_failed_when_polled(self):
+        lost = ReportJob.objects.create(requested_by=self.user, year=2023, month=9)
+        queued = ReportJob.objects.create(requested_by=self.user, year=2023, month=9)
+        ReportJob.objects.filter(pk=lost.pk).update(status='running', heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        lost_detail = self.client.get(reverse('report_job_detail', kwargs={'pk': lost.pk}))
+        queued_detail = self.client.get(reverse('report_job_detail', kwargs={'pk': queued.pk}))
+
+        self.assertEqual(lost_detail.data['status'], 'failed')
+        self.assertEqual(queued_detail.data['status'], 'pending')
+
+        run_report_job(lost.pk)
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, 'failed')
+
+    def test_jobs_are_private_to_requester(self):
+        other = User.objects.create_user(username='other', password='testpassword')
+        job = ReportJob.objects.create(requested_by=other, year=2023, month=9)
+
+        response = self.client.get(reverse('report_job_detail', kwargs={'pk': job.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
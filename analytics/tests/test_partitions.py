@@ -0,0 +1,165 @@
+from datetime import date, datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from analytics import copurchase, partitions, similarity
+from analytics.models import (
+    ArchivedOrderItem,
+    Category,
+    Customer,
+    DailySalesRollup,
+    Inventory,
+    Order,
+    OrderItem,
+    Product,
+    SalesArchiveMonth,
+    SalesChangeLog,
+)
+from analytics.recommendation import RecommendationEngine
+from analytics.reports import MonthlySalesReport
+
+
+class PartitionTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(name='Phone', SKU='SKU-P', price=100, category=category)
+        Inventory.objects.create(product=self.phone, quantity=100, last_restocked_date='2023-01-01')
+        customer = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        self.august = Order.objects.create(customer=customer, total_amount=300)
+        OrderItem.objects.create(order=self.august, product=self.phone, quantity=3, price_at_time_of_order=100)
+        self.september = Order.objects.create(customer=customer, total_amount=200)
+        OrderItem.objects.create(order=self.september, product=self.phone, quantity=2, price_at_time_of_order=100)
+        Order.objects.filter(pk=self.august.pk).update(order_date=timezone.make_aware(datetime(2023, 8, 20)))
+        Order.objects.filter(pk=self.september.pk).update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+        SalesChangeLog.objects.all().delete()
+        DailySalesRollup.objects.rebuild()
+
+    def item_tables(self, queries):
+        return {
+            table for table in (OrderItem._meta.db_table, ArchivedOrderItem._meta.db_table)
+            if any(table in query['sql'] for query in queries.captured_queries)
+        }
+
+    def test_items_follow_their_order_date(self):
+        self.assertEqual(
+            sorted(timezone.localdate(day) for day in OrderItem.objects.values_list('order_date', flat=True)),
+            [date(2023, 8, 20), date(2023, 9, 15)],
+        )
+
+        self.september.order_date = timezone.make_aware(datetime(2023, 9, 1))
+        self.september.save()
+
+        self.assertEqual(OrderItem.objects.get(order=self.september).order_date, self.september.order_date)
+
+    def test_archiving_moves_items_without_side_effects(self):
+        rollup = sorted(DailySalesRollup.objects.values_list('date', 'quantity'))
+
+        moved = partitions.archive_month(date(2023, 8, 1))
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(list(OrderItem.objects.values_list('order_id', flat=True)), [self.september.pk])
+        self.assertEqual(list(ArchivedOrderItem.objects.values_list('order_id', flat=True)), [self.august.pk])
+        self.assertEqual(SalesArchiveMonth.objects.get().items, 1)
+        self.assertFalse(SalesChangeLog.objects.exists())
+        self.assertEqual(Inventory.objects.get().quantity, 95)
+        self.assertEqual(sorted(DailySalesRollup.objects.values_list('date', 'quantity')), rollup)
+
+    def test_reports_read_only_the_table_holding_the_month(self):
+        partitions.archive_month(date(2023, 8, 1))
+
+        for month, table in ((8, ArchivedOrderItem._meta.db_table), (9, OrderItem._meta.db_table)):
+            report = MonthlySalesReport(2023, month)
+            with CaptureQueriesContext(connection) as queries:
+                list(report.iter_records())
+            self.assertEqual(self.item_tables(queries), {table})
+            self.assertEqual(report.get_queryset().count(), 1)
+
+    def test_range_spanning_live_and_archived_months(self):
+        partitions.archive_month(date(2023, 8, 1))
+
+        sources = partitions.order_item_sources(date(2023, 8, 1), date(2023, 9, 30))
+
+        self.assertEqual([source.model for source in sources], [OrderItem, ArchivedOrderItem])
+        self.assertEqual(sum(source.count() for source in sources), 2)
+
+    def test_rebuild_reads_archived_months(self):
+        incremental = sorted(DailySalesRollup.objects.values_list('date', 'product_id', 'quantity'))
+        partitions.archive_month(date(2023, 8, 1))
+
+        DailySalesRollup.objects.rebuild()
+
+        self.assertEqual(sorted(DailySalesRollup.objects.values_list('date', 'product_id', 'quantity')), incremental)
+
+    def test_restore_moves_month_back(self):
+        partitions.archive_month(date(2023, 8, 1))
+
+        moved = partitions.restore_month(date(2023, 8, 1))
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertFalse(ArchivedOrderItem.objects.exists())
+        self.assertFalse(SalesArchiveMonth.objects.exists())
+
+    def rollup(self):
+        return sorted(DailySalesRollup.objects.filter(quantity__gt=0).values_list('date', 'quantity'))
+
+    def test_deleting_archived_items_updates_rollup(self):
+        partitions.archive_month(date(2023, 8, 1))
+
+        self.august.delete()
+        SalesChangeLog.objects.compact()
+
+        self.assertEqual(self.rollup(), [(date(2023, 9, 15), 2)])
+        self.assertEqual(SalesArchiveMonth.objects.get().items, 0)
+
+    def test_moving_order_within_archived_month_rekeys_items(self):
+        partitions.archive_month(date(2023, 8, 1))
+        order = Order.objects.get(pk=self.august.pk)
+
+        order.order_date = timezone.make_aware(datetime(2023, 8, 25))
+        order.save()
+        SalesChangeLog.objects.compact()
+
+        self.assertEqual(ArchivedOrderItem.objects.get().order_date, order.order_date)
+        self.assertEqual(self.rollup(), [(date(2023, 8, 25), 3), (date(2023, 9, 15), 2)])
+
+    def test_writes_to_archived_months_are_rejected(self):
+        partitions.archive_month(date(2023, 8, 1))
+        self.august.refresh_from_db()
+        september = Order.objects.get(pk=self.september.pk)
+
+        with self.assertRaises(partitions.ArchivedMonthError):
+            OrderItem.objects.create(order=self.august, product=self.phone, quantity=1, price_at_time_of_order=100)
+        september.order_date = timezone.make_aware(datetime(2023, 8, 21))
+        with self.assertRaises(partitions.ArchivedMonthError):
+            september.save()
+        with self.assertRaises(partitions.ArchivedMonthError):
+            Order.objects.filter(pk=self.august.pk).update(order_date=timezone.make_aware(datetime(2023, 9, 1)))
+
+        self.assertEqual(timezone.localdate(Order.objects.get(pk=self.august.pk).order_date), date(2023, 8, 20))
+        self.assertEqual(timezone.localdate(OrderItem.objects.get().order_date), date(2023, 9, 15))
+
+    def test_current_month_cannot_be_archived(self):
+        with self.assertRaises(partitions.ArchivedMonthError):
+            partitions.archive_month(timezone.localdate())
+
+    def test_recommendations_read_archived_items(self):
+        case = Product.objects.create(name='Case', SKU='SKU-C', price=10, category=self.phone.category)
+        Inventory.objects.create(product=case, quantity=100, last_restocked_date='2023-01-01')
+        self.august.refresh_from_db()
+        OrderItem.objects.create(order=self.august, product=case, quantity=1, price_at_time_of_order=10)
+        partitions.archive_month(date(2023, 8, 1))
+        partitions.archive_month(date(2023, 9, 1))
+        self.assertFalse(OrderItem.objects.exists())
+
+        copurchase.rebuild()
+        matrix = similarity.PurchaseMatrix.from_order_items()
+        engine = RecommendationEngine(self.august.customer)
+
+        self.assertEqual(list(engine.recommend_also_bought(self.phone)), [case])
+        self.assertEqual(list(matrix.rows[self.august.customer_id]), [self.phone.id, case.id])
+        self.assertEqual(list(engine.recommend_based_on_order_history()), [self.phone, case])
@@ -0,0 +1,291 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics import copurchase, similarity
+from analytics.models import Category, Customer, CustomerSimilarity, Inventory, Order, OrderItem, Product, ProductCoPurchase
+from analytics.recommendation import RecommendationEngine
+
+
+class CatalogueMixin:
+
+    def create_catalogue(self, size):
+        start = Product.objects.count()
+        for i in range(start, start + size):
+            category = Category.objects.create(name=f'Category {i}')
+            product = Product.objects.create(name=f'Product {i}', SKU=f'SKU-{i}', price=10, category=category)
+            Inventory.objects.create(product=product, quantity=50, last_restocked_date='2023-01-01')
+            for customer in (self.customer, self.other_customer):
+                order = Order.objects.create(customer=customer, total_amount=10)
+                OrderItem.objects.create(order=order, product=product, quantity=1, price_at_time_of_order=10)
+
+    def create_customers(self):
+        self.customer = Customer.objects.create(name='Customer', email='customer@example.com', country='UK', registration_date='2023-01-01')
+        self.other_customer = Customer.objects.create(name='Other', email='other@example.com', country='UK', registration_date='2023-01-01')
+
+
+class RecommendationEngineTests(CatalogueMixin, TestCase):
+
+    def setUp(self):
+        self.create_customers()
+        self.create_catalogue(5)
+        self.engine = RecommendationEngine(self.customer)
+
+    def test_results_are_bounded(self):
+        similarity.rebuild()
+        self.assertEqual(len(self.engine.recommend_based_on_order_history(limit=2)), 2)
+        self.assertEqual(len(self.engine.recommend_based_on_inventory(limit=3)), 3)
+        self.assertEqual(len(self.engine.recommend_based_on_similar_customers(limit=1)), 1)
+
+    def test_limit_is_capped_and_defaulted(self):
+        self.assertEqual(self.engine._limit(None), RecommendationEngine.default_limit)
+        self.assertEqual(self.engine._limit(-3), RecommendationEngine.default_limit)
+        self.assertEqual(self.engine._limit(10_000), RecommendationEngine.max_limit)
+
+    def test_category_id_needs_no_extra_query(self):
+        with self.assertNumQueries(1):
+            category_ids = [product.category_id for product in self.engine.recommend_based_on_inventory()]
+
+        self.assertEqual(len(category_ids), 5)
+
+
+class CoPurchaseIndexTests(CatalogueMixin, TestCase):
+
+    def setUp(self):
+        self.create_customers()
+        category = Category.objects.create(name='Catalogue')
+        self.phone, self.case, self.charger, self.chair = [
+            Product.objects.create(name=name, SKU=f'SKU-{name}', price=10, category=category)
+            for name in ('Phone', 'Case', 'Charger', 'Chair')
+        ]
+        for product in (self.phone, self.case, self.charger, self.chair):
+            Inventory.objects.create(product=product, quantity=50, last_restocked_date='2023-01-01')
+        self.place_order(self.other_customer, self.phone, self.case)
+        self.place_order(self.other_customer, self.phone, self.case, self.charger)
+        self.place_order(self.customer, self.phone)
+        self.engine = RecommendationEngine(self.customer)
+
+    def place_order(self, customer, *products):
+        order = Order.objects.create(customer=customer, total_amount=10)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, price_at_time_of_order=10)
+        return order
+
+    def test_also_bought_is_ranked_by_score(self):
+        copurchase.rebuild()
+
+        with self.assertNumQueries(1):
+            related = list(self.engine.recommend_also_bought(self.phone))
+
+        self.assertEqual(related, [self.case, self.charger])
+
+    def test_rebuild_keeps_top_k_per_product(self):
+        copurchase.rebuild(top_k=1)
+
+        self.assertEqual(
+            list(ProductCoPurchase.objects.filter(product=self.phone).values_list('related_product', 'count')),
+            [(self.case.pk, 2)],
+        )
+        self.assertEqual(ProductCoPurchase.objects.filter(product=self.charger).count(), 1)
+
+    def test_incremental_update_matches_rebuild(self):
+        copurchase.rebuild()
+        self.place_order(self.other_customer, self.charger, self.chair)
+        self.place_order(self.other_customer, self.phone, self.chair)
+
+        copurchase.update()
+        incremental = sorted(ProductCoPurchase.objects.values_list('product_id', 'related_product_id', 'count'))
+        copurchase.rebuild()
+        rebuilt = sorted(ProductCoPurchase.objects.values_list('product_id', 'related_product_id', 'count'))
+
+        self.assertEqual(incremental, rebuilt)
+
+    def test_update_without_new_orders_is_a_no_op(self):
+        copurchase.rebuild()
+
+        self.assertEqual(copurchase.update(), 0)
+
+    def test_co_purchases_exclude_owned_products(self):
+        copurchase.rebuild()
+
+        recommended = list(self.engine.recommend_based_on_co_purchases())
+
+        self.assertEqual(recommended, [self.case, self.charger])
+
+
+class ProductAlsoBoughtViewTests(CatalogueMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.create_customers()
+        category = Category.objects.create(name='Catalogue')
+        self.phone, self.case, self.charger = [
+            Product.objects.create(name=name, SKU=f'SKU-{name}', price=10, category=category)
+            for name in ('Phone', 'Case', 'Charger')
+        ]
+        for products in ((self.phone, self.case), (self.phone, self.case, self.charger)):
+            order = Order.objects.create(customer=self.customer, total_amount=10)
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price_at_time_of_order=10)
+        copurchase.rebuild()
+
+    def test_returns_ranked_products(self):
+        response = self.client.get(reverse('product_also_bought', kwargs={'pk': self.phone.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.case.id, self.charger.id])
+
+    def test_limit(self):
+        response = self.client.get(reverse('product_also_bought', kwargs={'pk': self.phone.id}), {'limit': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.case.id])
+
+    def test_invalid_limit(self):
+        response = self.client.get(reverse('product_also_bought', kwargs={'pk': self.phone.id}), {'limit': 'x'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_product(self):
+        response = self.client.get(reverse('product_also_bought', kwargs={'pk': 999999}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CustomerSimilarityTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Catalogue')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', SKU=f'SKU-{i}', price=10, category=category)
+            for i in range(4)
+        ]
+        for product in self.products:
+            Inventory.objects.create(product=product, quantity=50, last_restocked_date='2023-01-01')
+        self.alice = self.customer_with('alice', 0, 1, 2)
+        self.bob = self.customer_with('bob', 0, 1, 2)
+        self.carol = self.customer_with('carol', 2, 3)
+        self.dave = self.customer_with('dave', 3)
+
+    def customer_with(self, name, *product_indexes):
+        customer = Customer.objects.create(name=name, email=f'{name}@example.com', country='UK', registration_date='2023-01-01')
+        order = Order.objects.create(customer=customer, total_amount=10)
+        for index in product_indexes:
+            OrderItem.objects.create(order=order, product=self.products[index], quantity=1, price_at_time_of_order=10)
+        return customer
+
+    def test_matrix_rows_and_columns(self):
+        matrix = similarity.PurchaseMatrix.from_order_items()
+
+        self.assertEqual(list(matrix.rows[self.carol.id]), [self.products[2].id, self.products[3].id])
+        self.assertEqual(sorted(matrix.columns[self.products[3].id]), [self.carol.id, self.dave.id])
+
+    def test_neighbours_are_ranked(self):
+        similarity.rebuild()
+
+        with self.assertNumQueries(1):
+            similar = list(RecommendationEngine(self.alice).recommend_based_on_similar_customers())
+
+        self.assertEqual(similar, [self.bob, self.carol])
+
+    def test_cosine_and_jaccard_scores(self):
+        similarity.rebuild(metric=CustomerSimilarity.JACCARD)
+        jaccard = CustomerSimilarity.objects.get(customer=self.alice, similar_customer=self.carol)
+        similarity.rebuild()
+        cosine = CustomerSimilarity.objects.get(customer=self.alice, similar_customer=self.carol)
+
+        self.assertEqual(jaccard.shared_products, 1)
+        self.assertAlmostEqual(jaccard.score, 1 / 4)
+        self.assertAlmostEqual(cosine.score, 1 / 6 ** 0.5)
+
+    def test_top_k_and_popular_product_cutoff(self):
+        similarity.rebuild(top_k=1)
+        self.assertEqual(CustomerSimilarity.objects.filter(customer=self.alice).count(), 1)
+
+        # Product 2 is bought by three customers; ignoring it disconnects carol from alice and bob.
+        similarity.rebuild(max_product_buyers=2)
+        self.assertFalse(CustomerSimilarity.objects.filter(customer=self.carol, similar_customer=self.alice).exists())
+
+
+class RecommendationQueryCountTests(CatalogueMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.create_customers()
+
+    def count_overview_queries(self):
+        # Start cold every time so cached analytics sections do not skew the count.
+        caches['analytics'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('analytics_overview'), {'customer_id': self.customer.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_query_count_is_independent_of_catalogue_size(self):
+        self.create_catalogue(2)
+        small = self.count_overview_queries()
+
+        self.create_catalogue(15)
+        large = self.count_overview_queries()
+
+        self.assertEqual(small, large)
+
+
+class BatchRecommendationTests(CatalogueMixin, APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.create_customers()
+        self.create_catalogue(3)
+        similarity.rebuild()
+
+    def test_bulk_matches_single_customer_engine(self):
+        [result] = RecommendationEngine.bulk([self.customer.id], limit=2)
+        engine = RecommendationEngine(self.customer)
+
+        recommendations = result['recommendations']
+        self.assertEqual([p['id'] for p in recommendations['order_history']], [p.id for p in engine.recommend_based_on_order_history(limit=2)])
+        self.assertEqual([c['id'] for c in recommendations['similar_customers']], [self.other_customer.id])
+        self.assertEqual([p['id'] for p in recommendations['in_stock']], [p.id for p in engine.recommend_based_on_inventory(limit=2)])
+
+    def test_query_count_is_independent_of_customer_count(self):
+        def count_queries(customer_ids):
+            with CaptureQueriesContext(connection) as queries:
+                list(RecommendationEngine.bulk(customer_ids))
+            return len(queries)
+
+        few = count_queries([self.customer.id])
+        extra = [
+            Customer.objects.create(name=f'Extra {i}', email=f'extra{i}@example.com', country='UK', registration_date='2023-01-01').id
+            for i in range(10)
+        ]
+
+        self.assertEqual(count_queries([self.customer.id, self.other_customer.id, *extra]), few)
+
+    def test_endpoint_streams_json_lines(self):
+        response = self.client.post(
+            reverse('recommendation_batch'), {'customer_ids': [self.customer.id, 999999], 'limit': 1}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['customer_id'] for line in lines], [self.customer.id, 999999])
+        self.assertEqual(len(lines[0]['recommendations']['order_history']), 1)
+        self.assertEqual(lines[1]['error'], 'Customer not found.')
+
+    def test_endpoint_rejects_empty_list(self):
+        response = self.client.post(reverse('recommendation_batch'), {'customer_ids': []}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from analytics.models import Category, Customer, Inventory, Order, OrderItem, Product, ReportArtifact
+from analytics.report_cache import get_or_build
+from analytics.reports import MonthlySalesReport, read_columnar
+
+
+class SalesReportTestCase(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Test Category')
+        self.product1 = Product.objects.create(name='Product A', SKU='SKU-A', price=10, category=category)
+        self.product2 = Product.objects.create(name='Product B', SKU='SKU-B', price=20, category=category)
+        Inventory.objects.create(product=self.product1, quantity=100, last_restocked_date='2023-01-01')
+        Inventory.objects.create(product=self.product2, quantity=100, last_restocked_date='2023-01-01')
+        customer = Customer.objects.create(name='Client A', email='a@example.com', country='UK', registration_date='2023-01-01')
+
+        order = Order.objects.create(customer=customer, total_amount=70)
+        OrderItem.objects.create(order=order, product=self.product1, quantity=3, price_at_time_of_order=10)
+        OrderItem.objects.create(order=order, product=self.product2, quantity=2, price_at_time_of_order=20)
+        OrderItem.objects.create(order=order, product=self.product1, quantity=1, price_at_time_of_order=10)
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+
+
+class MonthlySalesReportTests(SalesReportTestCase):
+
+    def build(self, report):
+        path = report.build_to_tempfile()
+        try:
+            return list(load_workbook(path).active.iter_rows(values_only=True))
+        finally:
+            os.unlink(path)
+
+    def test_single_pass_issues_one_query(self):
+        report = MonthlySalesReport(2023, 9)
+        # The archive lookup that routes the month, then the single pass.
+        with self.assertNumQueries(2):
+            path = report.build_to_tempfile()
+        os.unlink(path)
+        self.assertEqual(report.row_count, 3)
+        self.assertEqual(report.total_quantity, 6)
+        self.assertEqual(report.total_revenue, 80)
+
+    def test_rows_are_read_in_bounded_chunks(self):
+        report = MonthlySalesReport(2023, 9, chunk_size=2)
+        # The archive lookup, then one query per chunk of two rows.
+        with self.assertNumQueries(3):
+            path = report.build_to_tempfile()
+        os.unlink(path)
+        self.assertEqual(report.row_count, 3)
+        self.assertEqual(report.total_quantity, 6)
+        self.assertEqual(report.total_revenue, 80)
+
+    def test_product_subtotals_match_between_modes(self):
+        in_python = self.build(MonthlySalesReport(2023, 9))
+        in_db = self.build(MonthlySalesReport(2023, 9, aggregate_in_db=True))
+
+        self.assertEqual(in_python, in_db)
+        self.assertIn(('Product A', 4, None, 40), in_python)
+        self.assertIn(('Product B', 2, None, 40), in_python)
+        self.assertEqual(in_python[-1], ('Total Revenue', 6, None, 80))
+
+    def test_empty_month_has_no_rows(self):
+        report = MonthlySalesReport(2023, 10)
+        path = report.build_to_tempfile()
+        os.unlink(path)
+        self.assertEqual(report.row_count, 0)
+
+
+class ExportFormatTests(SalesReportTestCase):
+
+    def export(self, export_format):
+        return b''.join(MonthlySalesReport(2023, 9).open_stream(export_format))
+
+    def test_csv_export(self):
+        lines = self.export('csv').decode().splitlines()
+        self.assertEqual(lines[0], 'product_id,product_name,quantity,price,revenue')
+        self.assertEqual(len(lines), 4)
+        self.assertIn(f'{self.product2.id},Product B,2,20.00,40.00', lines)
+
+    def test_jsonl_export(self):
+        records = [json.loads(line) for line in self.export('jsonl').decode().splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sum(int(record['quantity']) for record in records), 6)
+        self.assertIn({'product_id': self.product1.id, 'product_name': 'Product A', 'quantity': 3, 'price': '10.00', 'revenue': '30.00'}, records)
+
+    def test_columnar_export_round_trips(self):
+        columns, product_names = read_columnar(io.BytesIO(self.export('columnar')))
+        self.assertEqual(sorted(columns['quantity']), [1, 2, 3])
+        self.assertEqual(sum(q * p for q, p in zip(columns['quantity'], columns['price_cents'])), 8000)
+        self.assertEqual(product_names, {self.product1.id: 'Product A', self.product2.id: 'Product B'})
+
+    def test_empty_month_has_no_stream(self):
+        self.assertIsNone(MonthlySalesReport(2023, 10).open_stream('csv'))
+
+
+class ReportCacheTests(SalesReportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        reports_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reports_root)
+        settings_override = override_settings(REPORTS_ROOT=reports_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_second_request_reuses_artifact(self):
+        first = get_or_build(MonthlySalesReport(2023, 9), 'csv')
+        self.assertIsNotNone(first.pk)
+        self.assertTrue(first.etag)
+
+        # A hit is one lookup on the artifact table and no OrderItem scan.
+        with self.assertNumQueries(1):
+            second = get_or_build(MonthlySalesReport(2023, 9), 'csv')
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.file_path, first.file_path)
+
+    def test_order_item_write_invalidates_month(self):
+        artifact = get_or_build(MonthlySalesReport(2023, 9), 'jsonl')
+
+        order = Order.objects.get()
+        OrderItem.objects.create(order=order, product=self.product2, quantity=1, price_at_time_of_order=20)
+
+        self.assertFalse(ReportArtifact.objects.exists())
+        self.assertFalse(os.path.exists(artifact.file_path))
+        self.assertEqual(get_or_build(MonthlySalesReport(2023, 9), 'jsonl').row_count, 4)
+
+    def test_moving_order_invalidates_both_months(self):
+        september = get_or_build(MonthlySalesReport(2023, 9), 'csv')
+        get_or_build(MonthlySalesReport(2023, 10), 'csv')
+
+        order = Order.objects.get()
+        order.order_date = timezone.make_aware(datetime(2023, 10, 2))
+        order.save()
+
+        self.assertFalse(ReportArtifact.objects.exists())
+        self.assertFalse(os.path.exists(september.file_path))
+        self.assertEqual(get_or_build(MonthlySalesReport(2023, 9), 'csv').row_count, 0)
+        self.assertEqual(get_or_build(MonthlySalesReport(2023, 10), 'csv').row_count, 3)
+
+    def test_queryset_move_invalidates_both_months(self):
+        get_or_build(MonthlySalesReport(2023, 9), 'csv')
+        get_or_build(MonthlySalesReport(2023, 10), 'csv')
+
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 10, 2)))
+
+        self.assertFalse(ReportArtifact.objects.exists())
+        self.assertEqual(get_or_build(MonthlySalesReport(2023, 9), 'csv').row_count, 0)
+        self.assertEqual(get_or_build(MonthlySalesReport(2023, 10), 'csv').row_count, 3)
+
+    def test_empty_month_is_cached_without_file(self):
+        artifact = get_or_build(MonthlySalesReport(2023, 10), 'csv')
+        self.assertEqual(artifact.row_count, 0)
+        self.assertEqual(artifact.file_path, '')
@@ -0,0 +1,51 @@
+from django.test import TestCase
+from rest_framework import serializers
+
+from analytics.models import Category, Customer, Order, Product
+from analytics.serializers import (
+    CustomerSerializer,
+    CustomerValuesSerializer,
+    OrderSerializer,
+    OrderValuesSerializer,
+    ProductSerializer,
+    ProductValuesSerializer,
+)
+
+
+class ValuesSerializerTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Jane', email='jane@example.com', country='UK', registration_date='2023-02-01')
+        Order.objects.create(customer=self.customer, total_amount='19.5')
+        self.customer.refresh_from_db()
+
+    def test_matches_model_serializer(self):
+        self.assertEqual(CustomerValuesSerializer().serialize(Customer.objects.all()), CustomerSerializer(Customer.objects.all(), many=True).data)
+        self.assertEqual(OrderValuesSerializer().serialize(Order.objects.all()), OrderSerializer(Order.objects.all(), many=True).data)
+
+    def test_instances_and_dicts_render_the_same(self):
+        serializer = CustomerValuesSerializer(['id', 'registration_date', 'last_order_at'])
+
+        self.assertEqual(
+            serializer.to_representation(self.customer),
+            serializer.to_representation(Customer.objects.values(*serializer.columns).get()),
+        )
+
+    def test_foreign_key_by_attname(self):
+        category = Category.objects.create(name='Books')
+        Product.objects.create(name='Novel', SKU='SKU-N', price=12, category=category)
+
+        [row] = ProductValuesSerializer(['category_id', 'price']).serialize(Product.objects.all())
+
+        self.assertEqual(row, {'category_id': category.id, 'price': '12.00'})
+
+    def test_unsaved_numbers_render_like_model_serializer(self):
+        category = Category.objects.create(name='Books')
+        for price in (9.5, 12):
+            product = Product.objects.create(name='Novel', SKU=f'SKU-{price}', price=price, category=category)
+
+            self.assertEqual(ProductValuesSerializer(['price']).to_representation(product), {'price': ProductSerializer(product).data['price']})
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(serializers.ValidationError):
+            CustomerValuesSerializer(['id', 'orders'])
@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics.analytics import SalesAnalytics
+from analytics.models import Customer, Order, TaxRate
+from analytics.tax import annotate_tax, tax_rates
+
+
+class TaxFixtureMixin:
+
+    def setUp(self):
+        tax_rates.clear()
+        self.addCleanup(tax_rates.clear)
+        caches['analytics'].clear()
+        TaxRate.objects.update_or_create(country='UK', defaults={'rate': Decimal('0.2')})
+        TaxRate.objects.update_or_create(country='USA', defaults={'rate': Decimal('0.1')})
+        TaxRate.objects.filter(country='France').delete()
+        self.uk = Customer.objects.create(name='UK', email='uk@example.com', country='UK', registration_date='2023-01-01')
+        self.usa = Customer.objects.create(name='USA', email='usa@example.com', country='USA', registration_date='2023-01-01')
+        self.france = Customer.objects.create(name='France', email='fr@example.com', country='France', registration_date='2023-01-01')
+        self.uk_order = Order.objects.create(customer=self.uk, total_amount=Decimal('100.00'))
+        Order.objects.create(customer=self.uk, total_amount=Decimal('0.25'))
+        Order.objects.create(customer=self.usa, total_amount=Decimal('50.00'))
+        Order.objects.create(customer=self.france, total_amount=Decimal('30.00'))
+
+
+class TaxTests(TaxFixtureMixin, TestCase):
+
+    def test_calculate_tax_reads_cached_rates(self):
+        self.assertEqual(self.uk_order.calculate_tax(), Decimal('20'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tax_rates.rate_for('USA'), Decimal('0.1'))
+
+    def test_annotate_tax_computes_every_order_in_one_query(self):
+        tax_rates.rates()
+
+        with self.assertNumQueries(1):
+            taxes = list(annotate_tax(Order.objects.order_by('pk')).values_list('customer__country', 'tax'))
+
+        self.assertEqual(
+            [(country, tax.quantize(Decimal('0.01'))) for country, tax in taxes],
+            [('UK', Decimal('20.00')), ('UK', Decimal('0.05')), ('USA', Decimal('5.00')), ('France', Decimal('0.00'))],
+        )
+
+    def test_summary_groups_by_month_and_country(self):
+        today = timezone.localdate()
+
+        summary = SalesAnalytics(today, today, cache=None).compute_tax_summary()
+
+        self.assertEqual(
+            [(row['month'], row['country'], row['orders'], row['revenue'], row['tax']) for row in summary],
+            [
+                (today.strftime('%Y-%m'), 'France', 1, Decimal('30.00'), Decimal('0.00')),
+                (today.strftime('%Y-%m'), 'UK', 2, Decimal('100.25'), Decimal('20.05')),
+                (today.strftime('%Y-%m'), 'USA', 1, Decimal('50.00'), Decimal('5.00')),
+            ],
+        )
+
+
+class TaxSummaryViewTests(TaxFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_tax_summary(self):
+        response = self.client.get(reverse('tax_summary'))
+        invalid = self.client.get(reverse('tax_summary'), {'start': 'yesterday'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['country']: row['orders'] for row in response.data}, {'France': 1, 'UK': 2, 'USA': 1})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
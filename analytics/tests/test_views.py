@@ -1,20 +1,24 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import io
+import json
+import shutil
+import tempfile
 from unittest.mock import patch
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from openpyxl import load_workbook
 from rest_framework import status
 from rest_framework.test import APITestCase,APIClient
 from django.utils import timezone
-from analytics.models import Product, OrderItem, Order, Category, Customer, Inventory  
+from analytics.models import Product, OrderItem, Order, Category, Customer, DailySalesRollup, Inventory, SalesChangeLog
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
 
 class SalesDataViewJWTTests(APITestCase):
 
     def setUp(self):
-        
+        caches['analytics'].clear()
         self.user = User.objects.create_user(username='testuser', password='testpass')
 
        
@@ -60,10 +64,10 @@ class SalesDataViewJWTTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         expected_data = [
-            {'product__name': 'Test Product 1', 'total_quantity': 3, 'total_revenue': 30.00},
-            {'product__name': 'Test Product 2', 'total_quantity': 3, 'total_revenue': 60.00},
+            {'product_id': self.product1.id, 'product__name': 'Test Product 1', 'total_quantity': 3, 'total_revenue': 30.00},
+            {'product_id': self.product2.id, 'product__name': 'Test Product 2', 'total_quantity': 3, 'total_revenue': 60.00},
         ]
-        self.assertCountEqual(response.data, expected_data)
+        self.assertCountEqual(response.data['results'], expected_data)
 
     def test_sales_data_view_with_expired_access_token_refresh(self):
         """Test access token refresh with a refresh token."""
@@ -86,10 +90,62 @@ class SalesDataViewJWTTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         expected_data = [
-            {'product__name': 'Test Product 1', 'total_quantity': 3, 'total_revenue': 30.00},
-            {'product__name': 'Test Product 2', 'total_quantity': 3, 'total_revenue': 60.00},
+            {'product_id': self.product1.id, 'product__name': 'Test Product 1', 'total_quantity': 3, 'total_revenue': 30.00},
+            {'product_id': self.product2.id, 'product__name': 'Test Product 2', 'total_quantity': 3, 'total_revenue': 60.00},
         ]
-        self.assertCountEqual(response.data, expected_data)
+        self.assertCountEqual(response.data['results'], expected_data)
+
+    def test_sales_data_view_filters_and_ordering(self):
+        other_category = Category.objects.create(name='Other Category')
+        Product.objects.filter(pk=self.product2.pk).update(category=other_category)
+        Order.objects.filter(pk=self.order2.pk).update(order_date=timezone.make_aware(datetime(2023, 1, 10)))
+        # Past days are read from the rollup.
+        SalesChangeLog.objects.compact()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_jwt_tokens_for_user(self.user)["access"]}')
+
+        by_category = self.client.get(self.url, {'category': self.category.id})
+        in_january = self.client.get(self.url, {'start': '2023-01-01', 'end': '2023-01-31'})
+        by_quantity = self.client.get(self.url, {'ordering': 'total_quantity', 'page_size': 1})
+
+        self.assertEqual([row['product_id'] for row in by_category.data['results']], [self.product1.id])
+        self.assertEqual([(row['product_id'], row['total_quantity']) for row in in_january.data['results']], [(self.product1.id, 1)])
+        self.assertEqual(by_quantity.data['count'], 2)
+        self.assertEqual(len(by_quantity.data['results']), 1)
+
+    def test_sales_data_reads_closed_days_from_rollup(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailySalesRollup.objects.create(date=yesterday, product=self.product2, category=self.category, country='UK', quantity=10, revenue=200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_jwt_tokens_for_user(self.user)["access"]}')
+
+        response = self.client.get(self.url, {'ordering': '-total_quantity', 'page_size': 1})
+        only_yesterday = self.client.get(self.url, {'start': yesterday.isoformat(), 'end': yesterday.isoformat()})
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'], [
+            {'product_id': self.product2.id, 'product__name': 'Test Product 2', 'total_quantity': 13, 'total_revenue': 260},
+        ])
+        self.assertEqual([(row['product_id'], row['total_quantity']) for row in only_yesterday.data['results']], [(self.product2.id, 10)])
+
+    def test_sales_data_view_rejects_bad_parameters(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_jwt_tokens_for_user(self.user)["access"]}')
+
+        self.assertEqual(self.client.get(self.url, {'start': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'SKU'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sales_data_cache_is_invalidated_by_new_items(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.get_jwt_tokens_for_user(self.user)["access"]}')
+        self.client.get(self.url)
+
+        # Only the JWT user lookup; the grouped sales come from the cache.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=self.order2, product=self.product2, quantity=4, price_at_time_of_order=self.product2.price)
+        response = self.client.get(self.url)
+
+        totals = {row['product_id']: row['total_quantity'] for row in response.data['results']}
+        self.assertEqual(totals[self.product2.id], 7)
 
 class InventoryUpdateViewTests(APITestCase):
 
@@ -173,7 +229,7 @@ class CustomerListViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
        
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_customer_list_view_unauthenticated(self):
        
@@ -185,6 +241,72 @@ class CustomerListViewTests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_customer_list_is_cursor_paginated(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+
+        first = self.client.get(reverse('customer_list'), {'page_size': 1})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([c['id'] for c in first.data['results']], [self.customer1.id])
+        self.assertEqual([c['id'] for c in second.data['results']], [self.customer2.id])
+        self.assertIsNone(second.data['next'])
+
+    def test_customer_list_sparse_fieldset(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+
+        response = self.client.get(reverse('customer_list'), {'fields': 'id,email'})
+        invalid = self.client.get(reverse('customer_list'), {'fields': 'id,password'})
+
+        self.assertEqual(response.data['results'][0], {'id': self.customer1.id, 'email': 'john@example.com'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_list_jsonl_export(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+
+        response = self.client.get(reverse('customer_list'), {'export': 'jsonl', 'fields': 'id,country', 'after': self.customer1.id})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': self.customer2.id, 'country': 'UK'}])
+
+    def test_customer_list_ordered_and_filtered_by_ltv(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+        Order.objects.create(customer=self.customer1, total_amount=50)
+        Order.objects.create(customer=self.customer2, total_amount=80)
+
+        response = self.client.get(reverse('customer_list'), {'ordering': '-ltv', 'fields': 'id,lifetime_value'})
+        filtered = self.client.get(reverse('customer_list'), {'min_ltv': '60', 'fields': 'id'})
+        invalid = self.client.get(reverse('customer_list'), {'ordering': 'name'})
+
+        self.assertEqual(response.data['results'], [
+            {'id': self.customer2.id, 'lifetime_value': '80.00'},
+            {'id': self.customer1.id, 'lifetime_value': '50.00'},
+        ])
+        self.assertEqual(filtered.data['results'], [{'id': self.customer2.id}])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_list_pages_through_ltv_ties(self):
+        # More tied rows than DRF's offset_cutoff (1000).
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
+        Customer.objects.bulk_create([
+            Customer(name=f'Tied {i}', email=f'tied{i}@example.com', country='UK', registration_date='2023-01-01')
+            for i in range(1300)
+        ])
+        expected = list(Customer.objects.order_by('lifetime_value', 'id').values_list('id', flat=True))
+
+        seen = []
+        response = self.client.get(reverse('customer_list'), {'ordering': 'ltv', 'fields': 'id', 'page_size': 100})
+        while True:
+            seen.extend(c['id'] for c in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        last_page_start = len(expected) - len(response.data['results'])
+        previous = self.client.get(response.data['previous'])
+
+        self.assertEqual(seen, expected)
+        self.assertEqual([c['id'] for c in previous.data['results']], expected[last_page_start - 100:last_page_start])
+
 
 
 
@@ -192,6 +314,11 @@ class CustomerListViewTests(APITestCase):
 class TestGenerateMonthlySalesReportView(APITestCase):
     def setUp(self):
         self.client = APIClient()
+        reports_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reports_root)
+        settings_override = override_settings(REPORTS_ROOT=reports_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
         self.url = reverse('GenerateMonthlySalesReportView', kwargs={'year': 2023, 'month': 9})
         
         
@@ -247,6 +374,56 @@ class TestGenerateMonthlySalesReportView(APITestCase):
         self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
         self.assertIn('attachment; filename', response['Content-Disposition'])
 
+    def test_generate_monthly_sales_report_streams_workbook(self):
+        """Test that the report is streamed and contains the line items and total row."""
+        # order_date is auto_now_add, so move the order into the reported month explicitly.
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('Product Name', 'Quantity Sold', 'Price at Time of Order', 'Total Revenue'))
+        self.assertEqual(rows[1], ('Product X', 5, 100, 500))
+        self.assertEqual(rows[-1][0], 'Total Revenue')
+        self.assertEqual(rows[-1][3], 500)
+
+    def test_generate_monthly_sales_report_csv_format(self):
+        """Test that ?format=csv streams the raw line items."""
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(self.url, {'format': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('.csv"', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1].split(',')[1:], ['Product X', '5', '100.00', '500.00'])
+
+    def test_generate_monthly_sales_report_unknown_format(self):
+        """Test that an unsupported export format is rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(self.url, {'format': 'pdf'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_generate_monthly_sales_report_closed_month_etag(self):
+        """Test that a cached closed-month report honours If-None-Match."""
+        Order.objects.update(order_date=timezone.make_aware(datetime(2023, 9, 15)))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
     def test_generate_monthly_sales_report_unauthenticated(self):
         """Test that an unauthenticated user cannot access the sales report view."""
        
@@ -349,6 +526,32 @@ class AnalyticsOverviewViewTest(APITestCase):
         MockSalesAnalytics.assert_called_once_with(expected_start_date, expected_end_date)
         MockRecommendationEngine.assert_called_once_with(self.customer)
 
+    @patch('analytics.views.SalesAnalytics')
+    def test_get_analytics_overview_custom_range(self, MockSalesAnalytics):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        mock_sales_analytics_instance = MockSalesAnalytics.return_value
+        mock_sales_analytics_instance.calculate_revenue_by_category.return_value = []
+        mock_sales_analytics_instance.top_selling_products_by_country.return_value = []
+        mock_sales_analytics_instance.compute_customer_churn_rate.return_value = 0
+
+        response = self.client.get(self.url, {'customer_id': self.customer.id, 'start': '2024-02-10', 'end': '2024-03-09'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        MockSalesAnalytics.assert_called_once_with(
+            timezone.make_aware(datetime(2024, 2, 10)), timezone.make_aware(datetime(2024, 3, 9))
+        )
+
+    def test_get_analytics_overview_invalid_range(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        invalid = self.client.get(self.url, {'customer_id': self.customer.id, 'start': 'yesterday'})
+        reversed_range = self.client.get(self.url, {'customer_id': self.customer.id, 'start': '2024-03-01', 'end': '2024-02-01'})
+        too_long = self.client.get(self.url, {'customer_id': self.customer.id, 'start': '1900-01-01', 'end': '2024-02-01'})
+
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(reversed_range.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(too_long.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_analytics_overview_unauthenticated(self):
         
         response = self.client.get(self.url, {'customer_id': self.customer.id})
@@ -6,6 +6,17 @@ from .views import (
     CustomerListView,
     GenerateMonthlySalesReportView,
     AnalyticsOverviewView,
+    ReportJobCreateView,
+    ReportJobDetailView,
+    ReportJobDownloadView,
+    AnalyticsCacheStatsView,
+    ProductAlsoBoughtView,
+    BatchRecommendationView,
+    TopProductsLeaderboardView,
+    OrderIngestView,
+    InventoryReservationView,
+    InventoryReservationReleaseView,
+    TaxSummaryView,
 )
 
 urlpatterns = [
@@ -14,16 +25,31 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     path('sales-data/', SalesDataView.as_view(), name='sales_data'),
+    path('tax-summary/', TaxSummaryView.as_view(), name='tax_summary'),
 
    
     path('inventory-update/<int:pk>/', InventoryUpdateView.as_view(), name='inventory_update'),
+    path('inventory/reservations/', InventoryReservationView.as_view(), name='inventory_reservation'),
+    path('inventory/reservations/<str:key>/release/', InventoryReservationReleaseView.as_view(), name='inventory_reservation_release'),
 
     
     path('customers/', CustomerListView.as_view(), name='customer_list'),
 
+    path('orders/bulk/', OrderIngestView.as_view(), name='order_ingest'),
+
+    path('recommendations/batch/', BatchRecommendationView.as_view(), name='recommendation_batch'),
+    path('products/<int:pk>/also-bought/', ProductAlsoBoughtView.as_view(), name='product_also_bought'),
+
     
     path('generate-monthly-sales-report/<int:year>/<int:month>/', GenerateMonthlySalesReportView.as_view(), name='GenerateMonthlySalesReportView'),
 
     
+    path('report-jobs/', ReportJobCreateView.as_view(), name='report_job_create'),
+    path('report-jobs/<uuid:pk>/', ReportJobDetailView.as_view(), name='report_job_detail'),
+    path('report-jobs/<uuid:pk>/download/', ReportJobDownloadView.as_view(), name='report_job_download'),
+
+
     path('analytics-overview/', AnalyticsOverviewView.as_view(), name='analytics_overview'),
+    path('analytics-overview/cache-stats/', AnalyticsCacheStatsView.as_view(), name='analytics_cache_stats'),
+    path('analytics-overview/leaderboard/', TopProductsLeaderboardView.as_view(), name='top_products_leaderboard'),
 ]
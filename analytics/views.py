@@ -2,31 +2,136 @@ from rest_framework import generics
 from rest_framework.response import Response
 from django.utils import timezone
 from rest_framework.views import APIView
-from io import BytesIO
+import io
+import json
+import os
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import add
 from rest_framework import status
 
-from django.db.models import Sum, F
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
-from .models import Customer, Inventory, OrderItem
-from .serializers import  CustomerSerializer, InventorySerializer
+from django.urls import reverse
+from .models import Customer, DailySalesRollup, InsufficientStock, Inventory, InventoryReservation, OrderItem, Product, ReportJob, ReservationConflict, RollupWatermark
+from .serializers import  BatchRecommendationSerializer, CustomerSerializer, CustomerValuesSerializer, InventoryReservationSerializer, InventorySerializer, ReportJobSerializer
 from .analytics import SalesAnalytics  
-from .recommendation import RecommendationEngine  
-from openpyxl import Workbook
-from django.http import HttpResponse
-from rest_framework.permissions import IsAuthenticated
+from .heavy_hitters import leaderboards
+from .caching import analytics_cache
+from .recommendation import RecommendationEngine, customer_serializer, product_serializer
+from .reports import EXPORT_FORMATS, MAX_REPORT_YEAR, MIN_REPORT_YEAR, MonthlySalesReport, stream_file
+from .jobs import enqueue_report_job, fail_stale_jobs
+from .ingestion import DEFAULT_BATCH_SIZE, PARSERS, IngestionError, ingest_orders
+from .http import file_response
+from .pagination import KeysetCursorPagination, SalesDataPagination
+from .partitions import day_start
+from .report_cache import get_or_build, is_closed_month
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.negotiation import DefaultContentNegotiation
 
 
 
+REVENUE_FIELD = DecimalField(max_digits=16, decimal_places=2)
+RANGE_TOO_LONG_MESSAGE = "The range must not be longer than {} days."
+
+
+def range_too_long(start, end):
+    # start and end are inclusive; bucketing a huge range would build a query
+    # per month and one cache entry per bucket.
+    return (end - start).days + 1 > settings.ANALYTICS_MAX_RANGE_DAYS
+
+
 class SalesDataView(generics.ListAPIView):
     permission_classes =  [IsAuthenticated] 
-
-    def get_queryset(self):
-        
-        return OrderItem.objects.values('product__name').annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('price_at_time_of_order') * F('quantity')))
+    pagination_class = SalesDataPagination
+    # ?ordering= value -> column of get_queryset.
+    ordering_fields = {'product_id': 'id', 'total_quantity': 'total_quantity', 'total_revenue': 'total_revenue'}
+    default_ordering = '-total_revenue'
+
+    def parse_filters(self, request):
+        # ?start= / ?end= are inclusive local dates on the order date;
+        # ?category= is a category id.
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        category = request.query_params.get('category')
+        return (
+            date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None,
+            int(category) if category else None,
+        )
+
+    def get_queryset(self, start=None, end=None, category=None):
+        # One row per product with sales in the range, totalled and ordered
+        # by the database. Closed days are read from DailySalesRollup like
+        # SalesAnalytics does; only today (which is never archived) is summed
+        # from the line items, through the (order_date, product) index.
+        # Products are filtered on their current category.
+        today = timezone.localdate()
+        totals = []
+        if start is None or start < today:
+            rollup = DailySalesRollup.objects.filter(product=OuterRef('pk'), date__lt=today)
+            if start:
+                rollup = rollup.filter(date__gte=start)
+            if end:
+                rollup = rollup.filter(date__lte=end)
+            totals.append((rollup, 'quantity', F('revenue')))
+        if end is None or end >= today:
+            items = OrderItem.objects.filter(product=OuterRef('pk'), order_date__gte=day_start(max(start or today, today)))
+            if end:
+                items = items.filter(order_date__lt=day_start(end + timedelta(days=1)))
+            totals.append((items, 'quantity', F('price_at_time_of_order') * F('quantity')))
+
+        quantity = []
+        revenue = []
+        for rows, quantity_field, amount in totals:
+            rows = rows.order_by().values('product')
+            quantity.append(Coalesce(Subquery(rows.annotate(total=Sum(quantity_field)).values('total')), Value(0)))
+            revenue.append(Coalesce(
+                Subquery(rows.annotate(total=Sum(amount, output_field=REVENUE_FIELD)).values('total')),
+                Value(Decimal('0')), output_field=REVENUE_FIELD,
+            ))
+
+        products = Product.objects.all()
+        if category:
+            products = products.filter(category_id=category)
+        if not totals:
+            return products.none()
+        return products.annotate(
+            total_quantity=reduce(add, quantity),
+            total_revenue=ExpressionWrapper(reduce(add, revenue), output_field=REVENUE_FIELD),
+        ).filter(total_quantity__gt=0).values('id', 'name', 'total_quantity', 'total_revenue')
+
+    def get_page(self, request, start, end, category, ordering):
+        column = self.ordering_fields[ordering.lstrip('-')]
+        queryset = self.get_queryset(start, end, category).order_by(f'-{column}' if ordering.startswith('-') else column, 'id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response([
+            {'product_id': row['id'], 'product__name': row['name'], 'total_quantity': row['total_quantity'], 'total_revenue': row['total_revenue']}
+            for row in page
+        ]).data
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        return Response(queryset)
+        try:
+            start, end, category = self.parse_filters(request)
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+        ordering = request.query_params.get('ordering', self.default_ordering)
+        if ordering.lstrip('-') not in self.ordering_fields:
+            return Response({"error": f"Unsupported ordering '{ordering}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Each page is cached per filter combination until the next order or
+        # order item is written or compaction changes the rollup.
+        parts = (
+            start or '', end or '', category or '', ordering,
+            request.query_params.get(self.paginator.page_query_param, 1),
+            request.query_params.get(self.paginator.page_size_query_param, ''),
+        )
+        return Response(analytics_cache.get_or_compute('sales_data', parts, lambda: self.get_page(request, start, end, category, ordering)))
 
 
 class InventoryUpdateView(generics.UpdateAPIView):
@@ -34,57 +139,229 @@ class InventoryUpdateView(generics.UpdateAPIView):
     serializer_class = InventorySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # The row stays locked from read to write, so concurrent updates are
+        # applied one after another instead of overwriting each other.
+        return super().get_queryset().select_for_update()
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+
+class InventoryReservationView(generics.GenericAPIView):
+    # Reserves stock for every line of an order at once. The idempotency key
+    # comes from the body or the Idempotency-Key header; retrying with the
+    # same key returns the original reservation.
+    serializer_class = InventoryReservationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        data = request.data.copy()
+        if request.headers.get('Idempotency-Key'):
+            data.setdefault('idempotency_key', request.headers['Idempotency-Key'])
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            reservation, created = InventoryReservation.objects.reserve(
+                serializer.validated_data['idempotency_key'], serializer.validated_data['items']
+            )
+        except ReservationConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except InsufficientStock as e:
+            return Response({
+                "error": "Insufficient stock.",
+                "shortages": {
+                    product_id: {"requested": requested, "available": available}
+                    for product_id, (requested, available) in e.shortages.items()
+                },
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(
+            self.get_serializer(reservation).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class InventoryReservationReleaseView(generics.GenericAPIView):
+    serializer_class = InventoryReservationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, key):
+        get_object_or_404(InventoryReservation.objects.only('id'), idempotency_key=key)
+        reservation, _ = InventoryReservation.objects.release(key)
+        return Response(self.get_serializer(reservation).data)
+
 
 class CustomerListView(generics.ListAPIView):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    export_chunk_size = 2000
+    # ?ordering= values; each walks an index and ends in id, so the keyset
+    # cursor is positioned on (lifetime_value, id) and ties page through.
+    orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'ltv': ('lifetime_value', 'id'),
+        '-ltv': ('-lifetime_value', '-id'),
+    }
+
+    def get_ordering(self):
+        value = self.request.query_params.get('ordering', 'id')
+        if value not in self.orderings:
+            raise ValueError(f"ordering must be one of {', '.join(self.orderings)}")
+        return self.orderings[value]
+
+    def filter_by_ltv(self, queryset):
+        # ?min_ltv= / ?max_ltv= are inclusive bounds on the stored lifetime value.
+        for param, lookup in (('min_ltv', 'lifetime_value__gte'), ('max_ltv', 'lifetime_value__lte')):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    bound = Decimal(value)
+                except InvalidOperation:
+                    bound = None
+                if bound is None or not bound.is_finite():
+                    raise ValueError(f"{param} must be a number")
+                queryset = queryset.filter(**{lookup: bound})
+        return queryset
+
+    def get_fields(self):
+        value = self.request.query_params.get('fields')
+        if not value:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_values_serializer(self):
+        # ?fields=id,email renders (and loads) only those columns.
+        return CustomerValuesSerializer(self.get_fields())
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        if request.query_params.get('export') == 'jsonl':
+            return self.export(request, serializer)
 
-class GenerateMonthlySalesReportView(APIView):
+        try:
+            ordering = self.get_ordering()
+            queryset = self.filter_by_ltv(self.get_queryset())
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows are read as dicts; id and the ordering column are always
+        # selected because the cursor is keyed on them.
+        self.paginator.ordering = ordering
+        columns = dict.fromkeys(['id', *serializer.columns, *(field.lstrip('-') for field in ordering)])
+        page = self.paginate_queryset(queryset.values(*columns))
+        return self.get_paginated_response([serializer.to_representation(row) for row in page])
+
+    def export(self, request, serializer):
+        # Full sync: every customer as one JSON line, read in id order one
+        # bounded keyset chunk at a time so memory stays flat. ?after=<id>
+        # resumes an interrupted export.
+        queryset = self.get_queryset().order_by('id')
+        after = request.query_params.get('after')
+        try:
+            queryset = self.filter_by_ltv(queryset)
+            if after:
+                queryset = queryset.filter(id__gt=int(after))
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = (
+            json.dumps(row) + '\n'
+            for row in serializer.iter_queryset(queryset, chunk_size=self.export_chunk_size)
+        )
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+class OrderIngestView(APIView):
+    # Bulk order ingestion: the body is JSON lines (one order per line) or CSV
+    # (one item per row, grouped by order_ref), read by content type.
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, year, month):
+    def post(self, request):
+        fmt = 'csv' if request.content_type.startswith('text/csv') else 'jsonl'
         try:
-           
-            if not (1 <= month <= 12):
-                return Response({"error": "Invalid month provided."}, status=status.HTTP_400_BAD_REQUEST)
-            
-            start_date = timezone.datetime(year, month, 1)
-            end_date = timezone.datetime(year, month + 1, 1) if month < 12 else timezone.datetime(year + 1, 1, 1)
-            
-            
-            sales_data = (
-                OrderItem.objects.filter(order__order_date__range=(start_date, end_date))
-                .values('product__name', 'quantity', 'price_at_time_of_order')
-            )
+            batch_size = int(request.query_params.get('batch_size', DEFAULT_BATCH_SIZE))
+            lines = io.StringIO(request.body.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            
-            if not sales_data.exists():
-                return Response({"error": "No sales data found for the given month."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            result = ingest_orders(PARSERS[fmt](lines), batch_size=max(batch_size, 1))
+        except IngestionError as e:
+            return Response({"error": str(e), "committed": e.result.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStock as e:
+            return Response({
+                "error": "Insufficient stock.",
+                "shortages": {
+                    product_id: {"requested": requested, "available": available}
+                    for product_id, (requested, available) in e.shortages.items()
+                },
+                "committed": e.result.as_dict(),
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+
+class ExportFormatNegotiation(DefaultContentNegotiation):
+    # On export views ?format= names the file format, not a DRF renderer, so
+    # skip URL format overrides and always answer in the first renderer.
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
 
-            
-            workbook = Workbook()
-            sheet = workbook.active
-            sheet.title = f'Sales Report {year}-{month:02d}'
 
-            headers = ['Product Name', 'Quantity Sold', 'Price at Time of Order', 'Total Revenue']
-            sheet.append(headers)
+class GenerateMonthlySalesReportView(APIView):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportFormatNegotiation
 
-            for item in sales_data:
-                total_revenue = item['quantity'] * item['price_at_time_of_order']
-                sheet.append([item['product__name'], item['quantity'], item['price_at_time_of_order'], total_revenue])
+    def get(self, request, year, month):
+        try:
 
-            total_revenue_row = ['Total Revenue', '', '', sum(item['quantity'] * item['price_at_time_of_order'] for item in sales_data)]
-            sheet.append(total_revenue_row)
+            if not (MIN_REPORT_YEAR <= year <= MAX_REPORT_YEAR):
+                return Response({"error": "Invalid year provided."}, status=status.HTTP_400_BAD_REQUEST)
+            if not (1 <= month <= 12):
+                return Response({"error": "Invalid month provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-            
-            buffer = BytesIO()
-            workbook.save(buffer)
-            buffer.seek(0)
+            export_format = request.query_params.get('format', 'xlsx')
+            if export_format not in EXPORT_FORMATS:
+                return Response({"error": f"Unsupported format '{export_format}'."}, status=status.HTTP_400_BAD_REQUEST)
+            extension, content_type = EXPORT_FORMATS[export_format]
+
+            report = MonthlySalesReport(year, month)
+
+            if is_closed_month(report):
+                # Past months never change, so serve (and reuse) a cached file.
+                artifact = get_or_build(report, export_format)
+                if not artifact.row_count:
+                    return Response({"error": "No sales data found for the given month."}, status=status.HTTP_404_NOT_FOUND)
+                return file_response(
+                    request, artifact.file_path, content_type, report.filename(extension),
+                    etag=artifact.etag, delete=artifact.pk is None,
+                )
+
+            if export_format != 'xlsx':
+                # Raw formats are encoded straight from the queryset iterator.
+                stream = report.open_stream(export_format)
+                if stream is None:
+                    return Response({"error": "No sales data found for the given month."}, status=status.HTTP_404_NOT_FOUND)
+                response = StreamingHttpResponse(stream, content_type=content_type)
+                response['Content-Disposition'] = f'attachment; filename="{report.filename(extension)}"'
+                return response
+
+            # The workbook is spooled to a temporary file and streamed back in
+            # chunks; the file is removed once the last chunk has been sent.
+            path = report.build_to_tempfile()
+
+            if not report.row_count:
+                os.unlink(path)
+                return Response({"error": "No sales data found for the given month."}, status=status.HTTP_404_NOT_FOUND)
 
-            response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="monthly_sales_report_{year}_{month:02d}.xlsx"'
+            response = StreamingHttpResponse(stream_file(path, delete=True), content_type=content_type)
+            response['Content-Length'] = os.path.getsize(path)
+            response['Content-Disposition'] = f'attachment; filename="{report.filename()}"'
 
             return response
 
@@ -100,24 +377,90 @@ class GenerateMonthlySalesReportView(APIView):
             
             return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ReportJobCreateView(generics.CreateAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        job = serializer.save(requested_by=self.request.user)
+        enqueue_report_job(job)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        response['Location'] = reverse('report_job_detail', kwargs={'pk': response.data['id']})
+        return response
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(requested_by=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        # A job lost to a restart is reported as failed when polled.
+        fail_stale_jobs(self.get_queryset().filter(pk=kwargs['pk']))
+        return super().retrieve(request, *args, **kwargs)
+
+
+class ReportJobDownloadView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(requested_by=self.request.user)
+
+    def get(self, request, pk):
+        job = self.get_object()
+        if job.status != 'done':
+            return Response({"error": "Report is not ready yet.", "status": job.status}, status=status.HTTP_409_CONFLICT)
+
+        extension, content_type = EXPORT_FORMATS[job.format]
+        report = MonthlySalesReport(job.year, job.month)
+        return file_response(request, job.file_path, content_type, report.filename(extension))
+
+
 class AnalyticsOverviewView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
+    default_top_n = 10
+
+    def parse_date_param(self, request, name, default):
+        value = request.query_params.get(name)
+        day = date.fromisoformat(value) if value else default
+        return timezone.datetime(day.year, day.month, day.day, tzinfo=timezone.get_current_timezone())
+
     def get(self, request):
-       
-        start_date = timezone.datetime(2023, 1, 1, tzinfo=timezone.get_current_timezone())
-        end_date = timezone.datetime(2023, 12, 31, tzinfo=timezone.get_current_timezone())
 
-        
+        try:
+            start_date = self.parse_date_param(request, 'start', date(2023, 1, 1))
+            end_date = self.parse_date_param(request, 'end', date(2023, 12, 31))
+            # Recommendation lists are capped by RecommendationEngine.max_limit.
+            limit = int(request.query_params.get('limit', 0)) or None
+            top_n = int(request.query_params.get('top_n', self.default_top_n))
+            if top_n < 1:
+                raise ValueError("top_n must be at least 1.")
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if end_date < start_date:
+            return Response({"error": "end must not be before start."}, status=status.HTTP_400_BAD_REQUEST)
+        if range_too_long(start_date, end_date):
+            return Response({"error": RANGE_TOO_LONG_MESSAGE.format(settings.ANALYTICS_MAX_RANGE_DAYS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # SalesAnalytics caches its sales figures per month/day bucket, so
+        # overlapping ranges reuse each other's work.
         sales_analytics = SalesAnalytics(start_date, end_date)
 
-        
         revenue_by_category = sales_analytics.calculate_revenue_by_category()
 
-        
-        top_products_by_country = sales_analytics.top_selling_products_by_country()
+        top_products_by_country = sales_analytics.top_selling_products_by_country(top_n=top_n)
 
-        
-        churn_rate = sales_analytics.compute_customer_churn_rate()
+        # Churn does not depend on the customer, so it is cached per range and
+        # shared by every request.
+        range_key = (start_date.isoformat(), end_date.isoformat())
+        churn_rate = analytics_cache.get_or_compute(
+            'churn_rate', range_key, sales_analytics.compute_customer_churn_rate
+        )
 
         
         customer_id = request.query_params.get('customer_id') 
@@ -126,39 +469,111 @@ class AnalyticsOverviewView(generics.GenericAPIView):
 
         
         recommendations = {
-    "order_history": [
-        {
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "SKU": product.SKU,
-            "price": product.price,
-            "category_id": product.category.id,
-        } for product in recommender.recommend_based_on_order_history()
-    ],
-    "similar_customers": [
-        {
-            "id": similar_customer.id,
-            "name": similar_customer.name,
-            "email": similar_customer.email,
-        } for similar_customer in recommender.recommend_based_on_similar_customers()  
-    ],
-    "in_stock": [
-        {
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "SKU": product.SKU,
-            "price": product.price,
-            "category_id": product.category.id,
-        } for product in recommender.recommend_based_on_inventory()
-    ],
-}
+            "order_history": [
+                product_serializer.to_representation(product)
+                for product in recommender.recommend_based_on_order_history(limit=limit)
+            ],
+            "similar_customers": [
+                customer_serializer.to_representation(similar_customer)
+                for similar_customer in recommender.recommend_based_on_similar_customers(limit=limit)
+            ],
+            "in_stock": [
+                product_serializer.to_representation(product)
+                for product in recommender.recommend_based_on_inventory(limit=limit)
+            ],
+            "co_purchased": [
+                product_serializer.to_representation(product)
+                for product in recommender.recommend_based_on_co_purchases(limit=limit)
+            ],
+        }
 
        
         return Response({
-            "revenue_by_category": list(revenue_by_category),
-            "top_products_by_country": list(top_products_by_country),
+            "revenue_by_category": revenue_by_category,
+            "top_products_by_country": top_products_by_country,
             "churn_rate": churn_rate,
             "recommendations": recommendations,
-        })
\ No newline at end of file
+            "data_as_of": RollupWatermark.fresh_as_of_for(RollupWatermark.DAILY_SALES),
+        })
+
+
+class BatchRecommendationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchRecommendationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # One JSON object per customer, streamed as each chunk of customers is
+        # resolved.
+        lines = (
+            json.dumps(result) + '\n'
+            for result in RecommendationEngine.bulk(
+                serializer.validated_data['customer_ids'], limit=serializer.validated_data.get('limit')
+            )
+        )
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+class ProductAlsoBoughtView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        product = get_object_or_404(Product.objects.only('id'), pk=pk)
+        return Response([
+            product_serializer.to_representation(related)
+            for related in RecommendationEngine(None).recommend_also_bought(product, limit=limit)
+        ])
+
+
+class TopProductsLeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not leaderboards.enabled:
+            return Response({"error": "Real-time leaderboards are disabled."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            top_n = int(request.query_params.get('top_n', AnalyticsOverviewView.default_top_n))
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Approximate counts since this process started; max_error bounds how
+        # far each total may be overestimated.
+        return Response(leaderboards.top(top_n, country=request.query_params.get('country')))
+
+
+class TaxSummaryView(APIView):
+    # Orders, revenue and tax per month and country. ?start= / ?end= are
+    # inclusive local dates; the default is the last twelve calendar months.
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        try:
+            end = date.fromisoformat(end) if end else timezone.localdate()
+            if start:
+                start = date.fromisoformat(start)
+            else:
+                first_month = end.year * 12 + end.month - 12
+                start = date(first_month // 12, first_month % 12 + 1, 1)
+        except ValueError as ve:
+            return Response({"error": f"Invalid input: {str(ve)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({"error": "end must not be before start."}, status=status.HTTP_400_BAD_REQUEST)
+        if range_too_long(start, end):
+            return Response({"error": RANGE_TOO_LONG_MESSAGE.format(settings.ANALYTICS_MAX_RANGE_DAYS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(SalesAnalytics(start, end).compute_tax_summary())
+
+
+class AnalyticsCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(analytics_cache.stats())
@@ -92,6 +92,55 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Background report generation: finished files are written under REPORTS_ROOT
+# by a local thread pool of REPORT_JOB_WORKERS workers. A pending or running
+# job with no heartbeat for REPORT_JOB_STALE_AFTER seconds (its process was
+# restarted) is marked failed when polled.
+REPORTS_ROOT = config('REPORTS_ROOT', default=str(BASE_DIR / 'reports'))
+REPORT_JOB_WORKERS = config('REPORT_JOB_WORKERS', default=2, cast=int)
+REPORT_JOBS_ALWAYS_EAGER = config('REPORT_JOBS_ALWAYS_EAGER', default=False, cast=bool)
+REPORT_JOB_STALE_AFTER = config('REPORT_JOB_STALE_AFTER', default=900, cast=int)
+
+# Caches. AnalyticsOverviewView sections live in the 'analytics' alias; point
+# ANALYTICS_CACHE_BACKEND at e.g. django.core.cache.backends.filebased.FileBasedCache
+# (with ANALYTICS_CACHE_LOCATION set to a directory) or a shared backend such as
+# Redis/Memcached so the cache is shared between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': config('ANALYTICS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('ANALYTICS_CACHE_LOCATION', default='analytics'),
+    },
+}
+ANALYTICS_CACHE_ALIAS = 'analytics'
+# Per-section TTLs in seconds; sections not listed use analytics.caching defaults.
+ANALYTICS_CACHE_TTLS = {
+    'revenue_by_category': config('ANALYTICS_CACHE_TTL_REVENUE', default=300, cast=int),
+    'top_products_by_country': config('ANALYTICS_CACHE_TTL_TOP_PRODUCTS', default=300, cast=int),
+    'top_products_ranked': config('ANALYTICS_CACHE_TTL_TOP_PRODUCTS', default=300, cast=int),
+    'churn_rate': config('ANALYTICS_CACHE_TTL_CHURN', default=3600, cast=int),
+    'sales_data': config('ANALYTICS_CACHE_TTL_SALES_DATA', default=300, cast=int),
+    'tax_summary': config('ANALYTICS_CACHE_TTL_TAX_SUMMARY', default=300, cast=int),
+}
+# Longest date range, in days, accepted by the analytics overview and tax
+# summary endpoints.
+ANALYTICS_MAX_RANGE_DAYS = config('ANALYTICS_MAX_RANGE_DAYS', default=3660, cast=int)
+# Products tracked per country by the in-memory real-time leaderboards
+# (analytics.heavy_hitters); 0 turns them off.
+ANALYTICS_HEAVY_HITTERS_CAPACITY = config('ANALYTICS_HEAVY_HITTERS_CAPACITY', default=0, cast=int)
+# Seconds a process keeps its in-memory copy of the TaxRate table.
+ANALYTICS_TAX_RATES_TTL = config('ANALYTICS_TAX_RATES_TTL', default=300, cast=int)
+# Low-stock alerts (analytics.alerts): sent from a background thread to the
+# log, the LowStockAlert table and, when a URL is set, a webhook. Inventory rows
+# without their own low_stock_threshold use ANALYTICS_LOW_STOCK_THRESHOLD.
+ANALYTICS_LOW_STOCK_THRESHOLD = config('ANALYTICS_LOW_STOCK_THRESHOLD', default=10, cast=int)
+ANALYTICS_LOW_STOCK_QUEUE_SIZE = config('ANALYTICS_LOW_STOCK_QUEUE_SIZE', default=10000, cast=int)
+ANALYTICS_LOW_STOCK_BATCH_SIZE = config('ANALYTICS_LOW_STOCK_BATCH_SIZE', default=100, cast=int)
+ANALYTICS_LOW_STOCK_WEBHOOK_URL = config('ANALYTICS_LOW_STOCK_WEBHOOK_URL', default='')
+ANALYTICS_LOW_STOCK_ALERTS_ALWAYS_EAGER = config('ANALYTICS_LOW_STOCK_ALERTS_ALWAYS_EAGER', default=False, cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 